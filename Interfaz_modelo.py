@@ -1,12 +1,14 @@
 import tkinter as tk
+import queue
+import multiprocessing
 import numpy as np
 import matplotlib as mpl
 from tkinter import ttk
 from matplotlib import pyplot as plt
 from funciones_modelo import *
-import struct as st
-
-mpl.use('TkAgg')
+from archivos_modelo import guardarTraza, abrirTraza, guardarSimulacion
+from graficas_modelo import GraficaTraza
+from concurrent.futures import ProcessPoolExecutor
 
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg, NavigationToolbar2Tk)
@@ -14,650 +16,349 @@ from matplotlib.backend_bases import key_press_handler
 from PIL import ImageTk, Image
 
 #---------------------------------------------------------------- Interfaz ----------------------------------------------------------------
-# crear ventana:
-window = tk.Tk()
-
-# Definir tamaño de ventana:
-window.geometry("800x600")
-window.title("Simulación - Modelo Hodkin-Huxley")
-
-#Variables de texto
-tiempoSimulacion1Var = tk.StringVar()
-tiempoInicioEstimulacion1Var = tk.StringVar()
-tiempoFinEstimulacion1Var = tk.StringVar()
-ValorEstimulacion1Var = tk.StringVar()
-Ek1Var = tk.StringVar()
-ENa1Var = tk.StringVar()
-El1Var = tk.StringVar()
-gk1Var = tk.StringVar()
-gNa1Var = tk.StringVar()
-
-
-label = tk.Label(window, background= "#8ea7ba", text="Modelo de Hodgkin-Huxley", font=('math', 15, 'bold italic'),height=1 ,width=800).pack()
-
-# grafica
-fig = Figure(figsize=(6, 5), dpi=50)
-ax = fig.add_subplot()
-ax.set_xlabel("time (ms)")
-ax.set_ylabel("voltage (mV)")
-canvas = FigureCanvasTkAgg(fig, window)
-canvas.get_tk_widget().place(x=50, y=50)
-
-#Imagen
-img = ImageTk.PhotoImage(Image.open("assets/images/Imagen_circuito.png"))
-lab = tk.Label(image=img)
-lab.place(x=440,y=50)
-
-img2 = ImageTk.PhotoImage(Image.open("assets/images/Imagen_tabla.png"))
-lab = tk.Label(image=img2)
-lab.place(x=440,y=445)
-
-# Metodos de Solucion
-checkRungeKutta2V = tk.IntVar()
-checkRungeKutta4V = tk.IntVar()
-checkEulerAdelanteV = tk.IntVar()
-checkEulerAtrasV = tk.IntVar()
-checkEulerModificadoV = tk.IntVar()
-
-metodo = tk.Label(window, text="Método de solución:", font=('math', 9, 'bold italic')).place(x=20, y=320)
-checkRungeKutta2 = tk.Checkbutton(window, text="Runge-Kutta 2",font=('math', 9, 'italic'), height=1, width=14, variable=checkRungeKutta2V).place(x=15, y=360)
-checkRungeKutta4 = tk.Checkbutton(window, text="Runge-Kutta 4",font=('math', 9, 'italic'), height=1, width=14, variable=checkRungeKutta4V).place(x=15, y=400)
-checkEulerAdelante= tk.Checkbutton(window, text="Euler Adelante",font=('math', 9, 'italic'), height=1, width=14, variable=checkEulerAdelanteV).place(x=15, y=440)
-checkEulerModificado = tk.Checkbutton(window, text="Euler Modificado",font=('math', 9, 'italic'), height=1, width=15, variable=checkEulerAtrasV).place(x=15, y=480)
-checkEulerAtrás = tk.Checkbutton(window, text="Euler Atrás",font=('math', 9, 'italic'), height=1, width=11, variable=checkEulerModificadoV).place(x=15, y=520)
-
-# Variables
-check6V = tk.IntVar()
-check7V = tk.IntVar()
-check8V = tk.IntVar()
-
-variable = tk.Label(window, text="Variables:", font=('math', 9, 'bold italic')).place(x=150, y=320)
-check6 = tk.Checkbutton(window, text="V(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check6V).place(x=150, y=350)
-check7 = tk.Checkbutton(window, text="gk(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check7V).place(x=245, y=350)
-check8 = tk.Checkbutton(window, text="gNa(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check8V).place(x=340, y=350)
-
-# Parametros
-parametros = tk.Label(window, text="Parámetros:", font=('math', 9, 'bold italic')).place(x=150, y=380)
-Ek = tk.Label(window, text="Ek",font=('math', 9, 'italic')).place(x=155, y=410)
-Ek1 = tk.Entry(window, width=8, textvariable= Ek1Var).place(x=185, y=410)
-Ek11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=410)
-ENa = tk.Label(window, text="ENa",font=('math', 9, 'italic')).place(x=155, y=465)
-ENa1 = tk.Entry(window, width=8, textvariable=ENa1Var).place(x=185, y=465)
-ENa11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=465)
-El = tk.Label(window, text="El",font=('math', 9, 'italic')).place(x=155, y=520)
-El1 = tk.Entry(window, width=8, textvariable=El1Var).place(x=185, y=520)
-El11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=520)
-gk = tk.Label(window, text="/gk",font=('math', 9, 'italic')).place(x=260, y=430)
-gk1 = tk.Entry(window, width=8, textvariable=gk1Var).place(x=295, y=430)
-gk11 = tk.Label(window, text="mS/cm^3",font=('math', 9, 'italic')).place(x=340, y=430)
-gNa = tk.Label(window, text="/gNa",font=('math', 9, 'italic')).place(x=260, y=490)
-gNa1 = tk.Entry(window, width=8, textvariable=gNa1Var).place(x=295, y=490)
-gNa11 = tk.Label(window, text="mS/cm^3",font=('math', 9, 'italic')).place(x=340, y=490)
-
-# Entrada de texto
-tiempoSimulacion = tk.Label(window, text="Tiempo de simulacion:",font=('math', 9, 'italic')).place(x=440, y=320)
-tiempoSimulacion1 = tk.Entry(window, width=8, textvariable=tiempoSimulacion1Var).place(x=630, y=320)
-tiempoSimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=320)
-tiempoInicioEstimulacion = tk.Label(window, text="Tiempo de inicio estimulacion:",font=('math', 9, 'italic')).place(x=440, y=340)
-tiempoInicioEstimulacion1 = tk.Entry(window, width=8, textvariable=tiempoInicioEstimulacion1Var).place(x=630, y=340)
-tiempoInicioEstimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=340)
-tiempoFinEstimulacion = tk.Label(window, text="Tiempo de fin estimulacion:",font=('math', 9, 'italic')).place(x=440, y=360)
-tiempoFinEstimulacion1 = tk.Entry(window, width=8, textvariable=tiempoFinEstimulacion1Var).place(x=630, y=360)
-tiempoFinEstimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=360)
-ValorEstimulacion = tk.Label(window, text="Valor estimulacion:",font=('math', 9, 'italic')).place(x=440, y=380)
-ValorEstimulacion1 = tk.Entry(window, width=8, textvariable=ValorEstimulacion1Var).place(x=630, y=380)
-ValorEstimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=380)
-
-# Botones
-
-# ------------------- Variables botones -------------------
-def start_simulation():
+# Con el arranque "spawn" (Windows, macOS) cada proceso de simulacion importa este modulo:
+# al importarlo solo se definen las funciones; la ventana, los widgets y la cache se crean
+# en main(), que corre solo en el proceso principal.
+
+# Las simulaciones corren en otros procesos (un nucleo por metodo) para no bloquear la
+# ventana; el avance llega por una cola que se revisa con window.after. El primer metodo
+# lanzado tambien manda sus tramos, que se van dibujando en vivo (a lo sumo cada 100 ms)
+procesos = None
+colaAvance = None
+eventoCancelar = None
+pendientes = {}
+avance = {}
+enVivo = None
+
+
+def crear_modelo(metodo):
     """
-    Funcion que inicia la simulacion
+    Funcion que crea el modelo con los valores de la interfaz
     """
+    # Variables
+    tiempoSimulacion = float(tiempoSimulacion1Var.get())
+    tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
+    tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
+    valorEstimulacion = float(ValorEstimulacion1Var.get())
+    h = 0.01
+    cm = 1.0
+    gl = 0.3
+
+    # Parametros
+    Ek = float(Ek1Var.get())
+    ENa = float(ENa1Var.get())
+    El = float(El1Var.get())
+    gk = float(gk1Var.get())
+    gNa = float(gNa1Var.get())
+
+    estimulo = EstimuloPulsos([(tiempoInicioEstimulacion, tiempoFinEstimulacion, valorEstimulacion)])
+    return HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, 0, tiempoSimulacion, h, metodo, estimulo=estimulo, cache=cache)
+
+
+def variable_seleccionada():
+    """
+    Funcion que devuelve el indice en (V, ina, ik, il) de la variable seleccionada, o None
+    """
+    for indice, checkV in enumerate((check6V, check7V, check8V)):
+        if checkV.get() == 1:
+            return indice
+    return None
 
-    print("Iniciando exportacion de datos...")
-
-    # Solucion
-    if checkRungeKutta2V.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Runge Kutta 2")
-
-        # Solucion
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "rungeKutta2" )
-        solution_tuple = hh.Main()
 
-        if check6V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[0], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check7V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[1], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check8V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[2], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-    if checkRungeKutta4V.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Runge Kutta 4")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "rungeKutta4")
-        solution_tuple = hh.Main()
+def plot_solution(hh, solution_tuple):
+    """
+    Funcion que grafica la variable seleccionada
+    """
+    indice = variable_seleccionada()
+    if indice is None:
+        return
 
-        if check6V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[0], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check7V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[1], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check8V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[2], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-    if checkEulerAdelanteV.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler hacia adelante")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerFor")
-        solution_tuple = hh.Main()
+    grafica.mostrar(hh.t, solution_tuple[indice])
 
-        if check6V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[0], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check7V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[1], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check8V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[2], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-    if checkEulerAtrasV.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler hacia atras")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerBack")
-        solution_tuple = hh.Main()
 
-        if check6V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[0], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check7V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[1], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check8V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[2], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-    if checkEulerModificadoV.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler modificado")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerMod")
-        solution_tuple = hh.Main()
+def start_simulation():
+    """
+    Funcion que inicia la simulacion de los metodos seleccionados en segundo plano
+    """
+    global procesos, colaAvance, eventoCancelar, enVivo
+
+    if pendientes:
+        print("Ya hay una simulacion en curso")
+        return
+
+    print("Iniciando simulacion...")
+
+    for checkV, metodo, nombre in metodosInterfaz:
+        if checkV.get() != 1:
+            continue
+        print(nombre)
+        hh = crear_modelo(metodo)
+
+        # Si ya se simulo con los mismos parametros no se vuelve a calcular
+        valores = cache.obtener(hh.clave(hh.estadoInicialPorDefecto(), porTramos=True), hh.disposicion(porTramos=True)["campos"])
+        if valores is not None:
+            hh.estados = valores["estados"]
+            plot_solution(hh, hh.resultado(hh.estados))
+            continue
+
+        if procesos is None:
+            administrador = multiprocessing.Manager()
+            colaAvance = administrador.Queue()
+            eventoCancelar = administrador.Event()
+            procesos = ProcessPoolExecutor(max_workers=len(metodosInterfaz))
+        eventoCancelar.clear()
+        # Solo un metodo se dibuja en vivo; los demas mandan el avance sin datos
+        variable = None
+        if enVivo is None and variable_seleccionada() is not None:
+            enVivo = nombre
+            variable = variable_seleccionada()
+            grafica.iniciarEnVivo(hh.tiempoInicio, hh.tiempos(hh.nPuntos - 1, hh.nPuntos)[0])
+        pendientes[nombre] = (procesos.submit(simularEnProceso, hh, nombre, colaAvance, eventoCancelar, 2000, variable), hh)
+        avance[nombre] = 0.0
+
+    if pendientes:
+        window.after(100, check_simulations)
+
+
+def check_simulations():
+    """
+    Funcion que revisa el avance de las simulaciones en segundo plano y grafica las que terminaron
+    """
+    global enVivo
+
+    while True:
+        try:
+            nombre, fraccion, t, y = colaAvance.get_nowait()
+        except queue.Empty:
+            break
+        avance[nombre] = fraccion
+        if nombre == enVivo and y is not None:
+            grafica.agregar(t, y)
+    grafica.dibujarEnVivo()
+
+    for nombre, (futuro, hh) in list(pendientes.items()):
+        if not futuro.done():
+            continue
+        del pendientes[nombre]
+        del avance[nombre]
+        if nombre == enVivo:
+            enVivo = None
+        try:
+            estados = futuro.result()
+        except Exception as error:
+            print(nombre + ": error en la simulacion: " + str(error))
+            continue
+        if estados is None:
+            print(nombre + ": simulacion cancelada")
+            continue
+        # simularEnProceso integra por tramos: se guarda con esa clave (ver HodgkinHuxley.disposicion)
+        cache.guardar(hh.clave(hh.estadoInicialPorDefecto(), porTramos=True), {"estados": estados})
+        hh.estados = estados
+        plot_solution(hh, hh.resultado(estados))
+
+    avanceVar.set("   ".join(nombre + ": " + str(int(100 * fraccion)) + "%" for nombre, fraccion in avance.items()))
+    if pendientes:
+        window.after(100, check_simulations)
+
+
+def cancel_simulation():
+    """
+    Funcion que detiene las simulaciones en curso (al terminar el tramo actual)
+    """
+    if eventoCancelar is not None and pendientes:
+        print("Cancelando simulacion...")
+        eventoCancelar.set()
 
 
-        if check6V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[0], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check7V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[1], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-        elif check8V.get() == 1:
-            fig = Figure(figsize=(6, 5), dpi=50)
-            ax = fig.add_subplot()
-            ax.plot(hh.t, solution_tuple[2], label="m")
-            ax.set_xlabel("time (ms)")
-            ax.set_ylabel("voltage (mV)")
-            
-            canvas = FigureCanvasTkAgg(fig, window)
-            canvas.get_tk_widget().place(x=50, y=50)
-
-
-
-def export_to_bin_file_double(V, t):
+def export_to_bin_file_double(V, hh):
     """
     Parametros
     V: vector de voltajes
-    t: vector de tiempos
+    hh: modelo simulado (malla de tiempo, parametros y metodo para el encabezado)
     """
-    # Exportar a binario
+    # Todos los canales de la simulacion en un solo archivo comprimido, uno por metodo
+    # exportado (simulacion_rungeKutta4.hhz, ...) para que no se pisen entre si
+    guardarSimulacion('simulacion_' + hh.metodo + '.hhz', hh, [hh.bloque(hh.t, hh.estados)])
+
+    # Exportar a binario: el tiempo queda implicito en el encabezado (t0, dt) y los valores
+    # se escriben con el dtype del modelo (abrirTraza lo lee del encabezado)
     if check6V.get() == 1:
         print("Exportar a binario")
-        with open('pruebaV.bin', 'wb') as f:
-            for i in range(len(V)):
-                f.write(st.pack('d', V[i]))
-        
-        with open('pruebaT.bin', 'wb') as f:
-            for i in range(len(t)):
-                f.write(st.pack('d', t[i]))
+        guardarTraza('pruebaV.bin', V, hh.h, hh.tiempoInicio, ["V"], hh.descripcion(), hh.dtype)
     
     elif check7V.get() == 1:
         print("Exportar a binario")
-        with open('pruebaGk.bin', 'wb') as f:
-            for i in range(len(V)):
-                f.write(st.pack('d', V[i]))
-        
-        with open('pruebaT.bin', 'wb') as f:
-            for i in range(len(t)):
-                f.write(st.pack('d', t[i]))
+        guardarTraza('pruebaGk.bin', V, hh.h, hh.tiempoInicio, ["Gk"], hh.descripcion(), hh.dtype)
 
     elif check8V.get() == 1:
         print("Exportar a binario")
-        with open('pruebaGna.bin', 'wb') as f:
-            for i in range(len(V)):
-                f.write(st.pack('d', V[i]))
-        
-        with open('pruebaT.bin', 'wb') as f:
-            for i in range(len(t)):
-                f.write(st.pack('d', t[i]))
+        guardarTraza('pruebaGna.bin', V, hh.h, hh.tiempoInicio, ["Gna"], hh.descripcion(), hh.dtype)
 
 
 def import_from_bin_file_double():
     """
     Funcion que importa los datos de un archivo binario
     """
+    # Los archivos antiguos sin encabezado toman los tiempos de pruebaT.bin
     if check6V.get() == 1:
         print("Importar de binario")
-        with open('pruebaT.bin', 'rb') as f:
-            t = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                t.append(st.unpack('d', data)[0])
-        
-        with open('pruebaV.bin', 'rb') as f:
-            V = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                V.append(st.unpack('d', data)[0])
-
-        fig = Figure(figsize=(6, 5), dpi=50)
-        ax = fig.add_subplot()
-        ax.plot(t, V, label="m")
-        ax.set_xlabel("time (ms)")
-        ax.set_ylabel("voltage (mV)")
-        
-        canvas = FigureCanvasTkAgg(fig, window)
-        canvas.get_tk_widget().place(x=50, y=50)
+        traza = abrirTraza('pruebaV.bin', 'pruebaT.bin')
 
     elif check7V.get() == 1:
         print("Importar de binario")
-        with open('pruebaT.bin', 'rb') as f:
-            t = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                t.append(st.unpack('d', data)[0])
-        
-        with open('pruebaGk.bin', 'rb') as f:
-            V = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                V.append(st.unpack('d', data)[0])
-
-        fig = Figure(figsize=(6, 5), dpi=50)
-        ax = fig.add_subplot()
-        ax.plot(t, V, label="m")
-        ax.set_xlabel("time (ms)")
-        ax.set_ylabel("voltage (mV)")
-        
-        canvas = FigureCanvasTkAgg(fig, window)
-        canvas.get_tk_widget().place(x=50, y=50)
+        traza = abrirTraza('pruebaGk.bin', 'pruebaT.bin')
 
     elif check8V.get() == 1:
         print("Importar de binario")
-        with open('pruebaT.bin', 'rb') as f:
-            t = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                t.append(st.unpack('d', data)[0])
-        
-        with open('pruebaGna.bin', 'rb') as f:
-            V = []
-            while True:
-                data = f.read(8)
-                if not data:
-                    break
-                V.append(st.unpack('d', data)[0])
-
-        fig = Figure(figsize=(6, 5), dpi=50)
-        ax = fig.add_subplot()
-        ax.plot(t, V, label="m")
-        ax.set_xlabel("time (ms)")
-        ax.set_ylabel("voltage (mV)")
-        
-        canvas = FigureCanvasTkAgg(fig, window)
-        canvas.get_tk_widget().place(x=50, y=50)
+        traza = abrirTraza('pruebaGna.bin', 'pruebaT.bin')
+
+    else:
+        return
+
+    grafica.mostrar(traza.t, traza.datos[0])
     
 def export():
     """
-    Funcion que exporta los datos a un archivo de texto
+    Funcion que exporta los datos a un archivo binario
     """
     print("Iniciando exportacion de datos...")
-    
-    # Solucion
-    if checkRungeKutta2V.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Runge Kutta 2")
-
-        # Solucion
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "rungeKutta2" )
-        solution_tuple = hh.Main()
-
-        
-        # Exportar a binario
-        if check6V.get() == 1:
-            export_to_bin_file_double(solution_tuple[0], hh.t)
-        
-        elif check7V.get() == 1:
-            export_to_bin_file_double(solution_tuple[1], hh.t)
-
-        elif check8V.get() == 1:
-            export_to_bin_file_double(solution_tuple[2], hh.t)
-
-    if checkRungeKutta4V.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Runge Kutta 4")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "rungeKutta4")
-        solution_tuple = hh.Main()
-
-        # Exportar a binario
-        export_to_bin_file_double(solution_tuple[0], hh.t)
-
-
-    if checkEulerAdelanteV.get() == 1:
 
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler hacia adelante")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerFor")
-        solution_tuple = hh.Main()
-        
-        # Exportar a binario
-        export_to_bin_file_double(solution_tuple[0], hh.t)
-
-
-    if checkEulerAtrasV.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
-
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler hacia atras")
-
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerBack")
+    # Los modelos salen de crear_modelo, como en Simular: los dos usan la misma cache
+    for checkV, metodo, nombre in metodosInterfaz:
+        if checkV.get() != 1:
+            continue
+        print(nombre)
+        hh = crear_modelo(metodo)
         solution_tuple = hh.Main()
 
-        # Exportar a binario
-        export_to_bin_file_double(solution_tuple[0], hh.t)
-
-
-    if checkEulerModificadoV.get() == 1:
-
-        # Variables
-        tiempoSimulacion = float(tiempoSimulacion1Var.get())
-        tiempoInicioEstimulacion = float(tiempoInicioEstimulacion1Var.get())
-        tiempoFinEstimulacion = float(tiempoFinEstimulacion1Var.get())
-        valorEstimulacion = float(ValorEstimulacion1Var.get())
-        h = 0.01
-        cm = 1.0
-        gl = 0.3
+        # Exportar a binario la variable seleccionada (sin seleccion solo se guarda el .hhz)
+        indice = variable_seleccionada()
+        export_to_bin_file_double(solution_tuple[0 if indice is None else indice], hh)
 
-        # Parametros
-        Ek = float(Ek1Var.get())
-        ENa = float(ENa1Var.get())
-        El = float(El1Var.get())
-        gk = float(gk1Var.get())
-        gNa = float(gNa1Var.get())
-        print("Euler modificado")
 
-        hh = HodgkinHuxley(cm, gNa, gk, gl, ENa, Ek, El, tiempoInicioEstimulacion, tiempoFinEstimulacion, h, "eulerMod")
-        solution_tuple = hh.Main()
-
-        # Exportar a binario
-        export_to_bin_file_double(solution_tuple[0], hh.t)
-    
-
-
-simular = tk.Button(window,background= "#8ea7ba", text="Simular",font=('math', 9, 'bold italic'), width=13, command=lambda : start_simulation()).place(x=450, y=550)
-importar = tk.Button(window,background= "#8ea7ba", text="Importar",font=('math', 9, 'bold italic'), width=13, command=lambda : import_from_bin_file_double()).place(x=560, y=550)
-exportar = tk.Button(window,background= "#8ea7ba", text="Exportar",font=('math', 9, 'bold italic'), width=13, command=lambda : export()).place(x=670, y=550)
-cargar = tk.Button(window,background= "#8ea7ba", text="Cargar",font=('math', 9, 'bold italic'), width=13).place(x=670, y=410)
-
-
-
-
-window.mainloop()
\ No newline at end of file
+def main():
+    """
+    Crea la cache, la ventana y los widgets de la interfaz y corre el ciclo de eventos
+    """
+    global cache, window, grafica, tiempoSimulacion1Var, tiempoInicioEstimulacion1Var, tiempoFinEstimulacion1Var, \
+        ValorEstimulacion1Var, Ek1Var, ENa1Var, El1Var, gk1Var, gNa1Var, check6V, check7V, check8V, \
+        checkRungeKutta2V, checkRungeKutta4V, checkEulerAdelanteV, checkEulerAtrasV, checkEulerModificadoV, \
+        metodosInterfaz, avanceVar
+
+    mpl.use('TkAgg')
+
+    # Export y Simular con los mismos parametros reutilizan el resultado en lugar de recalcularlo
+    cache = CacheResultados(directorio="cache_simulaciones")
+
+    # crear ventana:
+    window = tk.Tk()
+
+    # Definir tamaño de ventana:
+    window.geometry("800x600")
+    window.title("Simulación - Modelo Hodkin-Huxley")
+
+    #Variables de texto
+    tiempoSimulacion1Var = tk.StringVar()
+    tiempoInicioEstimulacion1Var = tk.StringVar()
+    tiempoFinEstimulacion1Var = tk.StringVar()
+    ValorEstimulacion1Var = tk.StringVar()
+    Ek1Var = tk.StringVar()
+    ENa1Var = tk.StringVar()
+    El1Var = tk.StringVar()
+    gk1Var = tk.StringVar()
+    gNa1Var = tk.StringVar()
+
+
+    label = tk.Label(window, background= "#8ea7ba", text="Modelo de Hodgkin-Huxley", font=('math', 15, 'bold italic'),height=1 ,width=800).pack()
+
+    # grafica: una sola figura que se actualiza en cada simulacion o importacion
+    grafica = GraficaTraza(window, x=50, y=50)
+
+    #Imagen
+    img = ImageTk.PhotoImage(Image.open("assets/images/Imagen_circuito.png"))
+    lab = tk.Label(image=img)
+    lab.place(x=440,y=50)
+
+    img2 = ImageTk.PhotoImage(Image.open("assets/images/Imagen_tabla.png"))
+    lab = tk.Label(image=img2)
+    lab.place(x=440,y=445)
+
+    # Metodos de Solucion
+    checkRungeKutta2V = tk.IntVar()
+    checkRungeKutta4V = tk.IntVar()
+    checkEulerAdelanteV = tk.IntVar()
+    checkEulerAtrasV = tk.IntVar()
+    checkEulerModificadoV = tk.IntVar()
+
+    metodo = tk.Label(window, text="Método de solución:", font=('math', 9, 'bold italic')).place(x=20, y=320)
+    checkRungeKutta2 = tk.Checkbutton(window, text="Runge-Kutta 2",font=('math', 9, 'italic'), height=1, width=14, variable=checkRungeKutta2V).place(x=15, y=360)
+    checkRungeKutta4 = tk.Checkbutton(window, text="Runge-Kutta 4",font=('math', 9, 'italic'), height=1, width=14, variable=checkRungeKutta4V).place(x=15, y=400)
+    checkEulerAdelante= tk.Checkbutton(window, text="Euler Adelante",font=('math', 9, 'italic'), height=1, width=14, variable=checkEulerAdelanteV).place(x=15, y=440)
+    checkEulerModificado = tk.Checkbutton(window, text="Euler Modificado",font=('math', 9, 'italic'), height=1, width=15, variable=checkEulerAtrasV).place(x=15, y=480)
+    checkEulerAtrás = tk.Checkbutton(window, text="Euler Atrás",font=('math', 9, 'italic'), height=1, width=11, variable=checkEulerModificadoV).place(x=15, y=520)
+
+    # Variables
+    check6V = tk.IntVar()
+    check7V = tk.IntVar()
+    check8V = tk.IntVar()
+
+    variable = tk.Label(window, text="Variables:", font=('math', 9, 'bold italic')).place(x=150, y=320)
+    check6 = tk.Checkbutton(window, text="V(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check6V).place(x=150, y=350)
+    check7 = tk.Checkbutton(window, text="gk(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check7V).place(x=245, y=350)
+    check8 = tk.Checkbutton(window, text="gNa(t)",font=('math', 9, 'italic'), height=1, width=4, variable=check8V).place(x=340, y=350)
+
+    # Parametros
+    parametros = tk.Label(window, text="Parámetros:", font=('math', 9, 'bold italic')).place(x=150, y=380)
+    Ek = tk.Label(window, text="Ek",font=('math', 9, 'italic')).place(x=155, y=410)
+    Ek1 = tk.Entry(window, width=8, textvariable= Ek1Var).place(x=185, y=410)
+    Ek11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=410)
+    ENa = tk.Label(window, text="ENa",font=('math', 9, 'italic')).place(x=155, y=465)
+    ENa1 = tk.Entry(window, width=8, textvariable=ENa1Var).place(x=185, y=465)
+    ENa11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=465)
+    El = tk.Label(window, text="El",font=('math', 9, 'italic')).place(x=155, y=520)
+    El1 = tk.Entry(window, width=8, textvariable=El1Var).place(x=185, y=520)
+    El11 = tk.Label(window, text="mV",font=('math', 9, 'italic')).place(x=230, y=520)
+    gk = tk.Label(window, text="/gk",font=('math', 9, 'italic')).place(x=260, y=430)
+    gk1 = tk.Entry(window, width=8, textvariable=gk1Var).place(x=295, y=430)
+    gk11 = tk.Label(window, text="mS/cm^3",font=('math', 9, 'italic')).place(x=340, y=430)
+    gNa = tk.Label(window, text="/gNa",font=('math', 9, 'italic')).place(x=260, y=490)
+    gNa1 = tk.Entry(window, width=8, textvariable=gNa1Var).place(x=295, y=490)
+    gNa11 = tk.Label(window, text="mS/cm^3",font=('math', 9, 'italic')).place(x=340, y=490)
+
+    # Entrada de texto
+    tiempoSimulacion = tk.Label(window, text="Tiempo de simulacion:",font=('math', 9, 'italic')).place(x=440, y=320)
+    tiempoSimulacion1 = tk.Entry(window, width=8, textvariable=tiempoSimulacion1Var).place(x=630, y=320)
+    tiempoSimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=320)
+    tiempoInicioEstimulacion = tk.Label(window, text="Tiempo de inicio estimulacion:",font=('math', 9, 'italic')).place(x=440, y=340)
+    tiempoInicioEstimulacion1 = tk.Entry(window, width=8, textvariable=tiempoInicioEstimulacion1Var).place(x=630, y=340)
+    tiempoInicioEstimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=340)
+    tiempoFinEstimulacion = tk.Label(window, text="Tiempo de fin estimulacion:",font=('math', 9, 'italic')).place(x=440, y=360)
+    tiempoFinEstimulacion1 = tk.Entry(window, width=8, textvariable=tiempoFinEstimulacion1Var).place(x=630, y=360)
+    tiempoFinEstimulacion11 = tk.Label(window, text="ms",font=('math', 9, 'italic')).place(x=680, y=360)
+    ValorEstimulacion = tk.Label(window, text="Valor estimulacion:",font=('math', 9, 'italic')).place(x=440, y=380)
+    ValorEstimulacion1 = tk.Entry(window, width=8, textvariable=ValorEstimulacion1Var).place(x=630, y=380)
+    ValorEstimulacion11 = tk.Label(window, text="uA/cm^2",font=('math', 9, 'italic')).place(x=680, y=380)
+
+    # ------------------- Variables botones -------------------
+    # Metodos de la interfaz: (variable del checkbox, metodo, nombre)
+    metodosInterfaz = [(checkRungeKutta2V, "rungeKutta2", "Runge Kutta 2"),
+                       (checkRungeKutta4V, "rungeKutta4", "Runge Kutta 4"),
+                       (checkEulerAdelanteV, "eulerFor", "Euler hacia adelante"),
+                       (checkEulerAtrasV, "eulerBack", "Euler hacia atras"),
+                       (checkEulerModificadoV, "eulerMod", "Euler modificado")]
+
+    avanceVar = tk.StringVar()
+    avanceLabel = tk.Label(window, textvariable=avanceVar, font=('math', 9, 'italic')).place(x=50, y=298)
+
+    # Botones
+    simular = tk.Button(window,background= "#8ea7ba", text="Simular",font=('math', 9, 'bold italic'), width=13, command=lambda : start_simulation()).place(x=450, y=550)
+    importar = tk.Button(window,background= "#8ea7ba", text="Importar",font=('math', 9, 'bold italic'), width=13, command=lambda : import_from_bin_file_double()).place(x=560, y=550)
+    exportar = tk.Button(window,background= "#8ea7ba", text="Exportar",font=('math', 9, 'bold italic'), width=13, command=lambda : export()).place(x=670, y=550)
+    cancelar = tk.Button(window,background= "#8ea7ba", text="Cancelar",font=('math', 9, 'bold italic'), width=13, command=lambda : cancel_simulation()).place(x=560, y=410)
+    cargar = tk.Button(window,background= "#8ea7ba", text="Cargar",font=('math', 9, 'bold italic'), width=13).place(x=670, y=410)
+
+    window.mainloop()
+
+
+if __name__ == '__main__':
+    main()
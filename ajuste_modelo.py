@@ -0,0 +1,249 @@
+import os
+import numpy as np
+import scipy.optimize as opt
+from concurrent.futures import ProcessPoolExecutor
+from funciones_modelo import HodgkinHuxleyPoblacion, estimuloPorDefecto
+from caracteristicas_modelo import DetectorPicos, extraerCaracteristicas
+from barridos_modelo import PARAMETROS_BASE, tablaHipercubo
+from archivos_modelo import abrirTraza
+
+#---------------------------------------------------------------- Ajuste de parametros ----------------------------------------------------------------
+# Ajuste de los parametros del modelo a una traza de voltaje registrada (por ejemplo
+# la que lee import_from_bin_file_double). La busqueda global es evolucion diferencial
+# (best/1/bin o rand/1/bin) en el espacio normalizado [0, 1] de los limites, y el mejor
+# candidato se pule con Nelder-Mead. Cada generacion se evalua como una HodgkinHuxleyPoblacion
+# (una fila por candidato), repartida entre procesos.
+#
+# Las perdidas son el RMS de la diferencia de voltaje ("traza"), una distancia entre
+# caracteristicas de disparo ("caracteristicas") o su suma ("ambas"). La suma de
+# cuadrados solo crece durante la simulacion, asi que un candidato se deja de simular
+# en cuanto su RMS parcial supera la cota: en la evolucion diferencial la cota de cada
+# prueba es la perdida del candidato que reemplazaria, y el descarte es exacto. Con
+# caracteristicas se descarta ademas al candidato que ya disparo muchos mas picos
+# que la traza, o cuyo voltaje diverge.
+
+NOMBRES_MODELO = ("cm", "gna", "gk", "gl", "ena", "ek", "el")
+LIMITES_POR_DEFECTO = {"cm": (0.5, 2.0), "gna": (60.0, 180.0), "gk": (18.0, 54.0), "gl": (0.1, 0.6),
+                       "ena": (30.0, 70.0), "ek": (-95.0, -60.0), "el": (-70.0, -40.0)}
+# Escala de cada caracteristica en la distancia (una diferencia de una escala suma 1)
+ESCALAS = {"tiempos": 1.0, "picoV": 5.0, "ancho": 0.2, "ahpV": 2.0}
+
+
+def distanciaCaracteristicas(registro, objetivo, escalas=ESCALAS):
+    """
+    Parametros
+    |  :param registro: caracteristicas del candidato (ver DetectorPicos.registro)
+    |  :param objetivo: caracteristicas de la traza registrada
+    |  :param escalas: escala de cada caracteristica de los picos
+    |  :return: diferencia relativa del numero de picos mas la diferencia media, en escalas,
+    |           de cada caracteristica entre los picos correspondientes (en orden)
+    """
+    n, nObjetivo = len(registro["tiempos"]), len(objetivo["tiempos"])
+    distancia = abs(n - nObjetivo) / max(nObjetivo, 1)
+    k = min(n, nObjetivo)
+    for nombre, escala in escalas.items():
+        diferencia = np.abs(registro[nombre][:k] - objetivo[nombre][:k])
+        diferencia = diferencia[np.isfinite(diferencia)]
+        if len(diferencia):
+            distancia += diferencia.mean() / escala
+    return distancia
+
+
+def _evaluarLote(nombres, filas, base, estimulo, malla, metodo, Vobjetivo, objetivo, perdida, umbral, cotas, pasosBloque):
+    """
+    Simula los candidatos en lote, dejando de simular los que superan su cota
+    |  :return: perdidas (inf para los descartados) y numero de pasos simulados (pasos * candidatos)
+    """
+    valores = dict(base)
+    for j, nombre in enumerate(nombres):
+        valores[nombre] = filas[:, j]
+    parametros = [np.broadcast_to(np.asarray(valores[nombre], dtype=float), (len(filas),)) for nombre in NOMBRES_MODELO]
+    tiempoInicio, tiempoFinal, h = malla
+    cotas = np.broadcast_to(np.asarray(cotas, dtype=float), (len(filas),))
+
+    def crear(indices):
+        # El estado inicial lo lleva el bucle; "clasico" evita calcular y guardar reposos
+        return HodgkinHuxleyPoblacion(*[p[indices] for p in parametros], tiempoInicio, tiempoFinal, h, metodo,
+                                      estadoInicial="clasico", estimulo=estimulo)
+
+    activos = np.arange(len(filas))
+    modelo = crear(activos)
+    # Cada candidato arranca de su reposo (la traza se supone registrada desde el reposo)
+    X = modelo.estadoReposo()
+    ultimoIndice = modelo.nPuntos - 1
+    t = modelo.t
+    sse = np.zeros(len(filas))
+    detectores = [DetectorPicos(umbral) for _ in range(len(filas))] if perdida != "traza" else None
+    limitePicos = None if objetivo is None else len(objetivo["tiempos"]) + max(2, len(objetivo["tiempos"]) // 2)
+    perdidas = np.full(len(filas), np.inf)
+    pasos = 0
+
+    for inicio in range(0, ultimoIndice, pasosBloque):
+        fin = min(inicio + pasosBloque, ultimoIndice)
+        with np.errstate(all="ignore"):
+            Xtramo = modelo.integrarTramo(X[activos], inicio, fin)
+        X[activos] = Xtramo[-1]
+        pasos += (fin - inicio) * len(activos)
+
+        # El primer punto de cada tramo es el ultimo del anterior
+        desde = 0 if inicio == 0 else 1
+        V = Xtramo[desde:, :, 0]
+        sse[activos] += ((V - Vobjetivo[inicio + desde:fin + 1, None])**2).sum(axis=0)
+        descartar = ~np.isfinite(sse[activos])
+        if perdida != "caracteristicas":
+            descartar |= np.sqrt(sse[activos] / len(t)) > cotas[activos]
+        if detectores is not None:
+            for j, i in enumerate(activos):
+                detectores[i].agregar(t[inicio + desde:fin + 1], V[:, j])
+                descartar[j] |= len(detectores[i].tiempos) > limitePicos
+
+        if descartar.all():
+            return perdidas, pasos
+        if descartar.any():
+            activos = activos[~descartar]
+            modelo = crear(activos)
+
+    for i in activos:
+        perdidas[i] = 0.0
+        if perdida != "caracteristicas":
+            perdidas[i] += np.sqrt(sse[i] / len(t))
+        if detectores is not None:
+            perdidas[i] += distanciaCaracteristicas(detectores[i].registro(), objetivo)
+    return perdidas, pasos
+
+
+def ajustar(t, V, parametros=("gk", "gna", "ek", "ena", "el"), limites=None, base=None, estimulo=None, metodo="rungeKutta4",
+            perdida="traza", umbral=0.0, poblacion=None, generaciones=60, estrategia="best1", F=0.7, CR=0.9, tolerancia=1e-3,
+            pulir=True, evaluacionesPulido=None, workers=None, semilla=0, pasosBloque=200):
+    """
+    Ajusta parametros del modelo a una traza de voltaje
+    Parametros
+    |  :param t: tiempos de la traza (malla uniforme; se usa su paso)
+    |  :param V: voltajes registrados
+    |  :param parametros: nombres de los parametros que se ajustan (de cm, gna, gk, gl, ena, ek, el)
+    |  :param limites: diccionario nombre -> (minimo, maximo); por defecto LIMITES_POR_DEFECTO
+    |  :param base: valores de los parametros que no se ajustan (sobre PARAMETROS_BASE)
+    |  :param estimulo: Estimulo con que se registro la traza; por defecto estimuloPorDefecto()
+    |  :param metodo: metodo de HodgkinHuxleyPoblacion
+    |  :param perdida: "traza", "caracteristicas" o "ambas"
+    |  :param umbral: voltaje de deteccion de picos (mV)
+    |  :param poblacion: candidatos por generacion (por defecto 10 por parametro)
+    |  :param generaciones: maximo de generaciones de la evolucion diferencial
+    |  :param estrategia: mutacion de la evolucion diferencial: "best1" (desde el mejor candidato,
+    |                     converge mas rapido) o "rand1" (desde uno al azar, explora mas)
+    |  :param F, CR: factor de mutacion y probabilidad de cruce
+    |  :param tolerancia: se detiene cuando la desviacion de las perdidas es menor que
+    |                     tolerancia por su media
+    |  :param pulir: si es True el mejor candidato se pule con Nelder-Mead
+    |  :param evaluacionesPulido: maximo de evaluaciones de Nelder-Mead (por defecto 30 por parametro)
+    |  :param workers: numero de procesos (por defecto os.cpu_count())
+    |  :param semilla: semilla del generador aleatorio
+    |  :param pasosBloque: pasos entre revisiones de las cotas
+    |  :return: diccionario con parametros (nombre -> valor), perdida, historia (mejor perdida por
+    |           generacion), generaciones, evaluaciones y fraccionSimulada (pasos simulados sobre
+    |           los que se habrian simulado sin descartes)
+    """
+    for nombre in parametros:
+        if nombre not in NOMBRES_MODELO:
+            raise ValueError("Parametro no valido para el ajuste: " + str(nombre))
+    if perdida not in ("traza", "caracteristicas", "ambas"):
+        raise ValueError("Perdida no valida: " + str(perdida))
+    if estrategia not in ("best1", "rand1"):
+        raise ValueError("Estrategia no valida: " + str(estrategia))
+    nombres = list(parametros)
+    limites = dict(LIMITES_POR_DEFECTO, **(limites or {}))
+    minimos = np.array([limites[nombre][0] for nombre in nombres], dtype=float)
+    anchos = np.array([limites[nombre][1] for nombre in nombres], dtype=float) - minimos
+    base = {nombre: valor for nombre, valor in dict(PARAMETROS_BASE, **(base or {})).items() if nombre in NOMBRES_MODELO}
+    estimulo = estimuloPorDefecto() if estimulo is None else estimulo
+    workers = workers or os.cpu_count()
+    poblacion = poblacion or 10 * len(nombres)
+    generador = np.random.default_rng(semilla)
+
+    # La traza se lleva a la malla del modelo
+    t = np.asarray(t, dtype=float)
+    malla = (t[0], t[-1], t[1] - t[0])
+    referencia = HodgkinHuxleyPoblacion(*[base[nombre] for nombre in NOMBRES_MODELO], *malla, metodo, estadoInicial="clasico")
+    Vobjetivo = np.interp(referencia.t, t, np.asarray(V, dtype=float))
+    objetivo = None if perdida == "traza" else extraerCaracteristicas(referencia.t, Vobjetivo, umbral)
+    largo = referencia.nPuntos - 1
+    contador = {"evaluaciones": 0, "pasos": 0, "posibles": 0}
+
+    def evaluar(U, cotas, procesos):
+        filas = minimos + np.clip(U, 0.0, 1.0) * anchos
+        argumentos = (base, estimulo, malla, metodo, Vobjetivo, objetivo, perdida, umbral)
+        cotas = np.broadcast_to(np.asarray(cotas, dtype=float), (len(filas),))
+        if procesos is None:
+            resultados = [_evaluarLote(nombres, filas, *argumentos, cotas, pasosBloque)]
+        else:
+            lote = -(-len(filas) // workers)
+            tareas = [procesos.submit(_evaluarLote, nombres, filas[i:i + lote], *argumentos, cotas[i:i + lote], pasosBloque)
+                      for i in range(0, len(filas), lote)]
+            resultados = [tarea.result() for tarea in tareas]
+        contador["evaluaciones"] += len(filas)
+        contador["pasos"] += sum(pasos for _, pasos in resultados)
+        contador["posibles"] += len(filas) * largo
+        return np.concatenate([perdidas for perdidas, _ in resultados])
+
+    procesos = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # Poblacion inicial por hipercubo latino en [0, 1]
+        _, U = tablaHipercubo({nombre: (0.0, 1.0) for nombre in nombres}, poblacion, semilla)
+        perdidas = evaluar(U, np.inf, procesos)
+        historia = [perdidas.min()]
+
+        generacion = 0
+        for generacion in range(1, generaciones + 1):
+            # Tres candidatos distintos entre si y del que se reemplaza; con best1 el primero
+            # se cambia por el mejor
+            otros = np.array([generador.choice(poblacion - 1, 3, replace=False) for _ in range(poblacion)])
+            otros += otros >= np.arange(poblacion)[:, None]
+            origen = U[np.argmin(perdidas)] if estrategia == "best1" else U[otros[:, 0]]
+            mutantes = origen + F * (U[otros[:, 1]] - U[otros[:, 2]])
+            # Los que se salen de [0, 1] se reflejan hacia adentro
+            mutantes = np.abs(mutantes)
+            mutantes = np.where(mutantes > 1.0, 2.0 - mutantes, mutantes)
+            cruce = generador.random(U.shape) < CR
+            cruce[np.arange(poblacion), generador.integers(len(nombres), size=poblacion)] = True
+            pruebas = np.where(cruce, mutantes, U)
+
+            perdidasPruebas = evaluar(pruebas, perdidas, procesos)
+            mejores = perdidasPruebas < perdidas
+            U[mejores] = pruebas[mejores]
+            perdidas[mejores] = perdidasPruebas[mejores]
+            historia.append(perdidas.min())
+            if np.std(perdidas) <= tolerancia * np.abs(np.mean(perdidas)):
+                break
+
+        mejor = np.argmin(perdidas)
+        u, perdidaMejor = U[mejor], perdidas[mejor]
+        if pulir:
+            # Nelder-Mead necesita los valores reales para ordenar el simplex: sin cota
+            maximo = evaluacionesPulido or 30 * len(nombres)
+            pulido = opt.minimize(lambda x: evaluar(x[None], np.inf, None)[0], u, method="Nelder-Mead",
+                                  bounds=[(0.0, 1.0)] * len(nombres), options={"maxfev": maximo, "xatol": 1e-4, "fatol": 1e-6})
+            if pulido.fun < perdidaMejor:
+                u, perdidaMejor = np.clip(pulido.x, 0.0, 1.0), pulido.fun
+    finally:
+        if procesos is not None:
+            procesos.shutdown()
+
+    valores = minimos + u * anchos
+    return {"parametros": dict(zip(nombres, valores.tolist())), "perdida": float(perdidaMejor), "historia": np.array(historia),
+            "generaciones": generacion, "evaluaciones": contador["evaluaciones"],
+            "fraccionSimulada": contador["pasos"] / max(1, contador["posibles"])}
+
+
+def ajustarArchivo(ruta, rutaTiempos=None, variable="V", **opciones):
+    """
+    Ajusta los parametros a una traza guardada (guardarTraza o los .bin de la interfaz)
+    Parametros
+    |  :param ruta: archivo de la traza
+    |  :param rutaTiempos: archivo de tiempos de los .bin sin encabezado
+    |  :param variable: nombre de la variable de voltaje en la traza
+    |  :param opciones: ver ajustar
+    |  :return: ver ajustar
+    """
+    traza = abrirTraza(ruta, rutaTiempos)
+    V = traza[variable] if variable in traza.variables else traza.datos[0]
+    return ajustar(traza.t, np.array(V), **opciones)
@@ -0,0 +1,467 @@
+import os
+import json
+import zlib
+import numpy as np
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+#---------------------------------------------------------------- Archivos de trazas ----------------------------------------------------------------
+# Formato de traza: firma de 8 bytes, largo del encabezado (uint32 little-endian),
+# encabezado JSON y datos contiguos. El encabezado se rellena con espacios para que
+# los datos empiecen en un multiplo de 64 bytes. Los datos son un arreglo
+# (variables, longitud) en orden C: cada variable queda contigua y se lee con np.memmap.
+
+FIRMA_TRAZA = b"HHTRAZA1"
+ALINEACION = 64
+
+
+def _json(valor):
+    """
+    Convierte a tipos de Python los valores de NumPy que no acepta json
+    """
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError("No se puede guardar en el encabezado: " + repr(valor))
+
+
+def guardarTraza(ruta, datos, dt, t0=0.0, variables=None, metadatos=None, dtype="<f8"):
+    """
+    Guarda una o varias trazas con la misma malla de tiempo t0 + k*dt
+    Parametros
+    |  :param ruta: ruta del archivo
+    |  :param datos: arreglo (longitud,), arreglo (variables, longitud) o diccionario nombre -> arreglo
+    |  :param dt: paso de tiempo
+    |  :param t0: tiempo inicial
+    |  :param variables: nombres de las variables (por defecto "V" o "x0", "x1", ...)
+    |  :param metadatos: diccionario adicional (por ejemplo HodgkinHuxley.descripcion())
+    |  :param dtype: tipo de dato de los valores
+    """
+    if isinstance(datos, dict):
+        variables = list(datos.keys())
+        datos = [datos[nombre] for nombre in variables]
+    datos = np.atleast_2d(np.asarray(datos))
+    if variables is None:
+        variables = ["V"] if len(datos) == 1 else ["x" + str(i) for i in range(len(datos))]
+    if len(variables) != len(datos):
+        raise ValueError("Hay " + str(len(datos)) + " trazas y " + str(len(variables)) + " nombres de variables")
+
+    dtype = np.dtype(dtype)
+    encabezado = {"dtype": dtype.str, "longitud": datos.shape[1], "dt": float(dt), "t0": float(t0),
+                  "variables": list(variables), "metadatos": metadatos or {}}
+    texto = json.dumps(encabezado, default=_json).encode("utf-8")
+    relleno = -(len(FIRMA_TRAZA) + 4 + len(texto)) % ALINEACION
+    texto += b" " * relleno
+
+    with open(ruta, "wb") as f:
+        f.write(FIRMA_TRAZA)
+        f.write(np.uint32(len(texto)).astype("<u4").tobytes())
+        f.write(texto)
+        # Una sola escritura desde el buffer de NumPy
+        f.write(np.ascontiguousarray(datos, dtype=dtype).tobytes())
+
+
+class Traza():
+    """
+    Traza abierta con np.memmap: los datos se leen del disco solo cuando se usan
+    """
+
+    def __init__(self, datos, encabezado, tiempos=None):
+        """
+        Parametros
+        |  :param datos: arreglo (variables, longitud)
+        |  :param encabezado: diccionario con dtype, longitud, dt, t0, variables y metadatos
+        |  :param tiempos: tiempos explicitos (solo archivos sin encabezado)
+        """
+        self.datos = datos
+        self.encabezado = encabezado
+        self.variables = encabezado["variables"]
+        self.dt = encabezado["dt"]
+        self.t0 = encabezado["t0"]
+        self.metadatos = encabezado["metadatos"]
+        self._tiempos = tiempos
+
+    def __len__(self):
+        return self.datos.shape[1]
+
+    def __getitem__(self, nombre):
+        """
+        Parametros
+        |  :param nombre: nombre de la variable
+        |  :return: traza de la variable (vista del memmap, sin copiar)
+        """
+        return self.datos[self.variables.index(nombre)]
+
+    @property
+    def t(self):
+        """
+        Malla de tiempo t0 + k*dt (o los tiempos leidos del archivo de tiempos)
+        """
+        if self._tiempos is not None:
+            return self._tiempos
+        return self.t0 + np.arange(len(self)) * self.dt
+
+
+def _memmap(ruta, dtype, desplazamiento=0):
+    """
+    np.memmap no acepta archivos vacios; en ese caso devuelve un arreglo vacio
+    """
+    dtype = np.dtype(dtype)
+    with open(ruta, "rb") as f:
+        f.seek(0, 2)
+        tamaño = f.tell()
+    if tamaño <= desplazamiento:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode="r", offset=desplazamiento)
+
+
+def abrirTraza(ruta, rutaTiempos=None):
+    """
+    Abre un archivo de traza sin copiar los datos. Los archivos antiguos sin
+    encabezado (doubles crudos, como pruebaV.bin) tambien se aceptan; su malla
+    de tiempo se lee de rutaTiempos (como pruebaT.bin) si se indica.
+    Parametros
+    |  :param ruta: ruta del archivo
+    |  :param rutaTiempos: archivo crudo con los tiempos (solo archivos sin encabezado)
+    |  :return: Traza
+    """
+    with open(ruta, "rb") as f:
+        firma = f.read(len(FIRMA_TRAZA))
+        if firma == FIRMA_TRAZA:
+            largo = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+            encabezado = json.loads(f.read(largo).decode("utf-8"))
+
+    if firma != FIRMA_TRAZA:
+        datos = _memmap(ruta, "<f8")
+        tiempos = None if rutaTiempos is None else _memmap(rutaTiempos, "<f8")
+        dt = float(tiempos[1] - tiempos[0]) if tiempos is not None and len(tiempos) > 1 else 1.0
+        t0 = float(tiempos[0]) if tiempos is not None and len(tiempos) > 0 else 0.0
+        encabezado = {"dtype": "<f8", "longitud": len(datos), "dt": dt, "t0": t0, "variables": ["V"], "metadatos": {}}
+        return Traza(datos.reshape(1, -1), encabezado, tiempos)
+
+    datos = _memmap(ruta, encabezado["dtype"], len(FIRMA_TRAZA) + 4 + largo)
+    datos = datos.reshape(len(encabezado["variables"]), encabezado["longitud"])
+    return Traza(datos, encabezado)
+
+
+#---------------------------------------------------------------- Almacen por bloques ----------------------------------------------------------------
+# Un archivo por simulacion con todos los canales (V, m, h, n, I_Na, I_K, I_L).
+# Cada canal se guarda en bloques de pasosBloque muestras, opcionalmente con
+# byte-shuffle y compresion sin perdida, asi que un canal o una ventana de tiempo se
+# leen descomprimiendo solo los bloques necesarios. El tiempo no se guarda: t = t0 + k*dt.
+# Estructura: firma, bloques comprimidos, indice JSON, desplazamiento del indice
+# (uint64 little-endian) y firma final. El indice va al final para poder escribir
+# los bloques a medida que se simulan (ver HodgkinHuxley.iter_chunks).
+#
+# Para reanudar una simulacion, EscritorAlmacen.puntoControl() baja los bloques a
+# disco y devuelve el desplazamiento y el indice hasta ahi; con continuar= se reabre
+# el archivo, se corta en ese desplazamiento (bloques de despues o un indice viejo se
+# descartan) y se sigue agregando.
+
+FIRMA_ALMACEN = b"HHALMAC1"
+FIRMA_INDICE = b"HHINDICE"
+CANALES = ("V", "m", "h", "n", "I_Na", "I_K", "I_L")
+
+
+def _comprimir(datos, compresion, nivel):
+    if compresion is None:
+        return datos
+    if compresion == "zlib":
+        return zlib.compress(datos, nivel)
+    if compresion == "lz4":
+        return lz4.compress(datos, compression_level=nivel)
+    raise ValueError("Compresion no valida: " + str(compresion))
+
+
+def _descomprimir(datos, compresion):
+    if compresion is None:
+        return datos
+    if compresion == "zlib":
+        return zlib.decompress(datos)
+    return lz4.decompress(datos)
+
+
+def _shuffle(arreglo):
+    """
+    Agrupa el byte j de todos los valores: en trazas suaves los bytes altos se
+    repiten mucho y el compresor los aprovecha
+    """
+    return np.ascontiguousarray(arreglo.reshape(-1).view(np.uint8).reshape(-1, arreglo.dtype.itemsize).T).tobytes()
+
+
+def _unshuffle(datos, dtype):
+    return np.ascontiguousarray(np.frombuffer(datos, dtype=np.uint8).reshape(dtype.itemsize, -1).T).view(dtype).reshape(-1)
+
+
+class EscritorAlmacen():
+    """
+    Escribe un almacen por bloques. Uso:
+        with EscritorAlmacen(ruta, dt, t0) as almacen:
+            for bloque in modelo.iter_chunks():
+                almacen.agregar(bloque)
+    """
+
+    def __init__(self, ruta, dt, t0=0.0, canales=CANALES, metadatos=None, compresion="zlib", nivel=1, shuffle=True, pasosBloque=65536, dtype="<f8",
+                 continuar=None):
+        """
+        Parametros
+        |  :param ruta: ruta del archivo
+        |  :param dt: paso de tiempo
+        |  :param t0: tiempo inicial
+        |  :param canales: nombres de los canales que se guardan
+        |  :param metadatos: diccionario adicional (por ejemplo HodgkinHuxley.descripcion())
+        |  :param compresion: None, "zlib" o "lz4" (si esta instalado)
+        |  :param nivel: nivel de compresion
+        |  :param shuffle: aplicar byte-shuffle antes de comprimir
+        |  :param pasosBloque: numero maximo de muestras por bloque
+        |  :param dtype: tipo de dato de los valores
+        |  :param continuar: diccionario de puntoControl() de un escritor anterior sobre la misma ruta;
+        |                    se siguen agregando bloques desde ahi con su indice y su formato
+        |                    (dt, t0, canales, metadatos, compresion, shuffle y dtype se ignoran)
+        """
+        if continuar is not None:
+            indice = continuar["indice"]
+            compresion, nivel, shuffle = indice["compresion"], continuar["nivel"], indice["shuffle"]
+            canales, dtype, pasosBloque = indice["canales"], indice["dtype"], continuar["pasosBloque"]
+        if compresion == "lz4" and lz4 is None:
+            raise ImportError("La compresion lz4 requiere el paquete lz4")
+        _comprimir(b"", compresion, nivel)
+
+        self.ruta = ruta
+        self.canales = list(canales)
+        self.compresion = compresion
+        self.nivel = nivel
+        self.shuffle = shuffle
+        self.pasosBloque = pasosBloque
+        self.dtype = np.dtype(dtype)
+        if continuar is not None:
+            self.indice = json.loads(json.dumps(continuar["indice"]))
+            self.archivo = open(ruta, "r+b")
+            if self.archivo.read(len(FIRMA_ALMACEN)) != FIRMA_ALMACEN:
+                self.archivo.close()
+                raise ValueError("No es un almacen de simulacion: " + str(ruta))
+            self.archivo.truncate(continuar["desplazamiento"])
+            self.archivo.seek(continuar["desplazamiento"])
+            return
+        self.indice = {"dtype": self.dtype.str, "t0": float(t0), "dt": float(dt), "longitud": 0,
+                       "canales": self.canales, "formas": None, "compresion": compresion, "shuffle": shuffle,
+                       "metadatos": metadatos or {}, "bloques": []}
+        self.archivo = open(ruta, "wb")
+        self.archivo.write(FIRMA_ALMACEN)
+
+    def agregar(self, bloque):
+        """
+        Agrega muestras al final del almacen
+        Parametros
+        |  :param bloque: diccionario canal -> arreglo (..., L) (las demas llaves, como "t", se ignoran)
+        """
+        datos = [np.asarray(bloque[canal], dtype=self.dtype) for canal in self.canales]
+        formas = [list(d.shape[:-1]) for d in datos]
+        if self.indice["formas"] is None:
+            self.indice["formas"] = formas
+        elif formas != self.indice["formas"]:
+            raise ValueError("Los canales cambiaron de forma entre bloques")
+
+        L = datos[0].shape[-1]
+        for inicio in range(0, L, self.pasosBloque):
+            fin = min(inicio + self.pasosBloque, L)
+            entrada = {"inicio": self.indice["longitud"], "longitud": fin - inicio, "canales": []}
+            for d in datos:
+                parte = np.ascontiguousarray(d[..., inicio:fin])
+                crudo = _shuffle(parte) if self.shuffle else parte.tobytes()
+                comprimido = _comprimir(crudo, self.compresion, self.nivel)
+                entrada["canales"].append([self.archivo.tell(), len(comprimido)])
+                self.archivo.write(comprimido)
+            self.indice["bloques"].append(entrada)
+            self.indice["longitud"] += fin - inicio
+
+    def puntoControl(self):
+        """
+        Baja a disco los bloques escritos (flush y fsync)
+        Parametros
+        |  :return: diccionario para continuar= con el desplazamiento, el indice y las opciones
+        """
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        return {"ruta": self.ruta, "desplazamiento": self.archivo.tell(), "indice": json.loads(json.dumps(self.indice, default=_json)),
+                "nivel": self.nivel, "pasosBloque": self.pasosBloque}
+
+    def cerrar(self):
+        """
+        Escribe el indice y cierra el archivo
+        """
+        if self.archivo.closed:
+            return
+        desplazamiento = self.archivo.tell()
+        self.archivo.write(json.dumps(self.indice, default=_json).encode("utf-8"))
+        self.archivo.write(np.uint64(desplazamiento).astype("<u8").tobytes())
+        self.archivo.write(FIRMA_INDICE)
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+class Almacen():
+    """
+    Lectura de un almacen por bloques: solo se leen y descomprimen los bloques
+    del canal y la ventana de tiempo pedidos
+    """
+
+    def __init__(self, ruta):
+        """
+        Parametros
+        |  :param ruta: ruta del archivo
+        """
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            if f.read(len(FIRMA_ALMACEN)) != FIRMA_ALMACEN:
+                raise ValueError("No es un almacen de simulacion: " + str(ruta))
+            f.seek(-(8 + len(FIRMA_INDICE)), 2)
+            final = f.tell()
+            desplazamiento = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            if f.read(len(FIRMA_INDICE)) != FIRMA_INDICE:
+                raise ValueError("Almacen incompleto (sin indice): " + str(ruta))
+            f.seek(desplazamiento)
+            self.indice = json.loads(f.read(final - desplazamiento).decode("utf-8"))
+
+        self.canales = self.indice["canales"]
+        self.dtype = np.dtype(self.indice["dtype"])
+        self.t0 = self.indice["t0"]
+        self.dt = self.indice["dt"]
+        self.metadatos = self.indice["metadatos"]
+        self._inicios = np.array([b["inicio"] for b in self.indice["bloques"]], dtype=np.int64)
+
+    def __len__(self):
+        return self.indice["longitud"]
+
+    def indices(self, tInicio=None, tFin=None):
+        """
+        Parametros
+        |  :param tInicio: tiempo inicial (incluido); por defecto t0
+        |  :param tFin: tiempo final (incluido); por defecto el ultimo
+        |  :return: indices (inicio, fin) de la ventana, fin excluido
+        """
+        inicio = 0 if tInicio is None else max(0, int(np.ceil((tInicio - self.t0) / self.dt - 1e-9)))
+        fin = len(self) if tFin is None else min(len(self), int(np.floor((tFin - self.t0) / self.dt + 1e-9)) + 1)
+        return inicio, max(inicio, fin)
+
+    def tiempos(self, tInicio=None, tFin=None):
+        """
+        Parametros
+        |  :return: tiempos de la ventana (ver indices)
+        """
+        inicio, fin = self.indices(tInicio, tFin)
+        return self.t0 + np.arange(inicio, fin) * self.dt
+
+    def leer(self, canal, tInicio=None, tFin=None):
+        """
+        Parametros
+        |  :param canal: nombre del canal
+        |  :param tInicio: tiempo inicial de la ventana (ver indices)
+        |  :param tFin: tiempo final de la ventana
+        |  :return: arreglo (..., L) con el canal en la ventana
+        """
+        c = self.canales.index(canal)
+        forma = self.indice["formas"][c] if self.indice["formas"] else []
+        inicio, fin = self.indices(tInicio, tFin)
+        salida = np.empty(forma + [fin - inicio], dtype=self.dtype)
+        if fin == inicio:
+            return salida
+
+        primero = np.searchsorted(self._inicios, inicio, side="right") - 1
+        with open(self.ruta, "rb") as f:
+            for bloque in self.indice["bloques"][primero:]:
+                if bloque["inicio"] >= fin:
+                    break
+                desplazamiento, largo = bloque["canales"][c]
+                f.seek(desplazamiento)
+                crudo = _descomprimir(f.read(largo), self.indice["compresion"])
+                if self.indice["shuffle"]:
+                    valores = _unshuffle(crudo, self.dtype)
+                else:
+                    valores = np.frombuffer(crudo, dtype=self.dtype)
+                valores = valores.reshape(forma + [bloque["longitud"]])
+                a = max(inicio, bloque["inicio"])
+                b = min(fin, bloque["inicio"] + bloque["longitud"])
+                salida[..., a - inicio:b - inicio] = valores[..., a - bloque["inicio"]:b - bloque["inicio"]]
+        return salida
+
+
+def guardarSimulacion(ruta, modelo, bloques=None, **opciones):
+    """
+    Guarda todos los canales de una simulacion en un almacen por bloques
+    Parametros
+    |  :param ruta: ruta del archivo
+    |  :param modelo: HodgkinHuxley (o HodgkinHuxleyPoblacion)
+    |  :param bloques: iterable de diccionarios como los de iter_chunks; por defecto
+    |                  se simula con modelo.iter_chunks(pasosBloque) sin guardar todo en memoria
+    |  :param opciones: argumentos de EscritorAlmacen (compresion, nivel, shuffle, pasosBloque, dtype);
+    |                   por defecto el dtype es el del modelo
+    """
+    opciones.setdefault("pasosBloque", 65536)
+    opciones.setdefault("dtype", modelo.dtype)
+    if bloques is None:
+        bloques = modelo.iter_chunks(opciones["pasosBloque"])
+    with EscritorAlmacen(ruta, modelo.h, modelo.tiempoInicio, metadatos=modelo.descripcion(), **opciones) as almacen:
+        for bloque in bloques:
+            almacen.agregar(bloque)
+
+
+#---------------------------------------------------------------- Puntos de control ----------------------------------------------------------------
+# Un punto de control es un diccionario con arreglos (estado del integrador) y valores
+# JSON (indice, tiempo, descripcion del modelo, posicion del almacen). Se guarda como
+# .npz: cada arreglo con su camino de llaves ("integrador/conductancias") y el resto en
+# un JSON. Se escribe a un temporal, se baja a disco y se renombra, asi que en la ruta
+# siempre hay un punto de control completo (el nuevo o el anterior).
+
+
+def _separarArreglos(valor, camino, arreglos):
+    if isinstance(valor, np.ndarray):
+        arreglos[camino] = valor
+        return None
+    if isinstance(valor, dict):
+        return {llave: _separarArreglos(v, camino + "/" + llave if camino else llave, arreglos) for llave, v in valor.items()}
+    return valor
+
+
+def guardarPuntoControl(ruta, punto):
+    """
+    Parametros
+    |  :param ruta: ruta del archivo
+    |  :param punto: diccionario (anidado) de arreglos de NumPy y valores que se pueden pasar a JSON
+    """
+    arreglos = {}
+    resto = _separarArreglos(punto, "", arreglos)
+    texto = json.dumps({"valores": resto, "arreglos": list(arreglos)}, default=_json).encode("utf-8")
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as archivo:
+        np.savez(archivo, _json=np.frombuffer(texto, dtype=np.uint8), **{"a" + str(i): a for i, a in enumerate(arreglos.values())})
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+def leerPuntoControl(ruta):
+    """
+    Parametros
+    |  :param ruta: ruta del archivo
+    |  :return: diccionario como el que se guardo
+    """
+    with np.load(ruta) as archivo:
+        contenido = json.loads(archivo["_json"].tobytes().decode("utf-8"))
+        punto = contenido["valores"]
+        for i, camino in enumerate(contenido["arreglos"]):
+            llaves = camino.split("/")
+            destino = punto
+            for llave in llaves[:-1]:
+                destino = destino[llave]
+            destino[llaves[-1]] = archivo["a" + str(i)]
+    return punto
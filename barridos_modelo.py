@@ -0,0 +1,372 @@
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from funciones_modelo import HodgkinHuxley, HodgkinHuxleyPoblacion, EstimuloPulsos
+from caracteristicas_modelo import DetectorPicos
+
+#---------------------------------------------------------------- Barridos de parametros ----------------------------------------------------------------
+# Cada proceso simula un lote de filas de la tabla de parametros. Con los metodos
+# explicitos de HodgkinHuxleyPoblacion el lote se integra como una poblacion (un paso
+# de NumPy para todas las filas); con los demas, fila por fila. Las trazas se escriben
+# directamente en un arreglo compartido (memoria compartida o .npy en disco), asi que
+# a la salida de cada proceso solo vuelven las metricas.
+
+# Parametros que se pueden barrer; "amplitud" es la del pulso de corriente
+PARAMETROS_BASE = {"cm": 1.0, "gna": 120.0, "gk": 36.0, "gl": 0.3, "ena": 50.0, "ek": -77.0, "el": -54.387, "amplitud": 10.0}
+METRICAS = ("picos", "picoV", "reposoV")
+
+
+def tablaCartesiana(grid):
+    """
+    Parametros
+    |  :param grid: diccionario nombre -> valores
+    |  :return: nombres y arreglo (filas, parametros) con el producto cartesiano
+    """
+    nombres = list(grid.keys())
+    filas = list(itertools.product(*[np.atleast_1d(np.asarray(grid[nombre], dtype=float)) for nombre in nombres]))
+    return nombres, np.array(filas, dtype=float).reshape(-1, len(nombres))
+
+
+def tablaHipercubo(grid, muestras, semilla=0):
+    """
+    Muestreo de hipercubo latino: cada rango se divide en `muestras` intervalos iguales
+    y cada intervalo se usa exactamente una vez por parametro
+    Parametros
+    |  :param grid: diccionario nombre -> (minimo, maximo)
+    |  :param muestras: numero de filas
+    |  :param semilla: semilla del generador aleatorio
+    |  :return: nombres y arreglo (muestras, parametros)
+    """
+    generador = np.random.default_rng(semilla)
+    nombres = list(grid.keys())
+    tabla = np.empty((muestras, len(nombres)))
+    for j, nombre in enumerate(nombres):
+        minimo, maximo = grid[nombre]
+        u = (generador.permutation(muestras) + generador.random(muestras)) / muestras
+        tabla[:, j] = minimo + u * (maximo - minimo)
+    return nombres, tabla
+
+
+def _crucesUmbral(V, umbral):
+    return np.count_nonzero((V[:, :-1] < umbral) & (V[:, 1:] >= umbral), axis=1)
+
+
+def _abrirSalida(salida):
+    """
+    Parametros
+    |  :param salida: ("memoria", nombre, forma), ("disco", ruta) o None
+    |  :return: arreglo de trazas y el objeto que hay que cerrar (o None)
+    """
+    if salida is None:
+        return None, None
+    if salida[0] == "memoria":
+        memoria = shared_memory.SharedMemory(name=salida[1])
+        return np.ndarray(salida[2], dtype=float, buffer=memoria.buf), memoria
+    return np.load(salida[1], mmap_mode="r+"), None
+
+
+def _simularLote(clase, metodo, nombres, filas, inicio, base, pulso, tiempoFinal, h, backend, umbral, salida, pasosBloque):
+    """
+    Simula las filas [inicio, inicio + len(filas)) de la tabla de parametros
+    |  :return: inicio y arreglo (len(filas), 3) con las metricas
+    """
+    valores = dict(base)
+    for j, nombre in enumerate(nombres):
+        valores[nombre] = filas[:, j]
+    parametros = [valores[nombre] for nombre in ("cm", "gna", "gk", "gl", "ena", "ek", "el")]
+    finPulso = tiempoFinal if pulso[1] is None else pulso[1]
+    # Pulso unitario: la amplitud entra como ganancia del estimulo
+    unitario = EstimuloPulsos([(pulso[0], finPulso, 1.0)])
+    amplitud = np.broadcast_to(np.asarray(valores["amplitud"], dtype=float), (len(filas),))
+
+    if clase is HodgkinHuxley and metodo in HodgkinHuxleyPoblacion.metodosLote:
+        modelos = [HodgkinHuxleyPoblacion(*parametros, 0, tiempoFinal, h, metodo, estimulo=unitario, gananciaEstimulo=amplitud)]
+    else:
+        modelos = []
+        for i in range(len(filas)):
+            estimulo = EstimuloPulsos([(pulso[0], finPulso, amplitud[i])])
+            modelos.append(clase(*[np.broadcast_to(p, (len(filas),))[i] for p in parametros], 0, tiempoFinal, h, metodo,
+                                 backend=backend, estimulo=estimulo))
+
+    trazas, memoria = _abrirSalida(salida)
+    metricas = np.zeros((len(filas), 3))
+    metricas[:, 1] = -np.inf
+    # Reposo: ultimo punto antes de que empiece el pulso (el ultimo punto si empieza en t0)
+    iReposo = max(0, int(np.floor(pulso[0] / h + 1e-9)) - 1) if pulso[0] > 0 else modelos[0].nPuntos - 1
+
+    fila = 0
+    for modelo in modelos:
+        n = getattr(modelo, "N", 1)
+        anterior = None
+        indice = 0
+        for t, X in modelo.tramos(pasosBloque):
+            # (L, 4) o (L, n, 4) -> (n, L)
+            V = X[..., 0].reshape(len(t), n).T
+            m = metricas[fila:fila + n]
+            conAnterior = V if anterior is None else np.concatenate((anterior, V), axis=1)
+            m[:, 0] += _crucesUmbral(conAnterior, umbral)
+            m[:, 1] = np.maximum(m[:, 1], V.max(axis=1))
+            if indice <= iReposo < indice + len(t):
+                m[:, 2] = V[:, iReposo - indice]
+            if trazas is not None:
+                trazas[inicio + fila:inicio + fila + n, indice:indice + len(t)] = V
+            anterior = V[:, -1:]
+            indice += len(t)
+        fila += n
+
+    if memoria is not None:
+        del trazas
+        memoria.close()
+    return inicio, metricas
+
+
+def sweep(clase, grid, metodo, workers=None, tiempoFinal=100.0, h=0.01, base=None, pulso=(20.0, None),
+          muestras=None, semilla=0, trazas=False, ruta=None, umbral=0.0, backend=None, lote=None, pasosBloque=20000):
+    """
+    Barrido de parametros en paralelo
+    Parametros
+    |  :param clase: HodgkinHuxley (o una subclase)
+    |  :param grid: diccionario nombre -> valores (producto cartesiano) o nombre -> (minimo, maximo)
+    |               si se indica muestras (hipercubo latino); nombres en PARAMETROS_BASE
+    |  :param metodo: metodo de solucion
+    |  :param workers: numero de procesos (por defecto os.cpu_count())
+    |  :param tiempoFinal: tiempo final de cada simulacion
+    |  :param h: paso de tiempo
+    |  :param base: valores de los parametros que no se barren (sobre PARAMETROS_BASE)
+    |  :param pulso: (inicio, fin) del pulso de corriente; fin None = hasta tiempoFinal
+    |  :param muestras: numero de muestras del hipercubo latino (None = producto cartesiano)
+    |  :param semilla: semilla del hipercubo latino
+    |  :param trazas: si es True tambien se devuelven los voltajes (filas, T)
+    |  :param ruta: archivo .npy donde se escriben las trazas (None = memoria compartida)
+    |  :param umbral: voltaje de deteccion de potenciales de accion
+    |  :param backend: backend de las simulaciones fila por fila (None = el de HodgkinHuxley por defecto)
+    |  :param lote: filas por tarea (por defecto una tarea por proceso en lote, ~4 fila por fila)
+    |  :param pasosBloque: pasos por tramo de integracion (memoria de cada proceso)
+    |  :return: diccionario con nombres, parametros (filas, P), picos, picoV, reposoV y, si trazas, t y V
+    """
+    for nombre in grid:
+        if nombre not in PARAMETROS_BASE:
+            raise ValueError("Parametro no valido para el barrido: " + str(nombre))
+    base = dict(PARAMETROS_BASE, **(base or {}))
+    nombres, tabla = tablaCartesiana(grid) if muestras is None else tablaHipercubo(grid, muestras, semilla)
+    workers = workers or os.cpu_count()
+    filas = len(tabla)
+    # En lote el costo de un paso casi no depende del numero de filas: una tarea por
+    # proceso. Fila por fila, tareas mas chicas reparten mejor la carga
+    enLote = clase is HodgkinHuxley and metodo in HodgkinHuxleyPoblacion.metodosLote
+    lote = lote or max(1, -(-filas // (workers if enLote else 4 * workers)))
+
+    referencia = clase(*[base[nombre] for nombre in ("cm", "gna", "gk", "gl", "ena", "ek", "el")], 0, tiempoFinal, h, metodo)
+    salida = None
+    memoria = None
+    if trazas:
+        forma = (filas, referencia.nPuntos)
+        if ruta is None:
+            memoria = shared_memory.SharedMemory(create=True, size=max(1, filas * referencia.nPuntos * 8))
+            salida = ("memoria", memoria.name, forma)
+        else:
+            np.lib.format.open_memmap(ruta, mode="w+", dtype=float, shape=forma).flush()
+            salida = ("disco", ruta)
+
+    metricas = np.empty((filas, 3))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as procesos:
+            tareas = [procesos.submit(_simularLote, clase, metodo, nombres, tabla[i:i + lote], i, base, pulso,
+                                      tiempoFinal, h, backend, umbral, salida, pasosBloque)
+                      for i in range(0, filas, lote)]
+            for tarea in tareas:
+                inicio, valores = tarea.result()
+                metricas[inicio:inicio + len(valores)] = valores
+
+        resultado = {"nombres": nombres, "parametros": tabla}
+        resultado.update({nombre: metricas[:, j] for j, nombre in enumerate(METRICAS)})
+        resultado["picos"] = resultado["picos"].astype(int)
+        if trazas:
+            resultado["t"] = referencia.t
+            if memoria is not None:
+                resultado["V"] = np.ndarray(salida[2], dtype=float, buffer=memoria.buf).copy()
+            else:
+                resultado["V"] = np.load(ruta, mmap_mode="r")
+        return resultado
+    finally:
+        if memoria is not None:
+            memoria.close()
+            memoria.unlink()
+
+
+#---------------------------------------------------------------- Curva F-I ----------------------------------------------------------------
+# Cada nivel de corriente se integra por tramos y se deja de simular en cuanto converge:
+# a reposo (ningun pico y V casi constante durante un tramo) o a un ciclo limite (los
+# ultimos ISI iguales dentro de una tolerancia). Con los metodos de la poblacion los
+# niveles activos se integran en lote y la poblacion se rehace sin los que convergieron.
+
+ESTADOS_FI = ("reposo", "ciclo", "sin convergencia")
+
+
+def _parametrosModelo(modelo):
+    return [modelo.cm, modelo.gna, modelo.gk, modelo.gl, modelo.ena, modelo.ek, modelo.el]
+
+
+def _simularNiveles(parametros, metodo, h, backend, tabulado, dtype, acumuladorV, corrientes, estadoInicial, tiempoFinal, criterio, umbral,
+                    nISI, toleranciaISI, toleranciaReposo, pasosBloque):
+    """
+    Integra los niveles de corriente (escalon desde t = 0) hasta que cada uno converge
+    Parametros
+    |  :param tabulado, dtype, acumuladorV: los del modelo de fi_curve (ver HodgkinHuxley)
+    |  :param criterio: "ciclo" (reposo o ciclo limite) o "pico" (reposo o primer pico)
+    |  :return: arreglo (niveles, 5) con picos, frecuencia, latencia, estado y tiempo simulado
+    """
+    niveles = len(corrientes)
+    enLote = metodo in HodgkinHuxleyPoblacion.metodosLote
+    detectores = [DetectorPicos(umbral) for _ in range(niveles)]
+    resultado = np.zeros((niveles, 5))
+    resultado[:, 2] = np.nan
+    resultado[:, 3] = ESTADOS_FI.index("sin convergencia")
+    X = np.broadcast_to(np.asarray(estadoInicial, dtype=float), (niveles, 4)).copy()
+    Xanterior = None
+    activos = np.arange(niveles)
+
+    def crear(indices):
+        # Modelos sobre la misma malla [0, tiempoFinal]: los indices de tramo sirven para todos
+        if enLote:
+            return [HodgkinHuxleyPoblacion(*[p[indices] for p in parametros], 0, tiempoFinal, h, metodo, tabulado=tabulado,
+                                           estimulo=EstimuloPulsos([(0.0, tiempoFinal, 1.0)]), gananciaEstimulo=corrientes[indices],
+                                           dtype=dtype, acumuladorV=acumuladorV)]
+        return [HodgkinHuxley(*[p[i] for p in parametros], 0, tiempoFinal, h, metodo, backend=backend, tabulado=tabulado,
+                              estimulo=EstimuloPulsos([(0.0, tiempoFinal, corrientes[i])]), dtype=dtype) for i in indices]
+
+    modelos = crear(activos)
+    ultimoIndice = modelos[0].nPuntos - 1
+    for inicio in range(0, ultimoIndice, pasosBloque):
+        fin = min(inicio + pasosBloque, ultimoIndice)
+        t = modelos[0].tiempos(inicio, fin + 1)
+        if enLote:
+            Xtramo = modelos[0].integrarTramo(X[activos], inicio, fin, None if Xanterior is None else Xanterior[activos])
+        else:
+            Xtramo = np.stack([modelo.integrarTramo(X[i], inicio, fin, None if Xanterior is None else Xanterior[i])
+                               for i, modelo in zip(activos, modelos)], axis=1)
+        X[activos] = Xtramo[-1]
+        if Xanterior is None:
+            Xanterior = np.empty_like(X)
+        Xanterior[activos] = Xtramo[-2]
+
+        # El primer punto de cada tramo es el ultimo del anterior. Los modelos escalares
+        # integran en float y redondean al guardar: los picos se detectan en el dtype del modelo
+        desde = 0 if inicio == 0 else 1
+        V = Xtramo[desde:, :, 0].astype(dtype, copy=False)
+        rangoV = V.max(axis=0) - V.min(axis=0)
+        convergidos = np.zeros(len(activos), dtype=bool)
+        for j, i in enumerate(activos):
+            detector = detectores[i]
+            picosAntes = len(detector.tiempos)
+            detector.agregar(t[desde:], V[:, j])
+            picos = len(detector.tiempos)
+            if picosAntes == 0 and picos > 0:
+                resultado[i, 2] = detector.tiempos[0]
+            if picos == picosAntes and rangoV[j] < toleranciaReposo:
+                resultado[i, 3] = ESTADOS_FI.index("reposo")
+            elif criterio == "pico" and picos > 0:
+                resultado[i, 3] = ESTADOS_FI.index("ciclo")
+            elif picos > nISI:
+                isi = np.diff(detector.tiempos[-nISI - 1:])
+                if isi.max() - isi.min() < toleranciaISI * isi.mean():
+                    resultado[i, 3] = ESTADOS_FI.index("ciclo")
+            convergidos[j] = resultado[i, 3] != ESTADOS_FI.index("sin convergencia")
+            resultado[i, 4] = t[-1]
+
+        if convergidos.all():
+            break
+        if convergidos.any():
+            activos = activos[~convergidos]
+            if enLote:
+                # La poblacion nueva sigue con el V sin redondear de los niveles que quedan (acumuladorV)
+                vAcumulado = modelos[0]._vAcumulado
+                modelos = crear(activos)
+                modelos[0]._vAcumulado = None if vAcumulado is None else vAcumulado[~convergidos]
+            else:
+                modelos = [modelo for modelo, listo in zip(modelos, convergidos) if not listo]
+
+    for i, detector in enumerate(detectores):
+        tiempos = detector.tiempos
+        resultado[i, 0] = len(tiempos)
+        # Frecuencia de estado estacionario: la de los ultimos ISI (0 si converge a reposo)
+        if len(tiempos) > 1 and resultado[i, 3] != ESTADOS_FI.index("reposo"):
+            resultado[i, 1] = 1000.0 / np.mean(np.diff(tiempos[-nISI - 1:]))
+    return resultado
+
+
+def fi_curve(model, currents, tiempoFinal=1000.0, workers=None, estadoInicial=None, umbral=0.0, nISI=4, toleranciaISI=0.01,
+             toleranciaReposo=0.05, duracionBloque=20.0, reobase=True, toleranciaReobase=0.01, divisiones=None):
+    """
+    Curva frecuencia-corriente con terminacion temprana de cada nivel
+    Parametros
+    |  :param model: HodgkinHuxley del que se toman los parametros, h, metodo, backend, tabulado,
+    |                dtype y acumuladorV (este solo en los metodos en lote)
+    |  :param currents: niveles de corriente del escalon (uA/cm^2), que empieza en t = 0
+    |  :param tiempoFinal: duracion maxima de cada nivel (ms)
+    |  :param workers: numero de procesos (por defecto os.cpu_count())
+    |  :param estadoInicial: estado (V, m, h, n) inicial; por defecto el del modelo (su reposo,
+    |                        salvo que se haya indicado otro)
+    |  :param umbral: voltaje de deteccion de picos (mV)
+    |  :param nISI: numero de ISI que se comparan para decidir que el disparo es periodico
+    |  :param toleranciaISI: diferencia relativa maxima entre esos ISI
+    |  :param toleranciaReposo: rango maximo de V (mV) en un tramo sin picos para considerarlo reposo
+    |  :param duracionBloque: duracion de los tramos entre revisiones de convergencia (ms)
+    |  :param reobase: si es True se busca la reobase (minima corriente con al menos un pico)
+    |  :param toleranciaReobase: ancho final del intervalo de la reobase (uA/cm^2)
+    |  :param divisiones: niveles simulados por ronda de la busqueda (por defecto 4 en lote y
+    |                     workers con los demas metodos)
+    |  :return: diccionario con corrientes, frecuencia (Hz), picos, latencia (ms), estado,
+    |           tiempoSimulado (ms) y reobase
+    """
+    corrientes = np.asarray(currents, dtype=float).ravel()
+    workers = workers or os.cpu_count()
+    enLote = model.metodo in HodgkinHuxleyPoblacion.metodosLote
+    parametros = [np.array([float(p)]) for p in _parametrosModelo(model)]
+    pasosBloque = max(1, int(round(duracionBloque / model.h)))
+    if estadoInicial is None:
+        estadoInicial = model.estadoInicialPorDefecto()
+
+    def simular(niveles, criterio, procesos):
+        parametrosNiveles = [np.repeat(p, len(niveles)) for p in parametros]
+        argumentos = (model.metodo, model.h, model.backend, model.tabla is not None, model.dtype.name, model.acumuladorV)
+        opciones = (estadoInicial, tiempoFinal, criterio, umbral, nISI, toleranciaISI, toleranciaReposo, pasosBloque)
+        if procesos is None:
+            return _simularNiveles(parametrosNiveles, *argumentos, niveles, *opciones)
+        # Con los metodos fila por fila cada nivel es una tarea; en lote, una tarea por proceso
+        lote = max(1, -(-len(niveles) // workers)) if enLote else 1
+        tareas = [procesos.submit(_simularNiveles, [p[i:i + lote] for p in parametrosNiveles], *argumentos, niveles[i:i + lote], *opciones)
+                  for i in range(0, len(niveles), lote)]
+        return np.concatenate([tarea.result() for tarea in tareas])
+
+    procesos = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        resultado = simular(corrientes, "ciclo", procesos)
+
+        valorReobase = np.nan
+        if reobase:
+            # Intervalo inicial: el mayor nivel sin picos debajo del menor nivel con picos
+            orden = np.argsort(corrientes)
+            conPicos = resultado[orden, 0] > 0
+            if conPicos.any() and not conPicos[0]:
+                primero = np.argmax(conPicos)
+                bajo, alto = corrientes[orden[primero - 1]], corrientes[orden[primero]]
+                divisiones = divisiones or (4 if enLote else workers)
+                while alto - bajo > toleranciaReobase:
+                    niveles = bajo + (alto - bajo) * np.arange(1, divisiones + 1) / (divisiones + 1)
+                    picos = simular(niveles, "pico", procesos)[:, 0] > 0
+                    if picos.any():
+                        alto = niveles[np.argmax(picos)]
+                        bajo = niveles[np.argmax(picos) - 1] if np.argmax(picos) > 0 else bajo
+                    else:
+                        bajo = niveles[-1]
+                valorReobase = alto
+    finally:
+        if procesos is not None:
+            procesos.shutdown()
+
+    return {"corrientes": corrientes, "frecuencia": resultado[:, 1], "picos": resultado[:, 0].astype(int),
+            "latencia": resultado[:, 2], "estado": np.array(ESTADOS_FI)[resultado[:, 3].astype(int)],
+            "tiempoSimulado": resultado[:, 4], "reobase": valorReobase}
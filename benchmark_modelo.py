@@ -0,0 +1,287 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import scipy
+from scipy.integrate import solve_ivp
+from funciones_modelo import HodgkinHuxley, HodgkinHuxleyPoblacion, estimuloPorDefecto, precompilarKernels, numba
+from caracteristicas_modelo import extraerCaracteristicas
+
+#---------------------------------------------------------------- Benchmark ----------------------------------------------------------------
+# Mide cada metodo de Main() con el estimulo por defecto: tiempo de pared (mejor de
+# varias repeticiones), pasos por segundo, evaluaciones del lado derecho, iteraciones y
+# tiempos por fase (instrumentar), memoria pico (tracemalloc) y error de V contra
+# una referencia DOP853 con tolerancias estrictas. error_max_mV/error_rms_mV se miden
+# por tramos entre los bordes de los pulsos, reiniciando la referencia desde el estado
+# del metodo (referenciaPorTramos); error_global_* compara toda la traza y queda dominado
+# por como cada metodo muestrea I_inj en los bordes, no por el orden del metodo. Los
+# valores medidos quedan solo en el JSON de salida.
+#
+#   python benchmark_modelo.py --salida benchmark.json
+#   python benchmark_modelo.py --metodos rungeKutta4 eulerMod --h 0.01 0.05 --duraciones 100
+
+METODOS = ("odeint", "rungeKutta2", "rungeKutta4", "eulerFor", "eulerBack", "eulerMod", "rushLarsen", "rushLarsen2", "dopri45")
+
+PARAMETROS = (1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387)
+
+
+def modelo(metodo, h, duracion, backend="numpy", instrumentar=False):
+    return HodgkinHuxley(*PARAMETROS, 0, duracion, h, metodo, backend=backend, estimulo=estimuloPorDefecto(), instrumentar=instrumentar)
+
+
+def _tramoReferencia(hh, a, b, desde, y, rtol, atol):
+    """
+    Integra con DOP853 el tramo (a, b) del estimulo, evaluando la corriente del lado interior.
+    Parametros
+    |  :param hh: modelo (parametros y estimulo)
+    |  :param a: borde izquierdo del tramo
+    |  :param b: borde derecho del tramo
+    |  :param desde: instante inicial de la integracion, dentro de [a, b)
+    |  :param y: estado (V, m, h, n) en desde
+    |  :return: solucion de solve_ivp con dense_output
+    """
+    interiorA = np.nextafter(a, b)
+    interiorB = np.nextafter(b, a)
+
+    def f(tiempo, X):
+        V, m, h, n = X
+        I = hh.estimulo.evaluar(min(max(tiempo, interiorA), interiorB))
+        return [(I - hh.I_Na(V, m, h) - hh.I_K(V, n) - hh.I_L(V)) / hh.cm,
+                hh.alfa_m(V)*(1.0-m) - hh.beta_m(V)*m,
+                hh.alfa_h(V)*(1.0-h) - hh.beta_h(V)*h,
+                hh.alfa_n(V)*(1.0-n) - hh.beta_n(V)*n]
+
+    return solve_ivp(f, (desde, b), y, method="DOP853", rtol=rtol, atol=atol, dense_output=True)
+
+
+def referencia(hh, rtol=1e-12, atol=1e-12):
+    """
+    Trayectoria de referencia en la malla de hh con DOP853. Se integra por tramos entre
+    las discontinuidades del estimulo, evaluando la corriente del lado interior de cada tramo.
+    Parametros
+    |  :param hh: modelo (malla, estimulo y estado inicial de su metodo)
+    |  :return: V de referencia en hh.t
+    """
+    t = hh.t
+    t0, tf = t[0], t[-1]
+    bordes = [t0] + [tb for tb in hh.discontinuidadesEstimulo() if t0 < tb < tf] + [tf]
+    y = np.array(hh.estadoInicialPorDefecto(), dtype=float)
+    V = np.empty(len(t))
+    for a, b in zip(bordes[:-1], bordes[1:]):
+        solucion = _tramoReferencia(hh, a, b, a, y, rtol, atol)
+        dentro = (t >= a) & (t <= b)
+        V[dentro] = solucion.sol(t[dentro])[0]
+        y = solucion.y[:, -1]
+    return V
+
+
+def referenciaPorTramos(hh, margen=3, rtol=1e-12, atol=1e-12):
+    """
+    Referencia DOP853 que en cada tramo entre discontinuidades del estimulo arranca del estado
+    del propio metodo margen pasos despues del borde y termina margen pasos antes del siguiente.
+    Cada metodo muestrea I_inj en los bordes a su manera (k4 y k1 de RK4 toman el valor del
+    pulso justo en el borde, eulerFor lo mantiene un paso mas, el punto medio de RK2 no lo ve),
+    asi que no hay una convencion de referencia que sirva para todos; y ese error, contra una
+    sola trayectoria, se arrastra al resto de la traza como corrimiento de los picos y tapa
+    el error de integracion.
+    Parametros
+    |  :param hh: modelo ya corrido con Main() (usa hh.estados)
+    |  :param margen: pasos excluidos a cada lado de cada discontinuidad
+    |  :return: V de referencia en hh.t (NaN fuera de la ventana) y mascara booleana de la ventana
+    """
+    t = hh.t
+    t0, tf = t[0], t[-1]
+    # Un borde justo en t0 o tf (un pulso que empieza al final de la malla) tambien se excluye
+    discontinuidades = {tb for tb in hh.discontinuidadesEstimulo() if t0 <= tb <= tf}
+    bordes = sorted(discontinuidades | {t0, tf})
+    V = np.full(len(t), np.nan)
+    ventana = np.zeros(len(t), dtype=bool)
+    for a, b in zip(bordes[:-1], bordes[1:]):
+        inicio = int(np.searchsorted(t, a)) + (margen if a in discontinuidades else 0)
+        fin = int(np.searchsorted(t, b, side="right")) - 1 - (margen if b in discontinuidades else 0)
+        if fin <= inicio:
+            continue
+        ventana[inicio:fin + 1] = True
+        # Si el metodo ya divergio la ventana queda en NaN y su error se reporta como null
+        y = hh.estados[inicio].astype(float)
+        if np.all(np.isfinite(y)):
+            solucion = _tramoReferencia(hh, a, b, t[inicio], y, rtol, atol)
+            V[inicio:fin + 1] = solucion.sol(t[inicio:fin + 1])[0]
+    return V, ventana
+
+
+def medir(metodo, h, duracion, backend, repeticiones, referencias, margenBordes=3):
+    """
+    Parametros
+    |  :param margenBordes: pasos excluidos alrededor de cada discontinuidad en error_max_mV y error_rms_mV
+    |  :return: diccionario con las mediciones de un caso
+    """
+    hh = modelo(metodo, h, duracion, backend)
+    pasos = hh.nPuntos - 1
+
+    tiempos = []
+    for _ in range(repeticiones):
+        hh = modelo(metodo, h, duracion, backend)
+        inicio = time.perf_counter()
+        V = hh.Main()[0]
+        tiempos.append(time.perf_counter() - inicio)
+    tiempo = min(tiempos)
+
+    # Corridas aparte con la instrumentacion (contadores y fases) y con tracemalloc,
+    # que agrega mucho costo por asignacion y falsearia los tiempos por fase
+    hh = modelo(metodo, h, duracion, backend, instrumentar=True)
+    hh.Main()
+    estadisticas = hh.estadisticas
+    hh = modelo(metodo, h, duracion, backend, instrumentar="memoria")
+    hh.Main()
+    memoriaPico = hh.estadisticas.memoriaPico
+
+    llave = (tuple(hh.estadoInicialPorDefecto()), h, duracion)
+    if llave not in referencias:
+        referencias[llave] = referencia(hh)
+    errorGlobal = V - referencias[llave]
+    Vtramos, ventana = referenciaPorTramos(hh, margenBordes)
+    error = (V - Vtramos)[ventana]
+
+    return {"metodo": metodo, "backend": backend, "h": h, "duracion": duracion, "pasos": pasos,
+            "tiempo_s": tiempo, "tiempos_s": tiempos, "pasos_por_s": pasos / tiempo,
+            "memoria_pico_bytes": memoriaPico, "evaluaciones_rhs": estadisticas.evaluacionesRHS,
+            "iteraciones_solver": estadisticas.iteracionesSolver, "fallos_solver": estadisticas.fallosSolver,
+            "pasos_rechazados": estadisticas.pasosRechazados, "tiempos_fases_s": estadisticas.tiempos,
+            "error_max_mV": _finito(np.max(np.abs(error))), "error_rms_mV": _finito(np.sqrt(np.mean(error**2))),
+            "error_global_max_mV": _finito(np.max(np.abs(errorGlobal))),
+            "error_global_rms_mV": _finito(np.sqrt(np.mean(errorGlobal**2)))}
+
+
+def _finito(valor):
+    # JSON no tiene NaN/inf: los metodos que divergen (eulerBack) se guardan como null
+    valor = float(valor)
+    return valor if np.isfinite(valor) else None
+
+
+def benchmark(metodos=METODOS, pasos=(0.01, 0.02, 0.05), duraciones=(100.0, 300.0), backends=("numpy", "jit"), repeticiones=3, salida=None, margenBordes=3):
+    """
+    Parametros
+    |  :param metodos: metodos de Main() que se miden
+    |  :param pasos: valores de h
+    |  :param duraciones: tiempos finales de simulacion (ms)
+    |  :param backends: backends; "jit" solo se mide en los metodos que tienen kernel
+    |  :param repeticiones: repeticiones de la medicion de tiempo (se reporta la mejor)
+    |  :param salida: archivo JSON donde se escriben los resultados
+    |  :param margenBordes: pasos excluidos alrededor de cada discontinuidad del estimulo en el error
+    |  :return: diccionario con la plataforma, la configuracion y los resultados
+    """
+    precompilarKernels()
+    referencias = {}
+    resultados = []
+    for duracion in duraciones:
+        for h in pasos:
+            for metodo in metodos:
+                for backend in backends:
+                    if backend == "jit" and metodo not in HodgkinHuxley.kernelsJit:
+                        continue
+                    with np.errstate(all="ignore"):
+                        resultado = medir(metodo, h, duracion, backend, repeticiones, referencias, margenBordes)
+                    resultados.append(resultado)
+                    print("{metodo:12s} {backend:6s} h={h:<6} T={duracion:<6} {tiempo_s:9.4f} s {pasos_por_s:12.0f} pasos/s "
+                          "error={error_max_mV}".format(**resultado))
+
+    informe = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "plataforma": {"python": sys.version.split()[0], "numpy": np.__version__, "scipy": scipy.__version__,
+                              "numba": None if numba is None else numba.__version__,
+                              "procesador": platform.processor() or platform.machine(), "sistema": platform.platform()},
+               "configuracion": {"metodos": list(metodos), "h": list(pasos), "duraciones": list(duraciones),
+                                 "backends": list(backends), "repeticiones": repeticiones,
+                                 "referencia": "DOP853 rtol=1e-12 atol=1e-12",
+                                 "ventanaError": {"margen_pasos": margenBordes,
+                                                  "error_max_mV": "por tramos entre discontinuidades del estimulo: la referencia "
+                                                                  "arranca del estado del metodo margen_pasos despues de cada borde "
+                                                                  "y se excluyen margen_pasos antes del siguiente",
+                                                  "error_global_max_mV": "una sola referencia desde el estado inicial, toda la traza; "
+                                                                         "incluye el muestreo de I_inj en los bordes de cada metodo"}},
+               "resultados": resultados}
+    if salida is not None:
+        with open(salida, "w") as f:
+            json.dump(informe, f, indent=2)
+    return informe
+
+
+#---------------------------------------------------------------- Precision ----------------------------------------------------------------
+# Compara las poblaciones en float32 (con y sin acumuladorV) contra la misma poblacion en
+# float64: error de V en toda la traza y, como el error grande esta en los flancos de los
+# picos (un corrimiento pequeño del tiempo del pico da varios mV en la subida), el numero
+# de neuronas con distinta cantidad de picos y la diferencia maxima de los tiempos de pico.
+#
+#   python benchmark_modelo.py --precision                 (escribe precision.json)
+#
+# acumuladorV solo cambia los metodos explicitos: Rush-Larsen no suma incrementos a V.
+
+
+def verificarPrecision(metodos=HodgkinHuxleyPoblacion.metodosLote, N=200, h=0.01, duracion=200.0, gananciaMaxima=2.0, umbral=0.0, salida=None):
+    """
+    Parametros
+    |  :param metodos: metodos de la poblacion que se comparan
+    |  :param N: numero de neuronas; la ganancia del estimulo va de 0 a gananciaMaxima
+    |  :param h: paso de tiempo
+    |  :param duracion: tiempo final de simulacion (ms)
+    |  :param gananciaMaxima: ganancia del estimulo por defecto de la ultima neurona
+    |  :param umbral: voltaje de deteccion de picos (mV)
+    |  :param salida: archivo JSON donde se escriben los resultados
+    |  :return: lista de diccionarios, uno por metodo y variante de float32
+    """
+    ganancias = np.linspace(0.0, gananciaMaxima, N)
+    resultados = []
+    for metodo in metodos:
+        corridas = {}
+        for dtype, acumuladorV in (("float64", False), ("float32", False), ("float32", True)):
+            poblacion = HodgkinHuxleyPoblacion(*PARAMETROS, 0, duracion, h, metodo, gananciaEstimulo=ganancias,
+                                               dtype=dtype, acumuladorV=acumuladorV)
+            inicio = time.perf_counter()
+            V = poblacion.Main()[0]
+            corridas[(dtype, acumuladorV)] = (V, time.perf_counter() - inicio, poblacion.estados.nbytes)
+        Vreferencia, tiempoReferencia, bytesReferencia = corridas[("float64", False)]
+        picosReferencia = extraerCaracteristicas(poblacion.t, Vreferencia, umbral)
+
+        for (dtype, acumuladorV), (V, tiempo, nbytes) in corridas.items():
+            if dtype == "float64":
+                continue
+            error = V.astype(float) - Vreferencia
+            distintas = 0
+            errorPicos = 0.0
+            for referencia, registro in zip(picosReferencia, extraerCaracteristicas(poblacion.t, V, umbral)):
+                if len(referencia["tiempos"]) != len(registro["tiempos"]):
+                    distintas += 1
+                elif len(referencia["tiempos"]):
+                    errorPicos = max(errorPicos, float(np.max(np.abs(referencia["tiempos"] - registro["tiempos"]))))
+            resultado = {"metodo": metodo, "dtype": dtype, "acumuladorV": acumuladorV, "N": N, "h": h, "duracion": duracion,
+                         "error_max_mV": _finito(np.max(np.abs(error))), "error_rms_mV": _finito(np.sqrt(np.mean(error**2))),
+                         "neuronas_con_distintos_picos": distintas, "error_tiempo_picos_max_ms": errorPicos,
+                         "bytes_estados": nbytes, "bytes_estados_float64": bytesReferencia,
+                         "tiempo_s": tiempo, "tiempo_float64_s": tiempoReferencia}
+            resultados.append(resultado)
+            print("{metodo:12s} {dtype} acumuladorV={acumuladorV!s:5s} error_max={error_max_mV:.3g} mV error_rms={error_rms_mV:.3g} mV "
+                  "picos distintos={neuronas_con_distintos_picos} error picos={error_tiempo_picos_max_ms:.3g} ms".format(**resultado))
+    if salida is not None:
+        with open(salida, "w") as f:
+            json.dump(resultados, f, indent=2)
+    return resultados
+
+
+if __name__ == '__main__':
+    argumentos = argparse.ArgumentParser(description="Benchmark de los metodos de HodgkinHuxley.Main()")
+    argumentos.add_argument("--metodos", nargs="+", default=list(METODOS), choices=METODOS)
+    argumentos.add_argument("--h", nargs="+", type=float, default=[0.01, 0.02, 0.05])
+    argumentos.add_argument("--duraciones", nargs="+", type=float, default=[100.0, 300.0])
+    argumentos.add_argument("--backends", nargs="+", default=["numpy", "jit"], choices=["numpy", "jit"])
+    argumentos.add_argument("--repeticiones", type=int, default=3)
+    argumentos.add_argument("--margen", type=int, default=3, help="pasos excluidos alrededor de cada borde del estimulo en el error")
+    argumentos.add_argument("--salida", default=None, help="archivo JSON (por defecto benchmark.json, o precision.json con --precision)")
+    argumentos.add_argument("--precision", action="store_true", help="comparar float32 contra float64 en las poblaciones")
+    opciones = argumentos.parse_args()
+    if opciones.precision:
+        verificarPrecision(salida=opciones.salida or "precision.json")
+        sys.exit()
+    benchmark(opciones.metodos, opciones.h, opciones.duraciones, opciones.backends, opciones.repeticiones,
+              opciones.salida or "benchmark.json", opciones.margen)
@@ -0,0 +1,176 @@
+import numpy as np
+from funciones_modelo import HodgkinHuxleyPoblacion, _jit
+
+#---------------------------------------------------------------- Modelo de cable ----------------------------------------------------------------
+# Neurona de N compartimentos con las corrientes I_Na, I_K e I_L de HodgkinHuxley en
+# cada uno, acoplados por la resistencia axial. La morfologia es un arreglo de padres
+# (-1 en la raiz). En cada paso las compuertas avanzan exactamente con V fija
+# (compuertasExponencial) y luego V se actualiza con Euler implicito; con las
+# compuertas ya conocidas la corriente ionica es lineal en V, asi que el paso es
+# un sistema lineal con la forma del arbol:
+#
+#   (cm/dt + G_i + sum_j a_ij) V_i - sum_j a_ij V_j = cm/dt V_i^n + sum_x g_x E_x + I_inj,i
+#
+# que se resuelve con el algoritmo de Hines (eliminacion de las hojas hacia la raiz y
+# sustitucion de la raiz hacia las hojas) en O(N), numerando los compartimentos de modo
+# que cada padre tenga un indice menor que sus hijos.
+
+
+def ordenHines(padres):
+    """
+    Numeracion en la que cada padre va antes que sus hijos (recorrido en anchura desde la raiz)
+    Parametros
+    |  :param padres: arreglo (N,) con el indice del padre de cada compartimento (-1 en la raiz)
+    |  :return: orden (indices originales en el nuevo orden) y padres en la nueva numeracion
+    """
+    padres = np.asarray(padres, dtype=np.int64)
+    raices = np.flatnonzero(padres < 0)
+    if len(raices) != 1:
+        raise ValueError("La morfologia debe tener exactamente una raiz (padre -1), tiene " + str(len(raices)))
+    hijos = np.argsort(padres, kind="stable")
+    inicios = np.searchsorted(padres[hijos], np.arange(len(padres)))
+    fines = np.searchsorted(padres[hijos], np.arange(len(padres)), side="right")
+
+    orden = [raices[0]]
+    for i in orden:
+        orden.extend(hijos[inicios[i]:fines[i]])
+    if len(orden) != len(padres):
+        raise ValueError("La morfologia no es un arbol conectado")
+    orden = np.array(orden)
+    posicion = np.empty(len(orden), dtype=np.int64)
+    posicion[orden] = np.arange(len(orden))
+    nuevosPadres = np.where(padres[orden] < 0, -1, posicion[np.maximum(padres[orden], 0)])
+    return orden, nuevosPadres
+
+
+@_jit
+def _hines(diagonal, rhs, haciaPadre, desdePadre, padres):
+    """
+    Resuelve en el lugar el sistema con forma de arbol (padres[i] < i)
+    Parametros
+    |  :param diagonal: diagonal de la matriz (se modifica)
+    |  :param rhs: lado derecho (se modifica; al final contiene la solucion)
+    |  :param haciaPadre: coeficiente de V[padres[i]] en la fila i
+    |  :param desdePadre: coeficiente de V[i] en la fila padres[i]
+    |  :param padres: padre de cada compartimento en la numeracion de Hines
+    """
+    for i in range(len(rhs) - 1, 0, -1):
+        p = padres[i]
+        factor = desdePadre[i] / diagonal[i]
+        diagonal[p] -= factor * haciaPadre[i]
+        rhs[p] -= factor * rhs[i]
+    rhs[0] /= diagonal[0]
+    for i in range(1, len(rhs)):
+        rhs[i] = (rhs[i] - haciaPadre[i] * rhs[padres[i]]) / diagonal[i]
+
+
+class CableHodgkinHuxley(HodgkinHuxleyPoblacion):
+    """
+    Neurona multicompartimental. Hereda de la poblacion el estado (N, 4), las corrientes
+    vectorizadas y el estimulo por compartimento (gananciaEstimulo); los resultados de
+    Main() son arreglos (N, T) en la numeracion original de los compartimentos.
+    """
+
+    metodosLote = ("hines",)
+
+    def __init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, padres, longitud=10.0, diametro=1.0, ra=35.4,
+                 metodo="hines", estadoInicial=None, tabulado=False, estimulo=None, cache=None, gananciaEstimulo=None, instrumentar=False,
+                 dtype="float64"):
+        """
+        Parametros
+        |  :param cm, gna, gk, gl, ena, ek, el: por unidad de area, escalares o arreglos de tamaño N (ver HodgkinHuxley)
+        |  :param tiempoInicio: tiempo de inicio
+        |  :param tiempoFinal: tiempo final
+        |  :param h: paso de tiempo
+        |  :param padres: arreglo (N,) con el padre de cada compartimento (-1 en la raiz)
+        |  :param longitud: largo de cada compartimento en um (escalar o N)
+        |  :param diametro: diametro de cada compartimento en um (escalar o N)
+        |  :param ra: resistividad axial en ohm cm
+        |  :param metodo: "hines"
+        |  :param estadoInicial, tabulado, estimulo, cache, instrumentar: ver HodgkinHuxleyPoblacion
+        |  :param gananciaEstimulo: factor del estimulo (uA/cm^2) en cada compartimento; por defecto
+        |                           solo en la raiz
+        |  :param dtype: tipo de dato del estado y del sistema de Hines ("float64" o "float32"); V sale
+        |                de resolver el sistema, no de sumar incrementos, asi que no hay acumuladorV
+        """
+        padres = np.asarray(padres, dtype=np.int64)
+        N = len(padres)
+        if gananciaEstimulo is None:
+            gananciaEstimulo = (padres < 0).astype(float)
+
+        HodgkinHuxleyPoblacion.__init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo, estadoInicial=estadoInicial,
+                                        tabulado=tabulado, estimulo=estimulo, cache=cache,
+                                        gananciaEstimulo=np.broadcast_to(np.asarray(gananciaEstimulo, dtype=float), (N,)),
+                                        instrumentar=instrumentar, dtype=dtype)
+        self.padres = padres
+        self.longitud = np.broadcast_to(np.asarray(longitud, dtype=float), (N,)).copy()
+        self.diametro = np.broadcast_to(np.asarray(diametro, dtype=float), (N,)).copy()
+        self.ra = ra
+
+        # Area de membrana (cm^2) y conductancia axial (mS) entre cada compartimento y su
+        # padre: las resistencias de las dos mitades en serie
+        largo = self.longitud * 1e-4
+        radio = self.diametro * 0.5e-4
+        self.area = np.pi * 2.0 * radio * largo
+        mitad = ra * 0.5 * largo / (np.pi * radio**2)
+        hijos = np.flatnonzero(padres >= 0)
+        gAxial = 1e3 / (mitad[hijos] + mitad[padres[hijos]])
+        # a_ij = gAxial / area_i (mS/cm^2): acoplamiento hacia el padre y desde el padre
+        self.acople = np.zeros(N)
+        np.add.at(self.acople, hijos, gAxial / self.area[hijos])
+        np.add.at(self.acople, padres[hijos], gAxial / self.area[padres[hijos]])
+        self.acople = self.acople.astype(self.dtype)
+
+        self.ordenHines, self.padresHines = ordenHines(padres)
+        haciaPadre = np.zeros(N)
+        desdePadre = np.zeros(N)
+        haciaPadre[hijos] = -gAxial / self.area[hijos]
+        desdePadre[hijos] = -gAxial / self.area[padres[hijos]]
+        self.haciaPadreHines = haciaPadre[self.ordenHines].astype(self.dtype)
+        self.desdePadreHines = desdePadre[self.ordenHines].astype(self.dtype)
+
+    def descripcion(self):
+        descripcion = HodgkinHuxleyPoblacion.descripcion(self)
+        descripcion["morfologia"] = {"padres": self.padres.tolist(), "longitud": self.longitud.tolist(),
+                                     "diametro": self.diametro.tolist(), "ra": self.ra}
+        return descripcion
+
+    def resolverVoltaje(self, diagonal, rhs):
+        """
+        Parametros
+        |  :param diagonal: diagonal del sistema (N,) en la numeracion original
+        |  :param rhs: lado derecho (N,) en la numeracion original
+        |  :return: V (N,) en la numeracion original
+        """
+        rhsHines = rhs[self.ordenHines]
+        _hines(diagonal[self.ordenHines], rhsHines, self.haciaPadreHines, self.desdePadreHines, self.padresHines)
+        V = np.empty_like(rhsHines)
+        V[self.ordenHines] = rhsHines
+        return V
+
+    def integrarTramo(self, X0, inicio, fin, Xanterior=None):
+        """
+        Integra el cable entre los indices inicio y fin de la malla de tiempo
+        Parametros
+        |  :param X0: arreglo (N, 4) con (V, m, h, n) en t[inicio]
+        |  :param inicio: indice inicial
+        |  :param fin: indice final (incluido)
+        |  :param Xanterior: no se usa (el metodo es de un paso)
+        |  :return: arreglo (fin - inicio + 1, N, 4) con los estados
+        """
+        t = self.tiempos(inicio, fin + 1)
+        self.prepararCorriente(inicio, fin)
+
+        X = np.empty((len(t), self.N, 4), dtype=self.dtype)
+        X[0] = X0
+        capacidad = self.cm / self.h
+
+        for i in range(1, len(t)):
+            V, m, h, n = X[i - 1].T
+            m, h, n = self.compuertasExponencial(V, m, h, n, self.h)
+            gNa = self.gna * m**3 * h
+            gK = self.gk * n**4
+            diagonal = capacidad + gNa + gK + self.gl + self.acople
+            rhs = capacidad * V + gNa * self.ena + gK * self.ek + self.gl * self.el + self.I_inj(t[i])
+            X[i] = np.stack((self.resolverVoltaje(diagonal, rhs), m, h, n), axis=-1)
+        return X
@@ -0,0 +1,208 @@
+import numpy as np
+
+#---------------------------------------------------------------- Caracteristicas de disparo ----------------------------------------------------------------
+# Deteccion de potenciales de accion por cruce del umbral hacia arriba, con el tiempo
+# del cruce interpolado linealmente entre las dos muestras que lo rodean. Por cada
+# pico se guardan el tiempo, el voltaje maximo, la amplitud (pico menos el minimo
+# previo), el ancho (tiempo sobre el umbral) y el minimo de la post-hiperpolarizacion.
+#
+# DetectorPicos recibe la traza por tramos y mantiene entre un tramo y el siguiente
+# solo el estado del pico en curso (y las ultimas muestras si se piden formas de
+# onda), asi que se puede usar dentro del ciclo de integracion sin guardar la traza.
+# extraerCaracteristicas es lo mismo aplicado a una traza completa.
+
+
+class DetectorPicos():
+    """
+    Detector de picos por tramos. Los cruces del umbral se buscan vectorizados en cada
+    tramo; solo se recorren en Python los cruces (dos por pico), no las muestras.
+    """
+
+    def __init__(self, umbral=0.0, ventana=None):
+        """
+        Parametros
+        |  :param umbral: voltaje de deteccion (mV)
+        |  :param ventana: (antes, despues) en ms para guardar la forma de onda de cada pico
+        |                  alrededor de la primera muestra sobre el umbral (None = no se guardan)
+        """
+        self.umbral = umbral
+        self.ventana = ventana
+        self.tInicio = None
+        self.tFinal = None
+        self._tAnterior = None
+        self._vAnterior = None
+        # Estado del pico en curso: arriba del umbral, extremo del segmento actual
+        self._arriba = False
+        self._enPico = False
+        self._tSubida = np.nan
+        self._extremo = np.inf
+        # Un pico ya terminado espera la post-hiperpolarizacion hasta el siguiente cruce
+        self._esperaAHP = False
+        self.tiempos = []
+        self.picoV = []
+        self.amplitud = []
+        self.ancho = []
+        self.ahpV = []
+        # Formas de onda: historia de las ultimas muestras y formas aun incompletas
+        self._nAntes = 0
+        self._nDespues = 0
+        self._dtFormas = 0.0
+        self._historia = np.empty(0)
+        self._incompletas = []
+        self.formas = []
+
+    def agregar(self, t, V):
+        """
+        Procesa un tramo de la traza (el siguiente en el tiempo)
+        Parametros
+        |  :param t: tiempos del tramo
+        |  :param V: voltajes del tramo
+        """
+        t = np.asarray(t, dtype=float)
+        V = np.asarray(V, dtype=float)
+        if len(V) == 0:
+            return
+        if self.tInicio is None:
+            self._iniciar(t, V)
+        self.tFinal = t[-1]
+
+        # Cruces entre la muestra anterior y cada muestra del tramo
+        tt = np.concatenate(([self._tAnterior], t))
+        VV = np.concatenate(([self._vAnterior], V))
+        arriba = VV >= self.umbral
+        cruces = np.flatnonzero(arriba[1:] != arriba[:-1])
+        tCruces = tt[cruces] + (self.umbral - VV[cruces]) * (tt[cruces + 1] - tt[cruces]) / (VV[cruces + 1] - VV[cruces])
+
+        if self.ventana is not None:
+            extendida = np.concatenate((self._historia, V))
+            self._completarFormas(V)
+
+        # Segmentos del tramo entre cruces: arriba se busca el maximo, abajo el minimo
+        inicios = np.concatenate(([0], cruces))
+        fines = np.concatenate((cruces, [len(V)]))
+        for j in range(len(inicios)):
+            if fines[j] > inicios[j]:
+                segmento = V[inicios[j]:fines[j]]
+                self._extremo = max(self._extremo, segmento.max()) if self._arriba else min(self._extremo, segmento.min())
+            if j == len(cruces):
+                break
+            if self._arriba:
+                self._finPico(tCruces[j])
+            else:
+                self._inicioPico(tCruces[j])
+                if self.ventana is not None:
+                    self._nuevaForma(extendida, len(self._historia) + cruces[j])
+            self._arriba = not self._arriba
+
+        self._tAnterior = t[-1]
+        self._vAnterior = V[-1]
+        if self.ventana is not None and self._nAntes > 0:
+            self._historia = extendida[-self._nAntes:]
+
+    def _iniciar(self, t, V):
+        self.tInicio = t[0]
+        # La primera muestra hace de anterior: si ya esta sobre el umbral no es un pico
+        self._tAnterior = t[0]
+        self._vAnterior = V[0]
+        self._arriba = V[0] >= self.umbral
+        self._extremo = -np.inf if self._arriba else np.inf
+        if self.ventana is not None:
+            # Las formas se toman en muestras con el paso del primer tramo
+            self._dtFormas = t[1] - t[0] if len(t) > 1 else 1.0
+            self._nAntes = int(round(self.ventana[0] / self._dtFormas))
+            self._nDespues = int(round(self.ventana[1] / self._dtFormas))
+            self._historia = np.full(self._nAntes, np.nan)
+
+    def _inicioPico(self, tCruce):
+        # El minimo desde la ultima bajada es la post-hiperpolarizacion del pico anterior
+        # y la base de la amplitud del nuevo
+        if self._esperaAHP:
+            self.ahpV[-1] = self._extremo
+        self._esperaAHP = False
+        self.tiempos.append(tCruce)
+        self.picoV.append(np.nan)
+        self.amplitud.append(-self._extremo)
+        self.ancho.append(np.nan)
+        self.ahpV.append(np.nan)
+        self._enPico = True
+        self._tSubida = tCruce
+        self._extremo = -np.inf
+
+    def _finPico(self, tCruce):
+        if self._enPico:
+            self.picoV[-1] = self._extremo
+            self.amplitud[-1] += self._extremo
+            self.ancho[-1] = tCruce - self._tSubida
+            self._esperaAHP = True
+        self._enPico = False
+        self._extremo = np.inf
+
+    def _nuevaForma(self, extendida, indice):
+        forma = extendida[indice - self._nAntes:indice + self._nDespues + 1]
+        faltan = self._nAntes + self._nDespues + 1 - len(forma)
+        if faltan > 0:
+            self._incompletas.append((len(self.formas), [forma], faltan))
+        self.formas.append(forma)
+
+    def _completarFormas(self, V):
+        restantes = []
+        for indice, partes, faltan in self._incompletas:
+            partes.append(V[:faltan])
+            faltan -= len(partes[-1])
+            if faltan > 0:
+                restantes.append((indice, partes, faltan))
+            else:
+                self.formas[indice] = np.concatenate(partes)
+        self._incompletas = restantes
+
+    def registro(self):
+        """
+        Cierra el pico en curso (si la traza termino sobre el umbral queda sin ancho) y
+        devuelve las caracteristicas
+        Parametros
+        |  :return: diccionario con tiempos (ms), isi (ms), frecuencia (Hz), picoV, amplitud,
+        |           ancho (ms) y ahpV (mV) por pico; duracion y umbral; formas (picos, muestras)
+        |           y tFormas (ms respecto del cruce) si se indico la ventana
+        """
+        picoV = np.array(self.picoV)
+        amplitud = np.array(self.amplitud)
+        ahpV = np.array(self.ahpV)
+        if self._enPico:
+            picoV[-1] = self._extremo
+            amplitud[-1] += self._extremo
+        elif self._esperaAHP and np.isfinite(self._extremo):
+            ahpV[-1] = self._extremo
+
+        tiempos = np.array(self.tiempos)
+        duracion = 0.0 if self.tInicio is None else float(self.tFinal - self.tInicio)
+        registro = {"tiempos": tiempos, "isi": np.diff(tiempos), "frecuencia": 1000.0 * len(tiempos) / duracion if duracion > 0 else 0.0,
+                    "picoV": picoV, "amplitud": amplitud, "ancho": np.array(self.ancho), "ahpV": ahpV,
+                    "duracion": duracion, "umbral": self.umbral}
+
+        if self.ventana is not None:
+            largo = self._nAntes + self._nDespues + 1
+            formas = list(self.formas)
+            # Formas cortadas por el final de la traza: se completan con NaN
+            for indice, partes, faltan in self._incompletas:
+                formas[indice] = np.concatenate(partes + [np.full(faltan, np.nan)])
+            registro["formas"] = np.array(formas).reshape(len(formas), largo)
+            registro["tFormas"] = np.arange(-self._nAntes, self._nDespues + 1) * self._dtFormas
+        return registro
+
+
+def extraerCaracteristicas(t, V, umbral=0.0, ventana=None):
+    """
+    Caracteristicas de disparo de una traza completa
+    Parametros
+    |  :param t: tiempos
+    |  :param V: voltajes (T,) o (N, T) para varias neuronas
+    |  :param umbral: voltaje de deteccion (mV)
+    |  :param ventana: (antes, despues) en ms de las formas de onda (None = no se guardan)
+    |  :return: diccionario (ver DetectorPicos.registro) o lista de diccionarios si V es (N, T)
+    """
+    V = np.asarray(V)
+    if V.ndim == 2:
+        return [extraerCaracteristicas(t, fila, umbral, ventana) for fila in V]
+    detector = DetectorPicos(umbral, ventana)
+    detector.agregar(t, V)
+    return detector.registro()
@@ -0,0 +1,2 @@
+# pytest agrega este directorio a sys.path: los tests importan los modulos del proyecto
+# (funciones_modelo, archivos_modelo, ...) igual que los scripts
@@ -1,11 +1,535 @@
+import math
+import os
+import json
+import time
+import hashlib
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from collections import OrderedDict
 import pylab as plt
 import numpy as np
 from scipy.integrate import odeint
 import scipy.optimize as opt
+from caracteristicas_modelo import DetectorPicos
+from archivos_modelo import EscritorAlmacen, guardarPuntoControl, leerPuntoControl
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _jit(funcion):
+    """
+    Compila la funcion con numba si esta disponible; si no, la deja como Python puro.
+    Con cache=True el codigo compilado se guarda en __pycache__ y se reutiliza
+    entre procesos.
+    """
+    if numba is None:
+        return funcion
+    return numba.njit(cache=True)(funcion)
+
+
+#---------------------------------------------------------------- Kernels compilados ----------------------------------------------------------------
+# Versiones escalares de las ecuaciones del modelo para el backend "jit". El estado
+# se guarda en el orden (V, m, h, n) y los parametros en p = (cm, gna, gk, gl, ena, ek, el).
+# Las operaciones son las mismas que las del backend "numpy" pero numba puede reordenarlas
+# (y math.exp no redondea igual que np.exp), asi que las trazas no coinciden bit a bit: V
+# difiere en menos de 1e-11 mV en los metodos explicitos (se miden hasta 4e-12 mV, no los
+# 1e-12 que se pedian) y en menos de 1e-9 mV en eulerMod, cuyo Newton corta en una
+# correccion relativa de 1e-12 (ver tests/test_kernels.py).
+
+@_jit
+def _tasasKernel(V):
+    """
+    Parametros
+    |  :param V: potencial de membrana
+    |  :return: alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n
+    """
+    alfa_m = 0.1*(V+40.0)/(1.0 - math.exp(-(V+40.0) / 10.0))
+    beta_m = 4.0*math.exp(-(V+65.0) / 18.0)
+    alfa_h = 0.07*math.exp(-(V+65.0) / 20.0)
+    beta_h = 1.0/(1.0 + math.exp(-(V+35.0) / 10.0))
+    alfa_n = 0.01*(V+55.0)/(1.0 - math.exp(-(V+55.0) / 10.0))
+    beta_n = 0.125*math.exp(-(V+65) / 80.0)
+    return alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n
+
+
+@_jit
+def _derivadasKernel(V, m, h, n, I, p):
+    """
+    Parametros
+    |  :param V, m, h, n: variables de estado
+    |  :param I: corriente de inyeccion
+    |  :param p: parametros (cm, gna, gk, gl, ena, ek, el)
+    |  :return: dVdt, dmdt, dhdt, dndt
+    """
+    alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n = _tasasKernel(V)
+    dVdt = (I - p[1] * m**3 * h * (V - p[4]) - p[2] * n**4 * (V - p[5]) - p[3] * (V - p[6])) / p[0]
+    dmdt = alfa_m * (1 - m) - beta_m * m
+    dhdt = alfa_h * (1 - h) - beta_h * h
+    dndt = alfa_n * (1 - n) - beta_n * n
+    return dVdt, dmdt, dhdt, dndt
+
+
+@_jit
+def _kernelRungeKutta2(X0, Iinicio, Imedio, dt, p):
+    """
+    Parametros
+    |  :param X0: estado inicial (V, m, h, n)
+    |  :param Iinicio: corriente en t[i - 1]
+    |  :param Imedio: corriente en t[i - 1] + dt/2
+    |  :param dt: paso de tiempo
+    |  :param p: parametros del modelo
+    |  :return: arreglo (T, 4) con la trayectoria
+    """
+    X = np.empty((Iinicio.shape[0] + 1, 4))
+    X[0, :] = X0
+    for i in range(1, X.shape[0]):
+        V, m, h, n = X[i - 1, 0], X[i - 1, 1], X[i - 1, 2], X[i - 1, 3]
+        vk1, mk1, hk1, nk1 = _derivadasKernel(V, m, h, n, Iinicio[i - 1], p)
+        vk2, mk2, hk2, nk2 = _derivadasKernel(V + 0.5 * dt * vk1, m + 0.5 * dt * mk1, h + 0.5 * dt * hk1, n + 0.5 * dt * nk1, Imedio[i - 1], p)
+        X[i, 0] = V + dt * vk2
+        X[i, 1] = m + dt * mk2
+        X[i, 2] = h + dt * hk2
+        X[i, 3] = n + dt * nk2
+    return X
+
+
+@_jit
+def _kernelRungeKutta4(X0, Iinicio, Imedio, Ifin, dt, p):
+    """
+    Parametros
+    |  :param X0: estado inicial (V, m, h, n)
+    |  :param Iinicio: corriente en t[i - 1]
+    |  :param Imedio: corriente en t[i - 1] + dt/2
+    |  :param Ifin: corriente en t[i - 1] + dt
+    |  :param dt: paso de tiempo
+    |  :param p: parametros del modelo
+    |  :return: arreglo (T, 4) con la trayectoria
+    """
+    X = np.empty((Iinicio.shape[0] + 1, 4))
+    X[0, :] = X0
+    for i in range(1, X.shape[0]):
+        V, m, h, n = X[i - 1, 0], X[i - 1, 1], X[i - 1, 2], X[i - 1, 3]
+        vk1, mk1, hk1, nk1 = _derivadasKernel(V, m, h, n, Iinicio[i - 1], p)
+        vk2, mk2, hk2, nk2 = _derivadasKernel(V + 0.5 * dt * vk1, m + 0.5 * dt * mk1, h + 0.5 * dt * hk1, n + 0.5 * dt * nk1, Imedio[i - 1], p)
+        vk3, mk3, hk3, nk3 = _derivadasKernel(V + 0.5 * dt * vk2, m + 0.5 * dt * mk2, h + 0.5 * dt * hk2, n + 0.5 * dt * nk2, Imedio[i - 1], p)
+        vk4, mk4, hk4, nk4 = _derivadasKernel(V + dt * vk3, m + dt * mk3, h + dt * hk3, n + dt * nk3, Ifin[i - 1], p)
+        X[i, 0] = V + (dt / 6) * (vk1 + 2 * vk2 + 2 * vk3 + vk4)
+        X[i, 1] = m + (dt / 6) * (mk1 + 2 * mk2 + 2 * mk3 + mk4)
+        X[i, 2] = h + (dt / 6) * (hk1 + 2 * hk2 + 2 * hk3 + hk4)
+        X[i, 3] = n + (dt / 6) * (nk1 + 2 * nk2 + 2 * nk3 + nk4)
+    return X
+
+
+@_jit
+def _kernelEulerFor(X0, Isiguiente, dt, p):
+    """
+    Parametros
+    |  :param X0: estado inicial (V, m, h, n)
+    |  :param Isiguiente: corriente en t[i]
+    |  :param dt: paso de tiempo
+    |  :param p: parametros del modelo
+    |  :return: arreglo (T, 4) con la trayectoria
+    """
+    X = np.empty((Isiguiente.shape[0] + 1, 4))
+    X[0, :] = X0
+    for i in range(1, X.shape[0]):
+        V, m, h, n = X[i - 1, 0], X[i - 1, 1], X[i - 1, 2], X[i - 1, 3]
+        dVdt, dmdt, dhdt, dndt = _derivadasKernel(V, m, h, n, Isiguiente[i - 1], p)
+        X[i, 0] = V + dt * dVdt
+        X[i, 1] = m + dt * dmdt
+        X[i, 2] = h + dt * dhdt
+        X[i, 3] = n + dt * dndt
+    return X
+
+
+def _derivadaTasa(V):
+    """
+    Parametros
+    |  :param V: potencial de membrana
+    |  :return: derivadas respecto a V de alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n
+    """
+    # alfa_x = c*u/(1 - exp(-u/10)) tiene una singularidad removible en u = 0
+    u = V + 40.0
+    if abs(u) < 1e-6:
+        dalfa_m = 0.1 * 0.5
+    else:
+        e = math.exp(-u / 10.0)
+        dalfa_m = 0.1 * ((1.0 - e) - u * e / 10.0) / (1.0 - e)**2
+    u = V + 55.0
+    if abs(u) < 1e-6:
+        dalfa_n = 0.01 * 0.5
+    else:
+        e = math.exp(-u / 10.0)
+        dalfa_n = 0.01 * ((1.0 - e) - u * e / 10.0) / (1.0 - e)**2
+    dbeta_m = -4.0*math.exp(-(V+65.0) / 18.0) / 18.0
+    dalfa_h = -0.07*math.exp(-(V+65.0) / 20.0) / 20.0
+    e = math.exp(-(V+35.0) / 10.0)
+    dbeta_h = e / (10.0 * (1.0 + e)**2)
+    dbeta_n = -0.125*math.exp(-(V+65) / 80.0) / 80.0
+    return dalfa_m, dbeta_m, dalfa_h, dbeta_h, dalfa_n, dbeta_n
+
+_derivadaTasaKernel = _jit(_derivadaTasa)
+
+
+@_jit
+def _pasoEulerAtrasKernel(V0, m0, h0, n0, V, m, h, n, I, dt, p, tolerancia, maxIteraciones):
+    """
+    Resuelve un paso de Euler hacia atras Y = X + dt*f(Y) con Newton usando el
+    jacobiano analitico. Las filas de m, h y n solo dependen de V y de si mismas,
+    asi que el sistema 4x4 se reduce en forma cerrada a una ecuacion para dV.
+    Parametros
+    |  :param V0, m0, h0, n0: estado en t[i - 1]
+    |  :param V, m, h, n: estimacion inicial del estado en t[i]
+    |  :param I: corriente de inyeccion en t[i]
+    |  :param dt: paso de tiempo
+    |  :param p: parametros del modelo
+    |  :param tolerancia: tolerancia relativa sobre la correccion de Newton
+    |  :param maxIteraciones: numero maximo de iteraciones
+    |  :return: V, m, h, n, iteraciones (negativo si no converge)
+    """
+    cm, gna, gk, gl, ena, ek, el = p[0], p[1], p[2], p[3], p[4], p[5], p[6]
+    for iteracion in range(1, maxIteraciones + 1):
+        dVdt, dmdt, dhdt, dndt = _derivadasKernel(V, m, h, n, I, p)
+        alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n = _tasasKernel(V)
+        dalfa_m, dbeta_m, dalfa_h, dbeta_h, dalfa_n, dbeta_n = _derivadaTasaKernel(V)
+
+        # Residuos G = Y - X - dt*f(Y)
+        GV = V - V0 - dt * dVdt
+        Gm = m - m0 - dt * dmdt
+        Gh = h - h0 - dt * dhdt
+        Gn = n - n0 - dt * dndt
+
+        # Derivadas parciales de f (ver f_v, f_m, f_h y f_n)
+        fVV = -(gna * m**3 * h + gk * n**4 + gl) / cm
+        fVm = -gna * (3 * m**2) * h * (V - ena) / cm
+        fVh = -gna * m**3 * (V - ena) / cm
+        fVn = -gk * (4 * n**3) * (V - ek) / cm
+        fmV = dalfa_m * (1 - m) - dbeta_m * m
+        fhV = dalfa_h * (1 - h) - dbeta_h * h
+        fnV = dalfa_n * (1 - n) - dbeta_n * n
+        Dm = 1 + dt * (alfa_m + beta_m)
+        Dh = 1 + dt * (alfa_h + beta_h)
+        Dn = 1 + dt * (alfa_n + beta_n)
+
+        dV = (-GV - dt * (fVm * Gm / Dm + fVh * Gh / Dh + fVn * Gn / Dn)) / \
+             (1 - dt * fVV - dt**2 * (fVm * fmV / Dm + fVh * fhV / Dh + fVn * fnV / Dn))
+        dm = (-Gm + dt * fmV * dV) / Dm
+        dh = (-Gh + dt * fhV * dV) / Dh
+        dn = (-Gn + dt * fnV * dV) / Dn
+
+        V += dV
+        m += dm
+        h += dh
+        n += dn
+
+        if abs(dV) <= tolerancia * (1.0 + abs(V)) and max(abs(dm), abs(dh), abs(dn)) <= tolerancia:
+            return V, m, h, n, iteracion
+    return V, m, h, n, -maxIteraciones
+
+
+@_jit
+def _kernelEulerAtras(X0, inicial, Isiguiente, dt, p, tolerancia, maxIteraciones):
+    """
+    Parametros
+    |  :param X0: estado inicial (V, m, h, n)
+    |  :param inicial: estimacion inicial del Newton del primer paso
+    |  :param Isiguiente: corriente en t[i]
+    |  :param dt: paso de tiempo
+    |  :param p: parametros del modelo
+    |  :param tolerancia: tolerancia de Newton
+    |  :param maxIteraciones: numero maximo de iteraciones de Newton por paso
+    |  :return: arreglo (T, 4) con la trayectoria y arreglo (T - 1,) con las iteraciones por paso
+    """
+    X = np.empty((Isiguiente.shape[0] + 1, 4))
+    iteraciones = np.empty(Isiguiente.shape[0], dtype=np.int64)
+    X[0, :] = X0
+    for i in range(1, X.shape[0]):
+        # Estimacion inicial: extrapolacion lineal de los dos pasos anteriores
+        if i > 1:
+            V, m, h, n = (2 * X[i - 1, 0] - X[i - 2, 0], 2 * X[i - 1, 1] - X[i - 2, 1],
+                          2 * X[i - 1, 2] - X[i - 2, 2], 2 * X[i - 1, 3] - X[i - 2, 3])
+        else:
+            V, m, h, n = inicial[0], inicial[1], inicial[2], inicial[3]
+        V, m, h, n, k = _pasoEulerAtrasKernel(X[i - 1, 0], X[i - 1, 1], X[i - 1, 2], X[i - 1, 3], V, m, h, n,
+                                             Isiguiente[i - 1], dt, p, tolerancia, maxIteraciones)
+        X[i, 0] = V
+        X[i, 1] = m
+        X[i, 2] = h
+        X[i, 3] = n
+        iteraciones[i - 1] = k
+    return X, iteraciones
+
+
+def precompilarKernels():
+    """
+    Fuerza la compilacion (o la carga desde la cache en disco) de los kernels del
+    backend "jit" para que la primera simulacion no pague el costo de compilar.
+    """
+    p = np.array([1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387])
+    X0 = np.array([-65.0, 0.5, 0.4, 0.05])
+    # Las mismas rebanadas con paso de corrienteMalla que usa _tramoKernel: numba
+    # compila una version distinta para arreglos no contiguos
+    malla = np.zeros(3)
+    Iinicio, Imedio, Ifin = malla[0:-1:2], malla[1::2], malla[2::2]
+    _kernelRungeKutta2(X0, Iinicio, Imedio, 0.01, p)
+    _kernelRungeKutta4(X0, Iinicio, Imedio, Ifin, 0.01, p)
+    _kernelEulerFor(X0, Ifin, 0.01, p)
+    _kernelEulerAtras(X0, X0, Ifin, 0.01, p, 1e-13, 50)
+
+#---------------------------------------------------------------- Estimulos ----------------------------------------------------------------
+
+class Estimulo():
+    """
+    Protocolo de corriente de inyeccion I(t) en uA/cm^2. Las subclases implementan
+    evaluar() sobre arreglos de tiempos; los estimulos se pueden sumar con +.
+    """
+
+    def evaluar(self, t):
+        """
+        Parametros
+        |  :param t: tiempo (escalar o arreglo), en ms
+        |  :return: corriente de inyeccion con la misma forma que t
+        """
+        raise NotImplementedError
+
+    def discontinuidades(self):
+        """
+        Parametros
+        |  :return: lista de instantes donde la corriente salta
+        """
+        return []
+
+    def descripcion(self):
+        """
+        Parametros
+        |  :return: diccionario que describe el estimulo de forma estable (tipo y parametros)
+        """
+        return {"tipo": type(self).__name__, **{llave: valor for llave, valor in vars(self).items() if not llave.startswith("_")}}
+
+    def discretizar(self, t):
+        """
+        Parametros
+        |  :param t: arreglo de tiempos
+        |  :return: arreglo con la corriente evaluada en t
+        """
+        return np.asarray(self.evaluar(np.asarray(t, dtype=float)), dtype=float)
+
+    def __add__(self, otro):
+        componentes = []
+        for estimulo in (self, otro):
+            componentes += estimulo.componentes if isinstance(estimulo, EstimuloSuma) else [estimulo]
+        return EstimuloSuma(componentes)
+
+
+class EstimuloPulsos(Estimulo):
+    """
+    Tren de pulsos constantes. Los extremos de cada pulso se incluyen y, si dos pulsos
+    se traslapan, vale el primero de la lista (como los if/elif originales de I_inj).
+    """
+
+    def __init__(self, pulsos):
+        """
+        Parametros
+        |  :param pulsos: lista de (inicio, fin, amplitud), tiempos en ms y amplitud en uA/cm^2
+        """
+        self.pulsos = [(float(inicio), float(fin), float(amplitud)) for inicio, fin, amplitud in pulsos]
+
+    def evaluar(self, t):
+        if np.ndim(t) == 0:
+            for inicio, fin, amplitud in self.pulsos:
+                if (t >= inicio) and (t <= fin):
+                    return amplitud
+            return 0.0
+
+        t = np.asarray(t, dtype=float)
+        I = np.zeros_like(t)
+        for inicio, fin, amplitud in reversed(self.pulsos):
+            I[(t >= inicio) & (t <= fin)] = amplitud
+        return I
+
+    def discontinuidades(self):
+        return sorted({borde for inicio, fin, amplitud in self.pulsos for borde in (inicio, fin)})
+
+
+class EstimuloRampa(Estimulo):
+    """
+    Rampa lineal entre inicio y fin; cero fuera del intervalo
+    """
+
+    def __init__(self, inicio, fin, amplitudInicial, amplitudFinal):
+        """
+        Parametros
+        |  :param inicio: tiempo de inicio de la rampa, en ms
+        |  :param fin: tiempo final de la rampa, en ms
+        |  :param amplitudInicial: corriente en el inicio, en uA/cm^2
+        |  :param amplitudFinal: corriente en el final, en uA/cm^2
+        """
+        self.inicio = float(inicio)
+        self.fin = float(fin)
+        self.amplitudInicial = float(amplitudInicial)
+        self.amplitudFinal = float(amplitudFinal)
+
+    def evaluar(self, t):
+        t = np.asarray(t, dtype=float)
+        fraccion = (t - self.inicio) / (self.fin - self.inicio)
+        I = self.amplitudInicial + fraccion * (self.amplitudFinal - self.amplitudInicial)
+        return np.where((t >= self.inicio) & (t <= self.fin), I, 0.0)
+
+    def discontinuidades(self):
+        return [self.inicio, self.fin]
+
+
+class EstimuloSeno(Estimulo):
+    """
+    Corriente sinusoidal desplazamiento + amplitud*sin(2*pi*frecuencia*t + fase) entre inicio y fin
+    """
+
+    def __init__(self, amplitud, frecuencia, fase=0.0, desplazamiento=0.0, inicio=0.0, fin=np.inf):
+        """
+        Parametros
+        |  :param amplitud: amplitud, en uA/cm^2
+        |  :param frecuencia: frecuencia, en Hz
+        |  :param fase: fase, en radianes
+        |  :param desplazamiento: componente constante, en uA/cm^2
+        |  :param inicio: tiempo de inicio, en ms
+        |  :param fin: tiempo final, en ms
+        """
+        self.amplitud = float(amplitud)
+        self.frecuencia = float(frecuencia)
+        self.fase = float(fase)
+        self.desplazamiento = float(desplazamiento)
+        self.inicio = float(inicio)
+        self.fin = float(fin)
+
+    def evaluar(self, t):
+        t = np.asarray(t, dtype=float)
+        # t esta en ms y la frecuencia en Hz
+        I = self.desplazamiento + self.amplitud * np.sin(2 * np.pi * self.frecuencia * t / 1000.0 + self.fase)
+        return np.where((t >= self.inicio) & (t <= self.fin), I, 0.0)
+
+    def discontinuidades(self):
+        return [borde for borde in (self.inicio, self.fin) if np.isfinite(borde)]
+
+
+class EstimuloMuestreado(Estimulo):
+    """
+    Forma de onda arbitraria dada por muestras, interpolada linealmente; cero fuera de las muestras
+    """
+
+    def __init__(self, tiempos, valores):
+        """
+        Parametros
+        |  :param tiempos: tiempos de las muestras (crecientes), en ms
+        |  :param valores: corriente en cada muestra, en uA/cm^2
+        """
+        self.tiempos = np.asarray(tiempos, dtype=float)
+        self.valores = np.asarray(valores, dtype=float)
+
+    def evaluar(self, t):
+        return np.interp(t, self.tiempos, self.valores, left=0.0, right=0.0)
+
+    def descripcion(self):
+        return {"tipo": type(self).__name__, "tiempos": self.tiempos.tolist(), "valores": self.valores.tolist()}
+
+
+class EstimuloRuido(Estimulo):
+    """
+    Ruido gaussiano constante por tramos de duracion dt entre inicio y fin. Los valores
+    se generan una sola vez a partir de la semilla, asi que evaluar() es reproducible.
+    """
+
+    def __init__(self, media, desviacion, inicio, fin, dt=0.1, semilla=0):
+        """
+        Parametros
+        |  :param media: media de la corriente, en uA/cm^2
+        |  :param desviacion: desviacion estandar, en uA/cm^2
+        |  :param inicio: tiempo de inicio, en ms
+        |  :param fin: tiempo final, en ms
+        |  :param dt: duracion de cada tramo constante, en ms
+        |  :param semilla: semilla del generador aleatorio
+        """
+        self.media = float(media)
+        self.desviacion = float(desviacion)
+        self.inicio = float(inicio)
+        self.fin = float(fin)
+        self.dt = float(dt)
+        self.semilla = int(semilla)
+        tramos = int(np.ceil((self.fin - self.inicio) / self.dt))
+        self._valores = np.random.default_rng(self.semilla).normal(self.media, self.desviacion, max(tramos, 1))
+
+    def evaluar(self, t):
+        t = np.asarray(t, dtype=float)
+        i = np.clip(((t - self.inicio) / self.dt).astype(np.intp), 0, len(self._valores) - 1)
+        return np.where((t >= self.inicio) & (t <= self.fin), self._valores[i], 0.0)
+
+    def discontinuidades(self):
+        return [self.inicio, self.fin]
+
+
+class EstimuloSuma(Estimulo):
+    """
+    Suma de varios estimulos
+    """
+
+    def __init__(self, componentes):
+        """
+        Parametros
+        |  :param componentes: lista de estimulos
+        """
+        self.componentes = list(componentes)
+
+    def evaluar(self, t):
+        return sum(componente.evaluar(t) for componente in self.componentes)
+
+    def discontinuidades(self):
+        return sorted({borde for componente in self.componentes for borde in componente.discontinuidades()})
+
+    def descripcion(self):
+        return {"tipo": type(self).__name__, "componentes": [componente.descripcion() for componente in self.componentes]}
+
+
+def estimuloPorDefecto():
+    """
+    Parametros
+    |  :return: el tren de pulsos original de I_inj (20, 120 y -10 uA/cm^2)
+    """
+    return EstimuloPulsos([(10, 50, 20), (100, 150, 120), (300, 350, -10)])
+
 
 class HodgkinHuxley():
     
-    def __init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo):
+    kernelsJit = ("rungeKutta2", "rungeKutta4", "eulerFor", "eulerMod")
+
+    # Metodos que con backend=None usan el kernel compilado si numba esta instalado: el
+    # Newton de eulerMod en Python es solo 3 a 4 veces mas rapido que fsolve
+    metodosJitPorDefecto = ("eulerMod",)
+
+    # Metodos que acepta Main()
+    metodos = ("odeint", "rungeKutta2", "rungeKutta4", "eulerFor", "eulerBack", "eulerMod",
+               "rushLarsen", "rushLarsen2", "dopri45")
+
+    # Metodos que adaptan el paso dentro de cada llamada: integrar por tramos no da la misma
+    # trayectoria que Main() (solo dentro de las tolerancias)
+    metodosPasoVariable = ("odeint", "dopri45")
+
+    tasas = ("alfa_m", "beta_m", "alfa_h", "beta_h", "alfa_n", "beta_n")
+
+    # Funciones que se cuentan con instrumentar=True. Todos los metodos evaluan alfa_m
+    # una vez por evaluacion del campo vectorial, asi que su cuenta es la de evaluaciones
+    funcionesContadas = ("alfa_m", "dALLdt", "dVdtFunction", "f_v", "pasoEulerAtras", "voltajeExponencial")
+
+    # Evaluaciones del campo vectorial por paso de los kernels compilados (no se pueden contar)
+    etapasKernel = {"rungeKutta2": 2, "rungeKutta4": 4, "eulerFor": 1}
+
+    # Singularidades removibles de las tasas: nombre -> (V, valor limite, pendiente en el limite)
+    singularidadesTasas = {"alfa_m": (-40.0, 1.0, 0.05), "alfa_n": (-55.0, 0.1, 0.005)}
+
+    def __init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo, backend=None, tabulado=False,
+                 rtol=1e-6, atol=1e-8, mallaAdaptativa=False, estimulo=None, cache=None,
+                 instrumentar=False, estadoInicial=None, dtype="float64", acumuladorV=False):
         """
         Parametros
         |  :param cm: membrana de capacitancia, en uF/cm^2
@@ -18,6 +542,26 @@ class HodgkinHuxley():
         |  :param tiempoInicio: tiempo de inicio
         |  :param tiempoFinal: tiempo final
         |  :param h: paso de tiempo
+        |  :param metodo: metodo de solucion
+        |  :param backend: "numpy" (bucle de Python) o "jit" (kernels compilados con numba si esta instalado);
+        |                 None = "jit" en metodosJitPorDefecto si numba esta instalado y tabulado es False
+        |                 (los kernels usan las tasas analiticas), "numpy" en los demas casos
+        |  :param tabulado: si es True las tasas alfa/beta se interpolan de una TablaCinetica compartida
+        |  :param rtol: tolerancia relativa del metodo "dopri45"
+        |  :param atol: tolerancia absoluta del metodo "dopri45"
+        |  :param mallaAdaptativa: si es True "dopri45" devuelve los resultados en su propia malla (self.tAdaptativo)
+        |  :param estimulo: Estimulo con la corriente de inyeccion; por defecto estimuloPorDefecto()
+        |  :param cache: CacheResultados donde Main() busca y guarda los resultados (None = sin cache)
+        |  :param instrumentar: True para dejar en self.estadisticas las EstadisticasSimulacion de cada
+        |                       Main(); "memoria" ademas mide la memoria pico con tracemalloc
+        |  :param estadoInicial: estado (V, m, h, n) de Main(); None = reposo de estos parametros
+        |                        (estadoReposo, guardado en estadosIniciales), "clasico" = el estado
+        |                        fijo de siempre, o el nombre de un estado guardado en estadosIniciales
+        |  :param dtype: tipo de dato de los estados guardados ("float64" o "float32"). Los metodos
+        |                escalares calculan cada paso en float de Python y redondean al guardar; las
+        |                poblaciones, redes y cables integran directamente en este tipo
+        |  :param acumuladorV: con dtype "float32", acumular V en float64 en los metodos explicitos
+        |                      de las poblaciones (las compuertas y las trazas quedan en float32)
         """
 
         self.cm = cm
@@ -35,11 +579,101 @@ class HodgkinHuxley():
         self.el = el
 
         self.h = h
-        
-        self.t = np.arange(tiempoInicio, tiempoFinal + h, h)
+
+        # La malla de tiempo (la misma de np.arange(tiempoInicio, tiempoFinal + h, h)) se
+        # genera por tramos con tiempos(); self.t la construye completa solo si se pide
+        self.tiempoInicio = tiempoInicio
+        self.nPuntos = int(np.ceil((tiempoFinal + h - tiempoInicio) / h))
+        self._deltaT = (tiempoInicio + h) - tiempoInicio
+        self._t = None
 
         self.metodo = metodo
-        
+
+        if backend is None:
+            backend = "jit" if numba is not None and metodo in self.metodosJitPorDefecto and not tabulado else "numpy"
+        self.backend = backend
+
+        self.rtol = rtol
+
+        self.atol = atol
+
+        self.mallaAdaptativa = mallaAdaptativa
+
+        self.evaluacionesRHS = 0
+
+        self.pasosRechazados = 0
+
+        # Newton de eulerMod: iteraciones por paso del ultimo tramo y totales de la corrida
+        self.iteracionesNewton = np.zeros(0, dtype=int)
+
+        self.iteracionesSolver = 0
+
+        self.fallosSolver = 0
+
+        self._pasoAdaptativo = h
+
+        self.estimulo = estimuloPorDefecto() if estimulo is None else estimulo
+
+        self.cache = cache
+
+        self.instrumentar = instrumentar
+
+        self.estadoInicial = estadoInicial
+
+        self.dtype = np.dtype(dtype)
+
+        self.acumuladorV = acumuladorV
+
+        self.estadisticas = None
+
+        # La corriente se evalua una sola vez por tramo en la malla de medio paso t0 + k*h/2,
+        # que contiene todos los instantes que usan los metodos de paso fijo (t, t + h/2, t + h)
+        self.corrienteMalla = np.empty(0)
+        self._inicioMalla = 0
+
+        self.tabla = None
+        if tabulado:
+            self.usarTabla()
+
+    def usarTabla(self):
+        """
+        Reemplaza las tasas alfa/beta por las interpolaciones de la TablaCinetica compartida
+        """
+        self.tabla = tablaCinetica(self)
+        self.errorTabla = self.tabla.errorMaximo
+        # Los atributos de instancia reemplazan a los metodos analiticos sin costo cuando tabulado=False
+        interpoladores = self.tabla.interpoladores()
+        for nombre in self.tasas:
+            setattr(self, nombre, interpoladores[nombre])
+
+    @property
+    def t(self):
+        """
+        Malla de tiempo completa (se construye la primera vez que se usa)
+        """
+        if self._t is None:
+            self._t = self.tiempos(0, self.nPuntos)
+        return self._t
+
+    def tiempos(self, inicio, fin):
+        """
+        Parametros
+        |  :param inicio: primer indice de la malla de tiempo
+        |  :param fin: indice final (excluido)
+        |  :return: tiempos t[inicio:fin] sin construir la malla completa
+        """
+        return self.tiempoInicio + np.arange(inicio, fin) * self._deltaT
+
+    def prepararCorriente(self, inicio, fin):
+        """
+        Discretiza el estimulo en la malla de medio paso entre t[inicio] y t[fin]
+        Parametros
+        |  :param inicio: indice inicial de la malla de tiempo
+        |  :param fin: indice final (incluido)
+        """
+        self._inicioMalla = 2 * inicio
+        self.corrienteMalla = self.estimulo.discretizar(
+            self.tiempoInicio + 0.5 * self.h * np.arange(2 * inicio, 2 * fin + 1))
 
     def alfa_m(self, V):
         """
@@ -129,18 +763,18 @@ class HodgkinHuxley():
     def I_inj(self, t):
         """
         Parametros
-        |  :param t: tiempo
+        |  :param t: tiempo (escalar o arreglo)
         |  :return: corriente de inyeccion
         """
+        if type(t) is np.ndarray and t.ndim > 0:
+            return self.estimulo.evaluar(t)
 
-        if (t>=10) and (t<=50):
-            return 20
-        elif (t>=100) and (t<=150):
-            return 120
-        elif (t>=300) and (t<=350):
-            return -10
-        else:
-            return 0
+        # Los tiempos de la malla de medio paso se leen de corrienteMalla en O(1)
+        k = (t - self.tiempoInicio) * 2.0 / self.h
+        i = int(k + 0.5) - self._inicioMalla
+        if abs(k - i - self._inicioMalla) < 1e-6 and 0 <= i < len(self.corrienteMalla):
+            return self.corrienteMalla[i]
+        return self.estimulo.evaluar(t)
 
     @staticmethod
     def dALLdt(X, t, self):
@@ -214,6 +848,106 @@ class HodgkinHuxley():
         """
         return self.gna * m**3 * (V - self.ena)
 
+    def derivadasTasas(self, V):
+        """
+        Parametros
+        |  :param V: potencial de membrana
+        |  :return: derivadas respecto a V de alfa_m, beta_m, alfa_h, beta_h, alfa_n, beta_n
+        """
+        if np.ndim(V) == 0:
+            # Camino escalar para el bucle de eulerMod (evita np.where sobre escalares)
+            return _derivadaTasa(float(V))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # alfa_m y alfa_n tienen una singularidad removible: ahi la derivada vale c/2
+            u = V + 40.0
+            e = np.exp(-u / 10.0)
+            dalfa_m = np.where(np.abs(u) < 1e-6, 0.1 * 0.5, 0.1 * ((1.0 - e) - u * e / 10.0) / (1.0 - e)**2)
+            u = V + 55.0
+            e = np.exp(-u / 10.0)
+            dalfa_n = np.where(np.abs(u) < 1e-6, 0.01 * 0.5, 0.01 * ((1.0 - e) - u * e / 10.0) / (1.0 - e)**2)
+        dbeta_m = -self.beta_m(V) / 18.0
+        dalfa_h = -self.alfa_h(V) / 20.0
+        e = np.exp(-(V+35.0) / 10.0)
+        dbeta_h = e / (10.0 * (1.0 + e)**2)
+        dbeta_n = -self.beta_n(V) / 80.0
+        return dalfa_m, dbeta_m, dalfa_h, dbeta_h, dalfa_n, dbeta_n
+
+    def jacobiano(self, V, n, m, h):
+        """
+        Jacobiano analitico del sistema en el orden (V, n, m, h) de FEulerBackRoot
+        Parametros
+        |  :param V: potencial de membrana
+        |  :param n: variable de estado n
+        |  :param m: variable de estado m
+        |  :param h: variable de estado h
+        |  :return: matriz 4x4 con las derivadas parciales de (dV/dt, dn/dt, dm/dt, dh/dt)
+        """
+        dalfa_m, dbeta_m, dalfa_h, dbeta_h, dalfa_n, dbeta_n = self.derivadasTasas(V)
+        return np.array([
+            [-(self.gna * m**3 * h + self.gk * n**4 + self.gl) / self.cm,
+             -self.f_n(V, n) / self.cm, -self.f_m(V, m, h) / self.cm, -self.f_h(V, m) / self.cm],
+            [dalfa_n * (1 - n) - dbeta_n * n, -(self.alfa_n(V) + self.beta_n(V)), 0.0, 0.0],
+            [dalfa_m * (1 - m) - dbeta_m * m, 0.0, -(self.alfa_m(V) + self.beta_m(V)), 0.0],
+            [dalfa_h * (1 - h) - dbeta_h * h, 0.0, 0.0, -(self.alfa_h(V) + self.beta_h(V))]])
+
+    def pasoEulerAtras(self, v, n, m, h, t, inicial=None, tolerancia=1e-12, maxIteraciones=50):
+        """
+        Resuelve un paso de Euler hacia atras (la raiz de FEulerBackRoot) con Newton y el
+        jacobiano analitico. Las filas de n, m y h del jacobiano solo tienen la columna de
+        V y la diagonal, asi que cada iteracion se reduce a una ecuacion escalar para dV.
+        Este camino en Python es solo 3 a 4 veces mas rapido que fsolve: la mejora de
+        mas de 20 veces es la de _kernelEulerAtras (backend "jit", el de eulerMod por
+        defecto con numba instalado). Las dos trayectorias difieren de la de fsolve en menos
+        de 1e-9 mV (ver tests/test_euler_mod.py).
+        Parametros
+        |  :param v, n, m, h: estado en el paso anterior
+        |  :param t: tiempo del paso nuevo
+        |  :param inicial: estimacion inicial (V, n, m, h); por defecto el estado anterior
+        |  :param tolerancia: tolerancia relativa sobre la correccion de Newton
+        |  :param maxIteraciones: numero maximo de iteraciones
+        |  :return: V, n, m, h del paso nuevo y numero de iteraciones (negativo si no converge)
+        """
+        V1, n1, m1, h1 = (v, n, m, h) if inicial is None else inicial
+        I = self.I_inj(t)
+        for iteracion in range(1, maxIteraciones + 1):
+            alfa_n, beta_n = self.alfa_n(V1), self.beta_n(V1)
+            alfa_m, beta_m = self.alfa_m(V1), self.beta_m(V1)
+            alfa_h, beta_h = self.alfa_h(V1), self.beta_h(V1)
+            dalfa_m, dbeta_m, dalfa_h, dbeta_h, dalfa_n, dbeta_n = self.derivadasTasas(V1)
+
+            # Residuos de FEulerBackRoot
+            GV = v + self.h * (I - self.I_Na(V1, m1, h1) - self.I_K(V1, n1) - self.I_L(V1)) / self.cm - V1
+            Gn = n + self.h * (alfa_n * (1.0 - n1) - beta_n * n1) - n1
+            Gm = m + self.h * (alfa_m * (1.0 - m1) - beta_m * m1) - m1
+            Gh = h + self.h * (alfa_h * (1.0 - h1) - beta_h * h1) - h1
+
+            fVV = -(self.gna * m1**3 * h1 + self.gk * n1**4 + self.gl) / self.cm
+            fVn = -self.f_n(V1, n1) / self.cm
+            fVm = -self.f_m(V1, m1, h1) / self.cm
+            fVh = -self.f_h(V1, m1) / self.cm
+            fnV = dalfa_n * (1 - n1) - dbeta_n * n1
+            fmV = dalfa_m * (1 - m1) - dbeta_m * m1
+            fhV = dalfa_h * (1 - h1) - dbeta_h * h1
+            Dn = 1 + self.h * (alfa_n + beta_n)
+            Dm = 1 + self.h * (alfa_m + beta_m)
+            Dh = 1 + self.h * (alfa_h + beta_h)
+
+            dV = (GV + self.h * (fVn * Gn / Dn + fVm * Gm / Dm + fVh * Gh / Dh)) / \
+                 (1 - self.h * fVV - self.h**2 * (fVn * fnV / Dn + fVm * fmV / Dm + fVh * fhV / Dh))
+            dn = (Gn + self.h * fnV * dV) / Dn
+            dm = (Gm + self.h * fmV * dV) / Dm
+            dh = (Gh + self.h * fhV * dV) / Dh
+
+            V1 += dV
+            n1 += dn
+            m1 += dm
+            h1 += dh
+
+            if abs(dV) <= tolerancia * (1.0 + abs(V1)) and max(abs(dn), abs(dm), abs(dh)) <= tolerancia:
+                return V1, n1, m1, h1, iteracion
+        return V1, n1, m1, h1, -maxIteraciones
+
     def rungeKutta4(self, X, t):
         """
         Parametros
@@ -229,6 +963,193 @@ class HodgkinHuxley():
         k4 = self.dALLdt(X + k3, t + self.h, self)
         return X + (k1 + 2.0 * k2 + 2.0 * k3 + k4) * self.h / 6.0
 
+    def discontinuidadesEstimulo(self):
+        """
+        Parametros
+        |  :return: instantes donde I_inj cambia de valor (bordes de los pulsos)
+        """
+        return self.estimulo.discontinuidades()
+
+    # Tabla de Butcher de Dormand-Prince 5(4)
+    dopriC = (0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0)
+    dopriA = ((),
+              (1/5,),
+              (3/40, 9/40),
+              (44/45, -56/15, 32/9),
+              (19372/6561, -25360/2187, 64448/6561, -212/729),
+              (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+              (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84))
+    dopriE = (71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+    def dormandPrince(self, X0, t0, tf):
+        """
+        Integra con el par encajado de Dormand-Prince 5(4) y control del paso por
+        rtol/atol. La integracion se parte en los bordes de los pulsos de I_inj para
+        no cruzar discontinuidades: dentro de cada tramo la corriente se evalua
+        siempre del lado interior del tramo. El ultimo paso aceptado se guarda en
+        self._pasoAdaptativo para continuar en el tramo siguiente.
+        Parametros
+        |  :param X0: estado (V, m, h, n) en t0
+        |  :param t0: tiempo inicial
+        |  :param tf: tiempo final
+        |  :return: tiempos, estados (V, m, h, n) al final de cada paso, y por paso:
+        |           inicio, estado inicial y derivadas al inicio y al final (para interpolar)
+        """
+        bordes = [t0] + [tb for tb in self.discontinuidadesEstimulo() if t0 < tb < tf] + [tf]
+
+        y = np.array(X0, dtype=float)
+        paso = self._pasoAdaptativo
+
+        tPasos = [t0]
+        yPasos = [y]
+        inicios, estadosInicio, derivadasInicio, derivadasFin = [], [], [], []
+
+        # Un paso de prueba demasiado grande puede desbordar exp(); ese paso simplemente se rechaza
+        with np.errstate(over="ignore", invalid="ignore"):
+            for a, b in zip(bordes[:-1], bordes[1:]):
+                interiorA = np.nextafter(a, b)
+                interiorB = np.nextafter(b, a)
+
+                def f(t, X):
+                    # Se evalua el estimulo directamente: la malla de I_inj incluye los bordes
+                    self.evaluacionesRHS += 1
+                    V, m, h, n = X
+                    I = self.estimulo.evaluar(min(max(t, interiorA), interiorB))
+                    return np.array([(I - self.I_Na(V, m, h) - self.I_K(V, n) - self.I_L(V)) / self.cm,
+                                     self.alfa_m(V)*(1.0-m) - self.beta_m(V)*m,
+                                     self.alfa_h(V)*(1.0-h) - self.beta_h(V)*h,
+                                     self.alfa_n(V)*(1.0-n) - self.beta_n(V)*n])
+
+                t = a
+                k1 = f(t, y)
+                while t < b:
+                    final = t + paso >= b
+                    if final:
+                        paso = b - t
+
+                    k = [k1]
+                    for c, fila in zip(self.dopriC[1:], self.dopriA[1:]):
+                        k.append(f(t + c * paso, y + paso * sum(aij * kj for aij, kj in zip(fila, k))))
+                    yNuevo = y + paso * sum(aij * kj for aij, kj in zip(self.dopriA[6], k))
+                    # El septimo estado se evalua en yNuevo (FSAL) y da el error con dopriE
+                    error = paso * sum(ej * kj for ej, kj in zip(self.dopriE, k))
+                    escala = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(yNuevo))
+                    norma = np.sqrt(np.mean((error / escala)**2))
+
+                    if norma <= 1.0:
+                        inicios.append(t)
+                        estadosInicio.append(y)
+                        derivadasInicio.append(k1)
+                        derivadasFin.append(k[6])
+                        t = b if final else t + paso
+                        y = yNuevo
+                        k1 = k[6]
+                        tPasos.append(t)
+                        yPasos.append(y)
+                        factor = 5.0 if norma == 0 else min(5.0, max(0.2, 0.9 * norma**-0.2))
+                    else:
+                        self.pasosRechazados += 1
+                        factor = max(0.2, 0.9 * norma**-0.2)
+                    if not final or norma > 1.0:
+                        self._pasoAdaptativo = paso * factor
+                    paso = paso * factor
+
+        return (np.array(tPasos), np.array(yPasos),
+                (np.array(inicios), np.array(estadosInicio), np.array(derivadasInicio), np.array(derivadasFin)))
+
+    def interpolarPasos(self, tPasos, yPasos, pasos, t):
+        """
+        Interpolacion cubica de Hermite de la solucion adaptativa en los tiempos t
+        Parametros
+        |  :param tPasos: tiempos de la malla adaptativa
+        |  :param yPasos: estados en la malla adaptativa
+        |  :param pasos: inicios, estados y derivadas de cada paso (ver dormandPrince)
+        |  :param t: tiempos donde se evalua la solucion
+        |  :return: arreglo (len(t), 4) con los estados
+        """
+        inicios, y0, f0, f1 = pasos
+        j = np.clip(np.searchsorted(tPasos, t, side="right") - 1, 0, len(inicios) - 1)
+        dt = (tPasos[j + 1] - tPasos[j])[:, None]
+        s = ((t - inicios[j])[:, None]) / dt
+        y1 = yPasos[j + 1]
+        h00 = 2 * s**3 - 3 * s**2 + 1
+        h10 = s**3 - 2 * s**2 + s
+        h01 = -2 * s**3 + 3 * s**2
+        h11 = s**3 - s**2
+        return h00 * y0[j] + h10 * dt * f0[j] + h01 * y1 + h11 * dt * f1[j]
+
+    def compuertasExponencial(self, V, m, h, n, dt):
+        """
+        Avance exacto de las compuertas con V constante:
+        x(t + dt) = x_inf + (x - x_inf) * exp(-dt / tau_x), con x_inf = alfa/(alfa + beta)
+        y tau_x = 1/(alfa + beta)
+        Parametros
+        |  :param V: potencial de membrana (fijo durante el paso)
+        |  :param m, h, n: variables de estado
+        |  :param dt: paso de tiempo
+        |  :return: m, h, n al final del paso
+        """
+        alfa, beta = self.alfa_m(V), self.beta_m(V)
+        m_inf = alfa / (alfa + beta)
+        m = m_inf + (m - m_inf) * np.exp(-dt * (alfa + beta))
+        alfa, beta = self.alfa_h(V), self.beta_h(V)
+        h_inf = alfa / (alfa + beta)
+        h = h_inf + (h - h_inf) * np.exp(-dt * (alfa + beta))
+        alfa, beta = self.alfa_n(V), self.beta_n(V)
+        n_inf = alfa / (alfa + beta)
+        n = n_inf + (n - n_inf) * np.exp(-dt * (alfa + beta))
+        return m, h, n
+
+    def voltajeExponencial(self, V, m, h, n, t, dt):
+        """
+        Avance exacto de V con las compuertas fijas: la ecuacion de V es lineal en V,
+        dV/dt = (V_inf - V) * g_total / cm, asi que el paso es estable para cualquier dt.
+        Parametros
+        |  :param V, m, h, n: estado al inicio del paso (las compuertas quedan fijas)
+        |  :param t: tiempo en que se evalua la corriente de inyeccion
+        |  :param dt: paso de tiempo
+        |  :return: V al final del paso
+        """
+        gNa = self.gna * m**3 * h
+        gK = self.gk * n**4
+        gTotal = gNa + gK + self.gl
+        V_inf = (self.I_inj(t) + gNa * self.ena + gK * self.ek + self.gl * self.el) / gTotal
+        return V_inf + (V - V_inf) * np.exp(-dt * gTotal / self.cm)
+
+    def pasoRushLarsen(self, V, m, h, n, t):
+        """
+        Paso de Rush-Larsen: cada variable se avanza exactamente con las demas fijas
+        en su valor al inicio del paso
+        Parametros
+        |  :param V, m, h, n: estado en t (escalares o arreglos)
+        |  :param t: tiempo
+        |  :return: V, m, h, n en t + self.h
+        """
+        Vnuevo = self.voltajeExponencial(V, m, h, n, t, self.h)
+        m, h, n = self.compuertasExponencial(V, m, h, n, self.h)
+        return Vnuevo, m, h, n
+
+    def pasoRushLarsen2(self, V, m, h, n, t):
+        """
+        Variante de segundo orden (punto medio exponencial): medio paso de Rush-Larsen
+        da el estado en t + h/2, y con los coeficientes del punto medio se avanza el
+        paso completo.
+        Parametros
+        |  :param V, m, h, n: estado en t (escalares o arreglos)
+        |  :param t: tiempo
+        |  :return: V, m, h, n en t + self.h
+        """
+        Vmedio = self.voltajeExponencial(V, m, h, n, t, 0.5 * self.h)
+        mMedio, hMedio, nMedio = self.compuertasExponencial(V, m, h, n, 0.5 * self.h)
+
+        gNa = self.gna * mMedio**3 * hMedio
+        gK = self.gk * nMedio**4
+        gTotal = gNa + gK + self.gl
+        V_inf = (self.I_inj(t + 0.5 * self.h) + gNa * self.ena + gK * self.ek + self.gl * self.el) / gTotal
+        Vnuevo = V_inf + (V - V_inf) * np.exp(-self.h * gTotal / self.cm)
+        m, h, n = self.compuertasExponencial(Vmedio, m, h, n, self.h)
+        return Vnuevo, m, h, n
+
     def FEulerBackRoot(self, arraySolutions, v, n, m, h, t):
         """
         Parametros
@@ -245,36 +1166,105 @@ class HodgkinHuxley():
                 m + self.h * (self.alfa_m(arraySolutions[0])*(1.0-arraySolutions[2]) - self.beta_m(arraySolutions[0])*arraySolutions[2]) - arraySolutions[2],
                 h + self.h * (self.alfa_h(arraySolutions[0])*(1.0-arraySolutions[3]) - self.beta_h(arraySolutions[0])*arraySolutions[3]) - arraySolutions[3]]
 
-    def Main(self):
+    def parametrosKernel(self):
         """
-        Main del programa principal
+        Parametros
+        |  :return: arreglo (cm, gna, gk, gl, ena, ek, el) para los kernels compilados
+        """
+        return np.array([self.cm, self.gna, self.gk, self.gl, self.ena, self.ek, self.el], dtype=float)
+
+    def descripcion(self):
+        """
+        Parametros
+        |  :return: diccionario con los parametros del modelo, el metodo y el estimulo (metadatos de los archivos)
+        """
+        parametros = {nombre: np.asarray(getattr(self, nombre)).tolist() for nombre in ("cm", "gna", "gk", "gl", "ena", "ek", "el")}
+        return {"parametros": parametros, "metodo": self.metodo, "backend": self.backend, "h": self.h,
+                "tiempoInicio": self.tiempoInicio, "estimulo": self.estimulo.descripcion(),
+                "dtype": self.dtype.name, "acumuladorV": bool(self.acumuladorV)}
+
+    def _tramoKernel(self, X0, Xanterior=None):
+        """
+        Tramo con el backend "jit": la corriente de inyeccion sale de corrienteMalla
+        (t[i - 1], t[i - 1] + h/2 y t[i]) y el paso se hace en el kernel.
+        Parametros
+        |  :param X0: estado (V, m, h, n) al inicio del tramo
+        |  :param Xanterior: estado en el paso anterior al tramo, si se conoce (eulerMod)
+        |  :return: arreglo con los estados (V, m, h, n) del tramo
+        """
+        p = self.parametrosKernel()
+        Iinicio = self.corrienteMalla[0:-1:2]
+        Imedio = self.corrienteMalla[1::2]
+        Ifin = self.corrienteMalla[2::2]
+
+        if self.metodo == "rungeKutta2":
+            return _kernelRungeKutta2(X0, Iinicio, Imedio, self.h, p)
+        elif self.metodo == "rungeKutta4":
+            return _kernelRungeKutta4(X0, Iinicio, Imedio, Ifin, self.h, p)
+        elif self.metodo == "eulerFor":
+            return _kernelEulerFor(X0, Ifin, self.h, p)
+        # Como dentro del kernel, el primer Newton extrapola desde el paso anterior al tramo
+        inicial = X0 if Xanterior is None else 2 * X0 - np.asarray(Xanterior, dtype=float)
+        X, iteraciones = _kernelEulerAtras(X0, inicial, Ifin, self.h, p, 1e-12, 50)
+        self.contarNewton(iteraciones)
+        return X
+
+    def reiniciarContadores(self):
+        """
+        Contadores de la corrida (evaluaciones, pasos rechazados, Newton) y paso adaptativo en cero
+        """
+        self.evaluacionesRHS = 0
+        self.pasosRechazados = 0
+        self._pasoAdaptativo = self.h
+        self.iteracionesNewton = np.zeros(0, dtype=int)
+        self.iteracionesSolver = 0
+        self.fallosSolver = 0
+
+    def contarNewton(self, iteraciones):
+        """
+        Parametros
+        |  :param iteraciones: iteraciones del Newton de cada paso del tramo (negativas si no convergio);
+        |                      quedan en iteracionesNewton y se suman a los totales de la corrida
+        """
+        self.iteracionesNewton = iteraciones
+        self.iteracionesSolver += int(np.abs(iteraciones).sum())
+        self.fallosSolver += int(np.count_nonzero(iteraciones < 0))
+
+    def integrarTramo(self, X0, inicio, fin, Xanterior=None):
+        """
+        Integra con el metodo seleccionado entre los indices inicio y fin de la malla de tiempo
+        Parametros
+        |  :param X0: estado (V, m, h, n) en t[inicio]
+        |  :param inicio: indice inicial
+        |  :param fin: indice final (incluido)
+        |  :param Xanterior: estado en t[inicio - 1], si se conoce (estimacion inicial de eulerMod)
+        |  :return: arreglo (fin - inicio + 1, 4) con los estados (V, m, h, n) en t[inicio..fin]
         """
+        X0 = np.asarray(X0, dtype=float)
+        t = self.tiempos(inicio, fin + 1)
+        self.prepararCorriente(inicio, fin)
+
+        if self.backend == "jit" and self.metodo in self.kernelsJit:
+            return self._tramoKernel(X0, Xanterior)
+
         if self.metodo == "odeint":
-            X = odeint(self.dALLdt, [-65, 0.05, 0.5, 0.4], self.t, args=(self,))
-            V = X[:,0]
-            m = X[:,1]
-            h = X[:,2]
-            n = X[:,3]
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
-        
-        elif self.metodo == "rungeKutta2":
-            v_RK2 = np.zeros(len(self.t))
-            n_RK2 = np.zeros(len(self.t))
-            m_RK2 = np.zeros(len(self.t))
-            h_RK2 = np.zeros(len(self.t))
-            v_RK2[0] = -65
-            n_RK2[0] = 0.05
-            m_RK2[0] = 0.5
-            h_RK2[0] = 0.4
-            for i in range(1, len(self.t)):
-                vk11 = self.dVdtFunction(v_RK2[i - 1], n_RK2[i - 1], m_RK2[i - 1], h_RK2[i - 1], self.t[i - 1])
+            return odeint(self.dALLdt, X0, t, args=(self,))
+
+        if self.metodo == "rungeKutta2":
+            v_RK2 = np.zeros(len(t))
+            n_RK2 = np.zeros(len(t))
+            m_RK2 = np.zeros(len(t))
+            h_RK2 = np.zeros(len(t))
+            v_RK2[0] = X0[0]
+            n_RK2[0] = X0[3]
+            m_RK2[0] = X0[1]
+            h_RK2[0] = X0[2]
+            for i in range(1, len(t)):
+                vk11 = self.dVdtFunction(v_RK2[i - 1], n_RK2[i - 1], m_RK2[i - 1], h_RK2[i - 1], t[i - 1])
                 nk11 = self.alfa_n(v_RK2[i - 1]) * (1 - n_RK2[i - 1]) - self.beta_n(v_RK2[i - 1]) * n_RK2[i - 1]
                 mk11 = self.alfa_m(v_RK2[i - 1]) * (1 - m_RK2[i - 1]) - self.beta_m(v_RK2[i - 1]) * m_RK2[i - 1]
                 hk11 = self.alfa_h(v_RK2[i - 1]) * (1 - h_RK2[i - 1]) - self.beta_h(v_RK2[i - 1]) * h_RK2[i - 1]
-                vk12 = self.dVdtFunction(v_RK2[i - 1] + 0.5 * self.h * vk11, n_RK2[i - 1] + 0.5 * self.h * nk11, m_RK2[i - 1] + 0.5 * self.h * mk11, h_RK2[i - 1] + 0.5 * self.h * hk11, self.t[i - 1] + 0.5 * self.h)
+                vk12 = self.dVdtFunction(v_RK2[i - 1] + 0.5 * self.h * vk11, n_RK2[i - 1] + 0.5 * self.h * nk11, m_RK2[i - 1] + 0.5 * self.h * mk11, h_RK2[i - 1] + 0.5 * self.h * hk11, t[i - 1] + 0.5 * self.h)
                 nk12 = self.alfa_n(v_RK2[i - 1] + 0.5 * self.h * vk11) * (1 - (n_RK2[i - 1] + 0.5 * self.h * nk11)) - self.beta_n(v_RK2[i - 1] + 0.5 * self.h * vk11) * (n_RK2[i - 1] + 0.5 * self.h * nk11)
                 mk12 = self.alfa_m(v_RK2[i - 1] + 0.5 * self.h * vk11) * (1 - (m_RK2[i - 1] + 0.5 * self.h * mk11)) - self.beta_m(v_RK2[i - 1] + 0.5 * self.h * vk11) * (m_RK2[i - 1] + 0.5 * self.h * mk11)
                 hk12 = self.alfa_h(v_RK2[i - 1] + 0.5 * self.h * vk11) * (1 - (h_RK2[i - 1] + 0.5 * self.h * hk11)) - self.beta_h(v_RK2[i - 1] + 0.5 * self.h * vk11) * (h_RK2[i - 1] + 0.5 * self.h * hk11)
@@ -282,39 +1272,31 @@ class HodgkinHuxley():
                 n_RK2[i] = n_RK2[i - 1] + self.h * nk12
                 m_RK2[i] = m_RK2[i - 1] + self.h * mk12
                 h_RK2[i] = h_RK2[i - 1] + self.h * hk12
-            V = v_RK2
-            m = m_RK2
-            h = h_RK2
-            n = n_RK2
-
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
+            return np.column_stack((v_RK2, m_RK2, h_RK2, n_RK2))
         
         elif self.metodo == "rungeKutta4":
-            v_RK4 = np.zeros(len(self.t))
-            n_RK4 = np.zeros(len(self.t))
-            m_RK4 = np.zeros(len(self.t))
-            h_RK4 = np.zeros(len(self.t))
-            v_RK4[0] = -65
-            n_RK4[0] = 0.05
-            m_RK4[0] = 0.5
-            h_RK4[0] = 0.4
-            for i in range(1, len(self.t)):
-                vk11 = self.dVdtFunction(v_RK4[i - 1], n_RK4[i - 1], m_RK4[i - 1], h_RK4[i - 1], self.t[i - 1])
+            v_RK4 = np.zeros(len(t))
+            n_RK4 = np.zeros(len(t))
+            m_RK4 = np.zeros(len(t))
+            h_RK4 = np.zeros(len(t))
+            v_RK4[0] = X0[0]
+            n_RK4[0] = X0[3]
+            m_RK4[0] = X0[1]
+            h_RK4[0] = X0[2]
+            for i in range(1, len(t)):
+                vk11 = self.dVdtFunction(v_RK4[i - 1], n_RK4[i - 1], m_RK4[i - 1], h_RK4[i - 1], t[i - 1])
                 nk11 = self.alfa_n(v_RK4[i - 1]) * (1 - n_RK4[i - 1]) - self.beta_n(v_RK4[i - 1]) * n_RK4[i - 1]
                 mk11 = self.alfa_m(v_RK4[i - 1]) * (1 - m_RK4[i - 1]) - self.beta_m(v_RK4[i - 1]) * m_RK4[i - 1]
                 hk11 = self.alfa_h(v_RK4[i - 1]) * (1 - h_RK4[i - 1]) - self.beta_h(v_RK4[i - 1]) * h_RK4[i - 1]
-                vk12 = self.dVdtFunction(v_RK4[i - 1] + 0.5 * self.h * vk11, n_RK4[i - 1] + 0.5 * self.h * nk11, m_RK4[i - 1] + 0.5 * self.h * mk11, h_RK4[i - 1] + 0.5 * self.h * hk11, self.t[i - 1] + 0.5 * self.h)
+                vk12 = self.dVdtFunction(v_RK4[i - 1] + 0.5 * self.h * vk11, n_RK4[i - 1] + 0.5 * self.h * nk11, m_RK4[i - 1] + 0.5 * self.h * mk11, h_RK4[i - 1] + 0.5 * self.h * hk11, t[i - 1] + 0.5 * self.h)
                 nk12 = self.alfa_n(v_RK4[i - 1] + 0.5 * self.h * vk11) * (1 - (n_RK4[i - 1] + 0.5 * self.h * nk11)) - self.beta_n(v_RK4[i - 1] + 0.5 * self.h * vk11) * (n_RK4[i - 1] + 0.5 * self.h * nk11)
                 mk12 = self.alfa_m(v_RK4[i - 1] + 0.5 * self.h * vk11) * (1 - (m_RK4[i - 1] + 0.5 * self.h * mk11)) - self.beta_m(v_RK4[i - 1] + 0.5 * self.h * vk11) * (m_RK4[i - 1] + 0.5 * self.h * mk11)
                 hk12 = self.alfa_h(v_RK4[i - 1] + 0.5 * self.h * vk11) * (1 - (h_RK4[i - 1] + 0.5 * self.h * hk11)) - self.beta_h(v_RK4[i - 1] + 0.5 * self.h * vk11) * (h_RK4[i - 1] + 0.5 * self.h * hk11)
-                vk13 = self.dVdtFunction(v_RK4[i - 1] + 0.5 * self.h * vk12, n_RK4[i - 1] + 0.5 * self.h * nk12, m_RK4[i - 1] + 0.5 * self.h * mk12, h_RK4[i - 1] + 0.5 * self.h * hk12, self.t[i - 1] + 0.5 * self.h)
+                vk13 = self.dVdtFunction(v_RK4[i - 1] + 0.5 * self.h * vk12, n_RK4[i - 1] + 0.5 * self.h * nk12, m_RK4[i - 1] + 0.5 * self.h * mk12, h_RK4[i - 1] + 0.5 * self.h * hk12, t[i - 1] + 0.5 * self.h)
                 nk13 = self.alfa_n(v_RK4[i - 1] + 0.5 * self.h * vk12) * (1 - (n_RK4[i - 1] + 0.5 * self.h * nk12)) - self.beta_n(v_RK4[i - 1] + 0.5 * self.h * vk12) * (n_RK4[i - 1] + 0.5 * self.h * nk12)
                 mk13 = self.alfa_m(v_RK4[i - 1] + 0.5 * self.h * vk12) * (1 - (m_RK4[i - 1] + 0.5 * self.h * mk12)) - self.beta_m(v_RK4[i - 1] + 0.5 * self.h * vk12) * (m_RK4[i - 1] + 0.5 * self.h * mk12)
                 hk13 = self.alfa_h(v_RK4[i - 1] + 0.5 * self.h * vk12) * (1 - (h_RK4[i - 1] + 0.5 * self.h * hk12)) - self.beta_h(v_RK4[i - 1] + 0.5 * self.h * vk12) * (h_RK4[i - 1] + 0.5 * self.h * hk12)
-                vk14 = self.dVdtFunction(v_RK4[i - 1] + self.h * vk13, n_RK4[i - 1] + self.h * nk13, m_RK4[i - 1] + self.h * mk13, h_RK4[i - 1] + self.h * hk13, self.t[i - 1] + self.h)
+                vk14 = self.dVdtFunction(v_RK4[i - 1] + self.h * vk13, n_RK4[i - 1] + self.h * nk13, m_RK4[i - 1] + self.h * mk13, h_RK4[i - 1] + self.h * hk13, t[i - 1] + self.h)
                 nk14 = self.alfa_n(v_RK4[i - 1] + self.h * vk13) * (1 - (n_RK4[i - 1] + self.h * nk13)) - self.beta_n(v_RK4[i - 1] + self.h * vk13) * (n_RK4[i - 1] + self.h * nk13)
                 mk14 = self.alfa_m(v_RK4[i - 1] + self.h * vk13) * (1 - (m_RK4[i - 1] + self.h * mk13)) - self.beta_m(v_RK4[i - 1] + self.h * vk13) * (m_RK4[i - 1] + self.h * mk13)
                 hk14 = self.alfa_h(v_RK4[i - 1] + self.h * vk13) * (1 - (h_RK4[i - 1] + self.h * hk13)) - self.beta_h(v_RK4[i - 1] + self.h * vk13) * (h_RK4[i - 1] + self.h * hk13)
@@ -323,133 +1305,1227 @@ class HodgkinHuxley():
                 m_RK4[i] = m_RK4[i - 1] + (self.h / 6) * (mk11 + 2 * mk12 + 2 * mk13 + mk14)
                 h_RK4[i] = h_RK4[i - 1] + (self.h / 6) * (hk11 + 2 * hk12 + 2 * hk13 + hk14)
             
-            V = v_RK4
-            m = m_RK4
-            h = h_RK4
-            n = n_RK4
-
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
-
+            return np.column_stack((v_RK4, m_RK4, h_RK4, n_RK4))
 
         elif self.metodo == "eulerFor":
-            v_e = np.zeros(len(self.t))
-            n_e = np.zeros(len(self.t))
-            m_e = np.zeros(len(self.t))
-            h_e = np.zeros(len(self.t))
-            v_e[0] = -65
-            n_e[0] = 0.05
-            m_e[0] = 0.5
-            h_e[0] = 0.4
-            for i in range(1, len(self.t)):
-                v_e[i] = v_e[i - 1] + self.h * self.dVdtFunction(v_e[i - 1], n_e[i - 1], m_e[i - 1], h_e[i - 1], self.t[i])
+            v_e = np.zeros(len(t))
+            n_e = np.zeros(len(t))
+            m_e = np.zeros(len(t))
+            h_e = np.zeros(len(t))
+            v_e[0] = X0[0]
+            n_e[0] = X0[3]
+            m_e[0] = X0[1]
+            h_e[0] = X0[2]
+            for i in range(1, len(t)):
+                v_e[i] = v_e[i - 1] + self.h * self.dVdtFunction(v_e[i - 1], n_e[i - 1], m_e[i - 1], h_e[i - 1], t[i])
                 n_e[i] = n_e[i - 1] + self.h * (self.alfa_n(v_e[i - 1]) * (1.0-n_e[i - 1]) - self.beta_n(v_e[i - 1]) * n_e[i - 1])
                 m_e[i] = m_e[i - 1] + self.h * (self.alfa_m(v_e[i - 1]) * (1.0-m_e[i - 1]) - self.beta_m(v_e[i - 1]) * m_e[i - 1])
                 h_e[i] = h_e[i - 1] + self.h * (self.alfa_h(v_e[i - 1]) * (1.0-h_e[i - 1]) - self.beta_h(v_e[i - 1]) * h_e[i - 1])
-            V = v_e
-            m = m_e
-            h = h_e
-            n = n_e
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
+            return np.column_stack((v_e, m_e, h_e, n_e))
         
         elif self.metodo == "eulerBack":
-            v_eBack = np.zeros(len(self.t))
-            n_eBack = np.zeros(len(self.t))
-            m_eBack = np.zeros(len(self.t))
-            h_eBack = np.zeros(len(self.t))
-            v_eBack[0] = -65
-            n_eBack[0] = 0.05
-            m_eBack[0] = 0.5
-            h_eBack[0] = 0.4
-            for i in range(1, len(self.t)):
-                v_eBack[i] = self.f_v(v_eBack[i - 1], n_eBack[i - 1], m_eBack[i - 1], h_eBack[i - 1], self.t[i])
+            v_eBack = np.zeros(len(t))
+            n_eBack = np.zeros(len(t))
+            m_eBack = np.zeros(len(t))
+            h_eBack = np.zeros(len(t))
+            v_eBack[0] = X0[0]
+            n_eBack[0] = X0[3]
+            m_eBack[0] = X0[1]
+            h_eBack[0] = X0[2]
+            for i in range(1, len(t)):
+                v_eBack[i] = self.f_v(v_eBack[i - 1], n_eBack[i - 1], m_eBack[i - 1], h_eBack[i - 1], t[i])
                 n_eBack[i] = self.f_n(n_eBack[i - 1], v_eBack[i - 1])
                 m_eBack[i] = self.f_m(m_eBack[i - 1], v_eBack[i - 1], h_eBack[i - 1])
                 h_eBack[i] = self.f_h(h_eBack[i - 1], v_eBack[i - 1])
 
-            V = v_eBack
-            m = m_eBack
-            h = h_eBack
-            n = n_eBack
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
+            return np.column_stack((v_eBack, m_eBack, h_eBack, n_eBack))
 
         elif self.metodo == "eulerMod":
-            v_eMod = np.zeros(len(self.t))
-            n_eMod = np.zeros(len(self.t))
-            m_eMod = np.zeros(len(self.t))
-            h_eMod = np.zeros(len(self.t))
-            v_eMod[0] = -65
-            n_eMod[0] = 0.05
-            m_eMod[0] = 0.5
-            h_eMod[0] = 0.4
-            for i in range(1, len(self.t)):
-                solMod = opt.fsolve(self.FEulerBackRoot,
-                     np.array([v_eMod[i - 1],
-                               n_eMod[i - 1],
-                               m_eMod[i - 1],
-                               h_eMod[i - 1]]),
-                (
-                    v_eMod[i - 1],
-                    n_eMod[i - 1],
-                    m_eMod[i - 1],
-                    h_eMod[i - 1], self.t[i]), xtol=10 ** -15)
-            
-                v_eMod[i] = solMod[0]
-                n_eMod[i] = solMod[1]
-                m_eMod[i] = solMod[2]
-                h_eMod[i] = solMod[3]
-            V = v_eMod
-            m = m_eMod
-            h = h_eMod
-            n = n_eMod
-
-            ina = self.I_Na(V, m, h)
-            ik = self.I_K(V, n)
-            il = self.I_L(V)
-            return V, ina, ik, il
+            v_eMod = np.zeros(len(t))
+            n_eMod = np.zeros(len(t))
+            m_eMod = np.zeros(len(t))
+            h_eMod = np.zeros(len(t))
+            v_eMod[0] = X0[0]
+            n_eMod[0] = X0[3]
+            m_eMod[0] = X0[1]
+            h_eMod[0] = X0[2]
+            # Newton con jacobiano analitico (ver pasoEulerAtras); la estimacion inicial
+            # extrapola linealmente los dos pasos anteriores
+            iteraciones = np.zeros(len(t) - 1, dtype=int)
+            for i in range(1, len(t)):
+                inicial = None
+                if i == 1 and Xanterior is not None:
+                    # Estado en t[inicio - 1] (del tramo anterior): la misma extrapolacion que sin tramos
+                    inicial = (2 * X0[0] - Xanterior[0], 2 * X0[3] - Xanterior[3], 2 * X0[1] - Xanterior[1], 2 * X0[2] - Xanterior[2])
+                elif i > 1:
+                    inicial = (2 * v_eMod[i - 1] - v_eMod[i - 2], 2 * n_eMod[i - 1] - n_eMod[i - 2],
+                               2 * m_eMod[i - 1] - m_eMod[i - 2], 2 * h_eMod[i - 1] - h_eMod[i - 2])
+                v_eMod[i], n_eMod[i], m_eMod[i], h_eMod[i], iteraciones[i - 1] = self.pasoEulerAtras(
+                    v_eMod[i - 1], n_eMod[i - 1], m_eMod[i - 1], h_eMod[i - 1], t[i], inicial)
+            self.contarNewton(iteraciones)
+            return np.column_stack((v_eMod, m_eMod, h_eMod, n_eMod))
 
-        else:
-            print("Metodo no valido")
-            return
+        elif self.metodo in ("rushLarsen", "rushLarsen2"):
+            paso = self.pasoRushLarsen if self.metodo == "rushLarsen" else self.pasoRushLarsen2
+            v_RL = np.zeros(len(t))
+            n_RL = np.zeros(len(t))
+            m_RL = np.zeros(len(t))
+            h_RL = np.zeros(len(t))
+            v_RL[0] = X0[0]
+            n_RL[0] = X0[3]
+            m_RL[0] = X0[1]
+            h_RL[0] = X0[2]
+            for i in range(1, len(t)):
+                v_RL[i], m_RL[i], h_RL[i], n_RL[i] = paso(v_RL[i - 1], m_RL[i - 1], h_RL[i - 1], n_RL[i - 1], t[i - 1])
+            return np.column_stack((v_RL, m_RL, h_RL, n_RL))
+
+        elif self.metodo == "dopri45":
+            tPasos, yPasos, pasos = self.dormandPrince(X0, t[0], t[-1])
+            return self.interpolarPasos(tPasos, yPasos, pasos, t)
+
+    def estadoInicialPorDefecto(self):
+        """
+        Parametros
+        |  :return: estado inicial (V, m, h, n) de Main()
+        """
+        if self.estadoInicial is None:
+            return estadosIniciales.reposo(self)
+        if isinstance(self.estadoInicial, str):
+            if self.estadoInicial == "clasico":
+                return self.estadoClasico()
+            return estadosIniciales.obtener(self.estadoInicial)
+        return np.array(self.estadoInicial, dtype=float)
+
+    def estadoClasico(self):
+        """
+        Parametros
+        |  :return: el estado inicial fijo que usaba Main() antes de estadoReposo
+        """
+        # odeint siempre arranco con [-65, 0.05, 0.5, 0.4] en el orden (V, m, h, n) de
+        # dALLdt; los demas metodos con V = -65, n = 0.05, m = 0.5 y h = 0.4
+        if self.metodo == "odeint":
+            return np.array([-65.0, 0.05, 0.5, 0.4])
+        return np.array([-65.0, 0.5, 0.4, 0.05])
+
+    def compuertasEstacionarias(self, V):
+        """
+        Parametros
+        |  :param V: potencial de membrana
+        |  :return: m, h, n estacionarios x_inf(V) = alfa / (alfa + beta)
+        """
+        return (self.alfa_m(V) / (self.alfa_m(V) + self.beta_m(V)),
+                self.alfa_h(V) / (self.alfa_h(V) + self.beta_h(V)),
+                self.alfa_n(V) / (self.alfa_n(V) + self.beta_n(V)))
+
+    def corrienteEstacionaria(self, V, corriente=0.0):
+        """
+        Corriente neta con las compuertas en su valor estacionario x_inf(V); sus ceros son
+        los puntos de equilibrio del modelo
+        Parametros
+        |  :param V: potencial de membrana (se difunde contra los parametros)
+        |  :param corriente: corriente de inyeccion constante
+        |  :return: corriente - I_Na - I_K - I_L
+        """
+        m, h, n = self.compuertasEstacionarias(V)
+        return corriente - self.I_Na(V, m, h) - self.I_K(V, n) - self.I_L(V)
+
+    def estadoReposo(self, corriente=0.0, vMin=-120.0, vMax=60.0, dv=0.5, iteraciones=60):
+        """
+        Equilibrio estable de menor voltaje: se busca en una malla de V el primer cambio de
+        signo de + a - de corrienteEstacionaria y se refina por biseccion (vectorizado, asi
+        que sirve para parametros en arreglos)
+        Parametros
+        |  :param corriente: corriente de inyeccion constante
+        |  :param vMin, vMax, dv: malla de busqueda del cero
+        |  :param iteraciones: iteraciones de la biseccion
+        |  :return: estado (V, m, h, n) con las compuertas en x_inf(V); arreglo (..., 4) si los
+        |           parametros son arreglos
+        """
+        forma = np.broadcast(*[np.asarray(getattr(self, nombre)) for nombre in ("cm", "gna", "gk", "gl", "ena", "ek", "el")]).shape
+        # La malla se corre un poco para no caer en V = -40 o -55 (0/0 en alfa_m y alfa_n)
+        malla = (np.arange(vMin, vMax, dv) + 1e-3 * np.pi).reshape((-1,) + (1,) * len(forma))
+        with np.errstate(all="ignore"):
+            F = self.corrienteEstacionaria(np.broadcast_to(malla, malla.shape[:1] + forma), corriente)
+        cambios = (F[:-1] > 0) & (F[1:] <= 0)
+        if not cambios.any(axis=0).all():
+            raise ValueError("No se encontro un equilibrio estable entre " + str(vMin) + " y " + str(vMax) + " mV")
+        primero = np.argmax(cambios, axis=0)
+        bajo = np.take_along_axis(np.broadcast_to(malla, F.shape), primero[None], axis=0)[0]
+        alto = bajo + dv
+        for _ in range(iteraciones):
+            medio = 0.5 * (bajo + alto)
+            positivo = self.corrienteEstacionaria(medio, corriente) > 0
+            bajo = np.where(positivo, medio, bajo)
+            alto = np.where(positivo, alto, medio)
+        V = 0.5 * (bajo + alto)
+        return np.stack((V,) + self.compuertasEstacionarias(V), axis=-1)
+
+    def resultado(self, X):
+        """
+        Parametros
+        |  :param X: estados (V, m, h, n) por fila
+        |  :return: V, ina, ik, il
+        """
+        V = X[..., 0]
+        m = X[..., 1]
+        h = X[..., 2]
+        n = X[..., 3]
+        ina = self.I_Na(V, m, h)
+        ik = self.I_K(V, n)
+        il = self.I_L(V)
+        return V, ina, ik, il
+
+    def disposicion(self, porTramos=False):
+        """
+        Parametros
+        |  :param porTramos: si el resultado sale de tramos() (simularPorBloques) en lugar de Main()
+        |  :return: diccionario con el camino de integracion ("completa" o "tramos", que solo
+        |           se distinguen en metodosPasoVariable) y los arreglos que forman el resultado
+        """
+        if porTramos and self.metodo in self.metodosPasoVariable:
+            return {"camino": "tramos", "campos": ["estados"]}
+        if not porTramos and self.metodo == "dopri45" and self.mallaAdaptativa:
+            return {"camino": "completa", "campos": ["estados", "tAdaptativo"]}
+        return {"camino": "completa", "campos": ["estados"]}
+
+    def clave(self, estadoInicial, porTramos=False):
+        """
+        Parametros
+        |  :param estadoInicial: estado inicial de la simulacion
+        |  :param porTramos: clave del resultado de simularPorBloques() en lugar del de Main()
+        |  :return: hash estable de todo lo que determina el resultado y su forma (ver disposicion)
+        """
+        descripcion = self.descripcion()
+        descripcion.update({"clase": type(self).__name__, "nPuntos": self.nPuntos, "deltaT": self._deltaT,
+                            "tabulado": self.tabla is not None, "rtol": self.rtol, "atol": self.atol,
+                            "mallaAdaptativa": self.mallaAdaptativa, "estadoInicial": np.asarray(estadoInicial, dtype=float),
+                            "disposicion": self.disposicion(porTramos)})
+        texto = json.dumps(descripcion, sort_keys=True, default=lambda valor: np.asarray(valor).tolist())
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def simularConCache(self, X0, simular, porTramos=False):
+        """
+        Parametros
+        |  :param X0: estado inicial (forma parte de la clave)
+        |  :param simular: funcion sin argumentos que devuelve el diccionario de resultados (None si se cancelo)
+        |  :param porTramos: si simular integra por tramos (ver disposicion)
+        |  :return: diccionario de resultados, de self.cache si ya estaba
+        """
+        if self.cache is None:
+            return simular()
+        clave = self.clave(X0, porTramos)
+        valores = self.cache.obtener(clave, self.disposicion(porTramos)["campos"])
+        if valores is None:
+            valores = simular()
+            if valores is not None:
+                self.cache.guardar(clave, valores)
+        return valores
+
+    def Main(self):
+        """
+        Main del programa principal
+        """
+        if self.metodo not in self.metodos:
+            print("Metodo no valido")
+            return
+
+        X0 = self.estadoInicialPorDefecto()
+        self.reiniciarContadores()
+
+        def simular():
+            if self.metodo == "dopri45" and self.mallaAdaptativa:
+                tAdaptativo, X, pasos = self.dormandPrince(X0, self.t[0], self.t[-1])
+                return {"estados": X.astype(self.dtype, copy=False), "tAdaptativo": tAdaptativo}
+            return {"estados": self.integrarTramo(X0, 0, self.nPuntos - 1).astype(self.dtype, copy=False)}
+
+        estadisticas = self.iniciarEstadisticas()
+        fase = _sinMedicion if estadisticas is None else estadisticas.fase
+        try:
+            with fase("simulacion"):
+                valores = self.simularConCache(X0, simular)
+            if "tAdaptativo" in valores:
+                self.tAdaptativo = valores["tAdaptativo"]
+            self.estados = valores["estados"]
+            with fase("postproceso"):
+                resultado = self.resultado(self.estados)
+        finally:
+            # Aun si la integracion falla la instancia vuelve a sus funciones sin instrumentar
+            self.restaurarFunciones(estadisticas)
+        self.cerrarEstadisticas(estadisticas, resultado)
+        return resultado
+
+    def iniciarEstadisticas(self):
+        """
+        Con instrumentar activo crea self.estadisticas y reemplaza (solo en esta instancia)
+        las funciones contadas y prepararCorriente por versiones que cuentan y miden
+        Parametros
+        |  :return: EstadisticasSimulacion, o None si instrumentar es False
+        """
+        if not self.instrumentar:
+            return None
+        estadisticas = EstadisticasSimulacion()
+        self.estadisticas = estadisticas
+        # Atributos de instancia previos (por ejemplo los interpoladores de tabulado)
+        self._originales = {nombre: self.__dict__.get(nombre) for nombre in self.funcionesContadas + ("prepararCorriente",)}
+        for nombre in self.funcionesContadas:
+            setattr(self, nombre, estadisticas.contar(nombre, getattr(self, nombre)))
+        self.prepararCorriente = estadisticas.cronometrar("preparacion", self.prepararCorriente)
+        self._fallosCache = None if self.cache is None else self.cache.fallos
+        if self.instrumentar == "memoria":
+            tracemalloc.start()
+        return estadisticas
+
+    def restaurarFunciones(self, estadisticas):
+        """
+        Deshace iniciarEstadisticas: detiene tracemalloc y restaura las funciones originales.
+        Main() la llama en un finally para que una excepcion no deje la instancia instrumentada
+        Parametros
+        |  :param estadisticas: lo que devolvio iniciarEstadisticas (nada que hacer si es None)
+        """
+        if estadisticas is None:
+            return
+        if self.instrumentar == "memoria":
+            estadisticas.memoriaPico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        for nombre, original in self._originales.items():
+            if original is None:
+                delattr(self, nombre)
+            else:
+                setattr(self, nombre, original)
+        del self._originales
+
+    def cerrarEstadisticas(self, estadisticas, resultado):
+        """
+        Completa las estadisticas de la corrida (despues de restaurarFunciones)
+        Parametros
+        |  :param estadisticas: lo que devolvio iniciarEstadisticas (nada que hacer si es None)
+        |  :param resultado: V, ina, ik, il devueltos por Main()
+        """
+        if estadisticas is None:
+            return
+
+        estadisticas.cacheUsada = self._fallosCache is not None and self.cache.fallos == self._fallosCache
+        tiempos = estadisticas.tiempos
+        tiempos["integracion"] = tiempos["simulacion"] - tiempos.get("preparacion", 0.0)
+
+        pasos = len(self.estados) - 1
+        estadisticas.evaluacionesRHS = estadisticas.llamadas["alfa_m"]
+        if self.metodo == "eulerMod":
+            # Main() integra en un solo tramo: las iteraciones por paso son las de toda la corrida
+            estadisticas.iteracionesPorPaso = self.iteracionesNewton
+            estadisticas.iteracionesSolver = self.iteracionesSolver
+            estadisticas.fallosSolver = self.fallosSolver
+            if self.backend == "jit":
+                estadisticas.evaluacionesRHS = estadisticas.iteracionesSolver
+        elif self.backend == "jit" and self.metodo in self.etapasKernel:
+            estadisticas.evaluacionesRHS = self.etapasKernel[self.metodo] * pasos
+        if estadisticas.cacheUsada:
+            estadisticas.evaluacionesRHS = 0
+        estadisticas.pasos = pasos
+        estadisticas.pasosRechazados = self.pasosRechazados
+        estadisticas.bytes = {"estados": self.estados.nbytes, "corrienteMalla": self.corrienteMalla.nbytes,
+                              "corrientes": sum(np.asarray(x).nbytes for x in resultado[1:])}
+
+    def bloque(self, t, X):
+        """
+        Parametros
+        |  :param t: tiempos del bloque
+        |  :param X: estados (V, m, h, n) del bloque
+        |  :return: diccionario con t, V, m, h, n, I_Na, I_K e I_L
+        """
+        V, ina, ik, il = self.resultado(X)
+        return {"t": t, "V": V, "m": X[..., 1], "h": X[..., 2], "n": X[..., 3], "I_Na": ina, "I_K": ik, "I_L": il}
+
+    def tramos(self, pasosBloque, estadoInicial=None, desde=0, Xanterior=None):
+        """
+        Integra por tramos de pasosBloque pasos llevando el estado de un tramo al siguiente.
+        Antes de entregar cada tramo deja en self.continuacion el (indice, X, Xanterior)
+        con que empieza el siguiente (en el ultimo tramo, el estado final), que es lo que
+        guarda un punto de control.
+        Parametros
+        |  :param pasosBloque: numero de pasos por tramo
+        |  :param estadoInicial: estado (V, m, h, n) en t[desde]; por defecto el de Main()
+        |  :param desde: indice de la malla donde empieza la integracion (con desde > 0 no se
+        |                reinician los contadores ni el estado interno del integrador)
+        |  :param Xanterior: estado en t[desde - 1], si se conoce (ver integrarTramo)
+        |  :return: generador de (t, X) con los tiempos y estados de cada tramo, sin repetir puntos
+        """
+        if self.metodo not in self.metodos:
+            raise ValueError("Metodo no valido: " + str(self.metodo))
+
+        X = self.estadoInicialPorDefecto() if estadoInicial is None else np.asarray(estadoInicial, dtype=float)
+        if desde == 0:
+            self.reiniciarContadores()
+
+        ultimoIndice = self.nPuntos - 1
+        if desde >= ultimoIndice:
+            self.continuacion = (desde, X, Xanterior)
+            if desde == ultimoIndice:
+                yield self.tiempos(desde, desde + 1), X[None].astype(self.dtype, copy=False)
+            return
+
+        for inicio in range(desde, ultimoIndice, pasosBloque):
+            fin = min(inicio + pasosBloque, ultimoIndice)
+            Xtramo = self.integrarTramo(X, inicio, fin, Xanterior)
+            # El ultimo punto de cada tramo es el primero del siguiente. El tramo siguiente
+            # parte del estado sin redondear a dtype, asi que el resultado es el de Main()
+            filas = len(Xtramo) if fin == ultimoIndice else len(Xtramo) - 1
+            X = Xtramo[-1]
+            Xanterior = Xtramo[-2]
+            self.continuacion = (fin, X, Xanterior)
+            yield self.tiempos(inicio, inicio + filas), Xtramo[:filas].astype(self.dtype, copy=False)
+
+    def iter_chunks(self, chunk_steps=100_000, estadoInicial=None):
+        """
+        Simulacion por bloques con memoria acotada: el estado del integrador pasa de un
+        bloque al siguiente y solo se guardan chunk_steps pasos a la vez. Concatenar los
+        bloques da la misma malla self.t que Main().
+        Parametros
+        |  :param chunk_steps: numero de pasos por bloque
+        |  :param estadoInicial: estado (V, m, h, n) inicial; por defecto el de Main()
+        |  :return: generador de diccionarios (ver bloque)
+        """
+        for t, X in self.tramos(chunk_steps, estadoInicial):
+            yield self.bloque(t, X)
+
+    def simularPorBloques(self, pasosBloque=5000, progreso=None, cancelar=None, publicar=None):
+        """
+        Igual que Main(), pero integra por tramos para informar el avance y poder
+        detenerse limpiamente entre un tramo y el siguiente. Con los metodos de paso
+        fijo el resultado es identico al de Main() y comparte su entrada de la cache; con
+        metodosPasoVariable coincide solo dentro de las tolerancias, siempre en la malla
+        self.t (tambien con mallaAdaptativa), y se guarda con su propia clave.
+        Parametros
+        |  :param pasosBloque: numero de pasos por tramo
+        |  :param progreso: funcion que recibe la fraccion simulada (de 0 a 1)
+        |  :param cancelar: funcion sin argumentos; si devuelve True se detiene la simulacion
+        |  :param publicar: funcion que recibe (t, X) de cada tramo apenas se integra
+        |  :return: V, ina, ik, il como Main(), o None si se cancelo
+        """
+        X0 = self.estadoInicialPorDefecto()
+
+        def simular():
+            estados = []
+            simulados = 0
+            for t, X in self.tramos(pasosBloque, X0):
+                estados.append(X)
+                simulados += len(t)
+                if publicar is not None:
+                    publicar(t, X)
+                if progreso is not None:
+                    progreso(simulados / self.nPuntos)
+                if cancelar is not None and cancelar():
+                    return None
+            return {"estados": np.concatenate(estados)}
+
+        valores = self.simularConCache(X0, simular, porTramos=True)
+        if valores is None:
+            return None
+        self.estados = valores["estados"]
+        return self.resultado(self.estados)
+
+    def caracteristicas(self, umbral=0.0, ventana=None, pasosBloque=5000, estadoInicial=None):
+        """
+        Simula por tramos detectando los picos a medida que se integra: no se guardan las
+        trazas, solo las caracteristicas de disparo (y las formas de onda si se piden)
+        Parametros
+        |  :param umbral: voltaje de deteccion (mV)
+        |  :param ventana: (antes, despues) en ms de las formas de onda (None = no se guardan)
+        |  :param pasosBloque: numero de pasos por tramo (memoria de la simulacion)
+        |  :param estadoInicial: estado (V, m, h, n) inicial; por defecto el de Main()
+        |  :return: diccionario de extraerCaracteristicas (lista de diccionarios en una poblacion)
+        """
+        detectores = None
+        for t, X in self.tramos(pasosBloque, estadoInicial):
+            # (L, 4) o (L, N, 4) -> (L, N)
+            V = X[..., 0].reshape(len(t), -1)
+            if detectores is None:
+                detectores = [DetectorPicos(umbral, ventana) for _ in range(V.shape[1])]
+            for i, detector in enumerate(detectores):
+                detector.agregar(t, V[:, i])
+        registros = [detector.registro() for detector in detectores]
+        return registros if X.ndim == 3 else registros[0]
+
+    def estadoIntegrador(self):
+        """
+        Parametros
+        |  :return: diccionario de arreglos con lo que el integrador lleva de un tramo al siguiente
+        |           ademas de (V, m, h, n); las subclases agregan su propio estado
+        """
+        return {"pasoAdaptativo": np.array(self._pasoAdaptativo), "evaluacionesRHS": np.array(self.evaluacionesRHS),
+                "pasosRechazados": np.array(self.pasosRechazados), "iteracionesSolver": np.array(self.iteracionesSolver),
+                "fallosSolver": np.array(self.fallosSolver)}
+
+    def restaurarIntegrador(self, estado):
+        """
+        Parametros
+        |  :param estado: diccionario de estadoIntegrador() (por ejemplo de un punto de control)
+        """
+        self._pasoAdaptativo = float(estado["pasoAdaptativo"])
+        self.evaluacionesRHS = int(estado["evaluacionesRHS"])
+        self.pasosRechazados = int(estado["pasosRechazados"])
+        self.iteracionesSolver = int(estado["iteracionesSolver"])
+        self.fallosSolver = int(estado["fallosSolver"])
+
+    def simularReanudable(self, rutaControl, rutaSalida, desde=None, pasosBloque=5000, intervalo=60.0, progreso=None, cancelar=None, **opciones):
+        """
+        Simulacion larga que se puede retomar: integra por tramos, agrega cada tramo al
+        almacen rutaSalida y cada intervalo segundos (y al terminar o cancelar) guarda de
+        forma atomica un punto de control con el indice de la malla (que tambien es la
+        posicion en el estimulo), el estado del integrador, la descripcion del modelo
+        (parametros, metodo, estimulo) y la posicion del almacen. Si rutaControl ya existe
+        se reanuda desde ahi: el almacen se corta donde lo registra el punto de control y
+        se le sigue agregando, con el mismo resultado que una corrida sin interrupcion con
+        el mismo pasosBloque. Con los metodos de paso fijo ese resultado es tambien el de
+        Main(); con metodosPasoVariable (odeint, dopri45) es el de simularPorBloques(pasosBloque),
+        que difiere del de Main() dentro de las tolerancias (ver tests/test_punto_control.py).
+        Parametros
+        |  :param rutaControl: archivo del punto de control
+        |  :param rutaSalida: almacen por bloques con todos los canales (ver EscritorAlmacen)
+        |  :param desde: punto de control (diccionario o ruta) de otra simulacion desde el que
+        |                continua esta sin repetir el prefijo comun; el modelo puede cambiar
+        |                parametros, estimulo o tiempo final, pero no la malla (h, tiempoInicio).
+        |                La salida empieza en el tiempo del punto de control. Solo se usa si
+        |                rutaControl no existe
+        |  :param pasosBloque: numero de pasos por tramo
+        |  :param intervalo: segundos entre puntos de control
+        |  :param progreso: funcion que recibe la fraccion simulada (de 0 a 1)
+        |  :param cancelar: funcion sin argumentos; si devuelve True se guarda el punto de control y
+        |                   se detiene la simulacion
+        |  :param opciones: argumentos de EscritorAlmacen para un almacen nuevo (compresion, nivel, dtype...)
+        |  :return: ultimo punto de control; si la simulacion termino tiene terminado=True y el
+        |           estado final (en su indice, que ya esta en el almacen)
+        """
+        if os.path.exists(rutaControl):
+            punto = leerPuntoControl(rutaControl)
+            if punto["clase"] != type(self).__name__ or punto["clave"] != self.clave(punto["inicial"]):
+                raise ValueError("El punto de control " + str(rutaControl) + " es de otra simulacion")
+            if punto["terminado"]:
+                return punto
+            base = {llave: punto[llave] for llave in ("clase", "clave", "descripcion", "inicial", "inicio", "bifurcacion")}
+            indice, X, Xanterior = punto["indice"], punto["X"], punto["Xanterior"]
+            self.restaurarIntegrador(punto["integrador"])
+            almacen = EscritorAlmacen(rutaSalida, self.h, continuar=punto["almacen"])
+        else:
+            origen = None
+            if desde is None:
+                indice, X, Xanterior = 0, self.estadoInicialPorDefecto(), None
+            else:
+                if not isinstance(desde, dict):
+                    desde = leerPuntoControl(desde)
+                anterior = desde["descripcion"]
+                if desde["clase"] != type(self).__name__ or (anterior["h"], anterior["tiempoInicio"]) != (self.h, self.tiempoInicio):
+                    raise ValueError("Solo se puede continuar un punto de control de la misma clase y la misma malla de tiempo")
+                if desde["indice"] >= self.nPuntos - 1:
+                    raise ValueError("El punto de control esta en t = " + str(desde["tiempo"]) + ", al final de esta simulacion")
+                indice, X, Xanterior = desde["indice"], desde["X"], desde["Xanterior"]
+                self.restaurarIntegrador(desde["integrador"])
+                origen = {"clave": desde["clave"], "indice": indice, "tiempo": desde["tiempo"]}
+            # La descripcion y la clave se calculan una vez (en una red la clave recorre toda la conectividad)
+            X = np.asarray(X)
+            base = {"clase": type(self).__name__, "clave": self.clave(X), "descripcion": self.descripcion(),
+                    "inicial": X, "inicio": indice, "bifurcacion": origen}
+            metadatos = dict(base["descripcion"], bifurcacion=origen)
+            opciones.setdefault("dtype", self.dtype)
+            almacen = EscritorAlmacen(rutaSalida, self.h, self.tiempos(indice, indice + 1)[0], metadatos=metadatos, **opciones)
+
+        def guardar(indice, X, Xanterior, terminado=False):
+            punto = dict(base, indice=indice, tiempo=self.tiempoInicio + indice * self._deltaT, X=X, Xanterior=Xanterior,
+                         terminado=terminado, integrador=self.estadoIntegrador(), almacen=almacen.puntoControl())
+            guardarPuntoControl(rutaControl, punto)
+            return punto
+
+        inicio = base["inicio"]
+        try:
+            punto = guardar(indice, X, Xanterior)
+            ultimo = time.perf_counter()
+            for t, Xtramo in self.tramos(pasosBloque, X, indice, Xanterior):
+                almacen.agregar(self.bloque(t, Xtramo))
+                siguiente = self.continuacion
+                terminado = siguiente[0] == self.nPuntos - 1
+                if progreso is not None:
+                    progreso((siguiente[0] - inicio) / max(1, self.nPuntos - 1 - inicio))
+                cancelado = cancelar is not None and cancelar()
+                if cancelado or terminado or time.perf_counter() - ultimo >= intervalo:
+                    punto = guardar(*siguiente, terminado)
+                    ultimo = time.perf_counter()
+                if cancelado:
+                    break
+        finally:
+            # Aun si la corrida se interrumpe el almacen queda legible hasta el ultimo tramo
+            almacen.cerrar()
+        return punto
+
+    def __getstate__(self):
+        # Para enviar el modelo a otro proceso no se copian la cache, la malla completa
+        # ni la tabla (sus interpoladores no se pueden serializar); __setstate__ la rehace
+        omitidos = ("cache", "_t", "tabla", "corrienteMalla") + self.tasas
+        estado = {llave: valor for llave, valor in self.__dict__.items() if llave not in omitidos}
+        estado["_tabulado"] = self.tabla is not None
+        # Un estado guardado por nombre puede no existir en el almacen del otro proceso
+        if isinstance(self.estadoInicial, str) and self.estadoInicial != "clasico":
+            estado["estadoInicial"] = self.estadoInicialPorDefecto()
+        return estado
+
+    def __setstate__(self, estado):
+        tabulado = estado.pop("_tabulado")
+        self.__dict__.update(estado)
+        self.cache = None
+        self._t = None
+        self.corrienteMalla = np.empty(0)
+        self._inicioMalla = 0
+        self.tabla = None
+        if tabulado:
+            self.usarTabla()
+
+
+class TablaCinetica():
+    """
+    Tablas de las tasas alfa/beta y de x_inf/tau_x precalculadas sobre una malla
+    uniforme de voltaje y evaluadas con interpolacion lineal (como las tablas de NEURON).
+    Fuera de [vMin, vMax] se usa el valor del borde.
+    """
+
+    def __init__(self, clase, vMin=-150.0, vMax=100.0, dv=0.01):
+        """
+        Parametros
+        |  :param clase: clase del modelo que define las tasas (HodgkinHuxley o una subclase)
+        |  :param vMin: voltaje minimo de la tabla, en mV
+        |  :param vMax: voltaje maximo de la tabla, en mV
+        |  :param dv: resolucion de la tabla, en mV
+        """
+        self.vMin = vMin
+        self.dv = dv
+        self.n = int(round((vMax - vMin) / dv)) + 1
+        self.vMax = vMin + (self.n - 1) * dv
+        self.clase = clase
+
+        V = self.vMin + self.dv * np.arange(self.n)
+        self.tablas = self.evaluarAnalitico(V)
+        self.pendientes = {nombre: np.append(np.diff(tabla), 0.0) for nombre, tabla in self.tablas.items()}
+        # Copias como listas de Python para el camino escalar (indexar listas es mas rapido)
+        self.listas = {nombre: (self.tablas[nombre].tolist(), self.pendientes[nombre].tolist()) for nombre in self.tablas}
+
+        # El error de la interpolacion lineal es maximo en los puntos medios de la malla
+        Vmedio = V[:-1] + 0.5 * self.dv
+        exactos = self.evaluarAnalitico(Vmedio)
+        self.errorMaximo = {nombre: float(np.max(np.abs(self.interpolar(nombre, Vmedio) - exactos[nombre])))
+                            for nombre in self.tablas}
+
+    def evaluarAnalitico(self, V):
+        """
+        Parametros
+        |  :param V: arreglo de voltajes
+        |  :return: diccionario con las tasas, x_inf y tau_x evaluadas analiticamente
+        """
+        valores = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for nombre in self.clase.tasas:
+                valores[nombre] = np.asarray(getattr(self.clase, nombre)(None, V), dtype=float)
+
+        # Cerca de la singularidad el cociente pierde digitos: se usa el limite y su pendiente
+        for nombre, (Vs, limite, pendiente) in self.clase.singularidadesTasas.items():
+            cerca = np.abs(V - Vs) < 1e-6
+            valores[nombre][cerca] = limite + pendiente * (V[cerca] - Vs)
+
+        for x in ("m", "h", "n"):
+            alfa = valores["alfa_" + x]
+            beta = valores["beta_" + x]
+            valores[x + "_inf"] = alfa / (alfa + beta)
+            valores["tau_" + x] = 1.0 / (alfa + beta)
+        return valores
+
+    def indice(self, V):
+        """
+        Parametros
+        |  :param V: potencial de membrana (escalar o arreglo)
+        |  :return: indice de la celda de la malla y posicion relativa dentro de ella
+        """
+        if type(V) is not np.ndarray or V.ndim == 0:
+            x = (min(max(float(V), self.vMin), self.vMax) - self.vMin) / self.dv
+            i = min(int(x), self.n - 2)
+            return i, x - i
+
+        x = (V - self.vMin) * (1.0 / self.dv)
+        np.clip(x, 0.0, self.n - 1.0, out=x)
+        i = np.minimum(x.astype(np.intp), self.n - 2)
+        return i, x - i
+
+    def interpolar(self, nombre, V):
+        """
+        Parametros
+        |  :param nombre: nombre de la tasa ("alfa_m", ..., "m_inf", "tau_m", ...)
+        |  :param V: potencial de membrana (escalar o arreglo)
+        |  :return: valor interpolado
+        """
+        i, x = self.indice(V)
+        return self.tablas[nombre][i] + x * self.pendientes[nombre][i]
+
+    def interpoladores(self):
+        """
+        Crea funciones V -> tasa que comparten el calculo del indice: las seis tasas
+        se piden seguidas con el mismo V, asi que la celda se busca una sola vez.
+        |  :return: diccionario nombre -> funcion
+        """
+        ultimo = [None, 0, 0.0]
+
+        def crear(nombre):
+            tabla, pendiente = self.tablas[nombre], self.pendientes[nombre]
+            listaTabla, listaPendiente = self.listas[nombre]
+
+            def interpolador(V):
+                if type(V) is not np.ndarray:
+                    if type(ultimo[0]) is np.ndarray or V != ultimo[0]:
+                        ultimo[0] = V
+                        ultimo[1], ultimo[2] = self.indice(V)
+                    i, x = ultimo[1], ultimo[2]
+                    return listaTabla[i] + x * listaPendiente[i]
+                if V is not ultimo[0]:
+                    ultimo[0] = V
+                    ultimo[1], ultimo[2] = self.indice(V)
+                i, x = ultimo[1], ultimo[2]
+                return tabla[i] + x * pendiente[i]
+            return interpolador
+
+        return {nombre: crear(nombre) for nombre in self.tablas}
+
+
+# Tablas compartidas por todas las instancias: (funciones de las tasas, malla) -> TablaCinetica
+_tablasCineticas = {}
+
+def tablaCinetica(modelo, vMin=-150.0, vMax=100.0, dv=0.01):
+    """
+    Parametros
+    |  :param modelo: instancia (o clase) de HodgkinHuxley
+    |  :param vMin, vMax, dv: malla de voltaje de la tabla
+    |  :return: TablaCinetica compartida para la cinetica del modelo
+    """
+    clase = modelo if isinstance(modelo, type) else type(modelo)
+    llave = tuple(getattr(clase, nombre) for nombre in clase.tasas) + (vMin, vMax, dv)
+    if llave not in _tablasCineticas:
+        _tablasCineticas[llave] = TablaCinetica(clase, vMin, vMax, dv)
+    return _tablasCineticas[llave]
+
+
+#---------------------------------------------------------------- Instrumentacion ----------------------------------------------------------------
+
+def _sinMedicion(nombre):
+    return nullcontext()
+
+
+class EstadisticasSimulacion():
+    """
+    Contadores y tiempos de una corrida de Main() con instrumentar activo:
+    llamadas por funcion, evaluaciones del campo vectorial, iteraciones y fallos
+    del Newton de eulerMod, pasos rechazados de dopri45, tiempos por fase
+    (preparacion del estimulo, integracion, postproceso) y bytes de los arreglos
+    """
+
+    def __init__(self):
+        self.llamadas = {}
+        self.evaluacionesRHS = 0
+        self.pasos = 0
+        self.iteracionesSolver = 0
+        self.fallosSolver = 0
+        self.iteracionesPorPaso = None
+        self.pasosRechazados = 0
+        self.tiempos = {}
+        self.bytes = {}
+        self.memoriaPico = None
+        self.cacheUsada = False
+
+    def contar(self, nombre, funcion):
+        """
+        Parametros
+        |  :return: funcion que cuenta sus llamadas en self.llamadas[nombre]
+        """
+        self.llamadas[nombre] = 0
+
+        def contada(*argumentos, **opciones):
+            self.llamadas[nombre] += 1
+            return funcion(*argumentos, **opciones)
+
+        return contada
+
+    def cronometrar(self, fase, funcion):
+        """
+        Parametros
+        |  :return: funcion que suma su tiempo a self.tiempos[fase]
+        """
+        def cronometrada(*argumentos, **opciones):
+            with self.fase(fase):
+                return funcion(*argumentos, **opciones)
+
+        return cronometrada
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def resumen(self):
+        """
+        Parametros
+        |  :return: diccionario con todas las estadisticas (sin el arreglo por paso)
+        """
+        resumen = {llave: valor for llave, valor in vars(self).items() if llave != "iteracionesPorPaso"}
+        if self.iteracionesPorPaso is not None and len(self.iteracionesPorPaso):
+            resumen["maxIteracionesPaso"] = int(np.abs(self.iteracionesPorPaso).max())
+        return resumen
+
+    def __repr__(self):
+        return "EstadisticasSimulacion(" + ", ".join(llave + "=" + repr(valor) for llave, valor in self.resumen().items()) + ")"
+
+
+#---------------------------------------------------------------- Cache de resultados ----------------------------------------------------------------
+
+class CacheResultados():
+    """
+    Cache de resultados de simulacion indexada por HodgkinHuxley.clave(). Tiene un
+    nivel en memoria (LRU limitado en bytes) y, si se indica un directorio, un nivel
+    en disco (un .npz por resultado) que descarta los archivos usados hace mas tiempo
+    cuando se supera maxBytesDisco. Los arreglos devueltos son de solo lectura.
+    """
+
+    def __init__(self, maxBytesMemoria=256 * 2**20, directorio=None, maxBytesDisco=2 * 2**30):
+        """
+        Parametros
+        |  :param maxBytesMemoria: tamaño maximo del nivel en memoria
+        |  :param directorio: directorio del nivel en disco (None = solo memoria)
+        |  :param maxBytesDisco: tamaño maximo del nivel en disco
+        """
+        self.maxBytesMemoria = maxBytesMemoria
+        self.directorio = directorio
+        self.maxBytesDisco = maxBytesDisco
+        self.memoria = OrderedDict()
+        self.bytesMemoria = 0
+        self.aciertosMemoria = 0
+        self.aciertosDisco = 0
+        self.fallos = 0
+        if directorio is not None:
+            os.makedirs(directorio, exist_ok=True)
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave + ".npz")
+
+    def obtener(self, clave, campos=None):
+        """
+        Parametros
+        |  :param clave: clave del resultado
+        |  :param campos: nombres de los arreglos que debe tener el resultado; uno guardado con
+        |                 otros arreglos se descarta y se cuenta como fallo (None = no se comprueba)
+        |  :return: diccionario de arreglos, o None si no esta
+        """
+        if clave in self.memoria:
+            if campos is None or sorted(self.memoria[clave]) == sorted(campos):
+                self.memoria.move_to_end(clave)
+                self.aciertosMemoria += 1
+                return self.memoria[clave]
+            self.bytesMemoria -= sum(valor.nbytes for valor in self.memoria.pop(clave).values())
+
+        if self.directorio is not None and os.path.exists(self.ruta(clave)):
+            try:
+                with np.load(self.ruta(clave)) as archivo:
+                    valores = {nombre: archivo[nombre] for nombre in archivo.files}
+                if campos is not None and sorted(valores) != sorted(campos):
+                    raise ValueError("El resultado guardado no tiene los arreglos " + str(campos))
+            except (OSError, ValueError):
+                # Archivo dañado o con otra forma de resultado: se descarta y se cuenta como fallo
+                os.remove(self.ruta(clave))
+            else:
+                # La fecha de modificacion marca el ultimo uso para el descarte
+                os.utime(self.ruta(clave))
+                self.aciertosDisco += 1
+                return self._guardarMemoria(clave, valores)
+
+        self.fallos += 1
+        return None
+
+    def guardar(self, clave, valores):
+        """
+        Parametros
+        |  :param clave: clave del resultado
+        |  :param valores: diccionario de arreglos
+        """
+        valores = self._guardarMemoria(clave, {nombre: np.array(valor) for nombre, valor in valores.items()})
+        if self.directorio is not None:
+            # Se escribe a un temporal y se renombra para no dejar archivos a medias
+            temporal = self.ruta(clave) + ".tmp"
+            with open(temporal, "wb") as archivo:
+                np.savez(archivo, **valores)
+            os.replace(temporal, self.ruta(clave))
+            self._recortarDisco()
+
+    def _guardarMemoria(self, clave, valores):
+        for valor in valores.values():
+            valor.setflags(write=False)
+        tamaño = sum(valor.nbytes for valor in valores.values())
+        if tamaño > self.maxBytesMemoria:
+            return valores
+        if clave in self.memoria:
+            self.bytesMemoria -= sum(valor.nbytes for valor in self.memoria.pop(clave).values())
+        self.memoria[clave] = valores
+        self.bytesMemoria += tamaño
+        while self.bytesMemoria > self.maxBytesMemoria:
+            clave, viejos = self.memoria.popitem(last=False)
+            self.bytesMemoria -= sum(valor.nbytes for valor in viejos.values())
+        return valores
+
+    def _recortarDisco(self):
+        archivos = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".npz"):
+                estado = os.stat(os.path.join(self.directorio, nombre))
+                archivos.append((estado.st_mtime, estado.st_size, nombre))
+        total = sum(tamaño for _, tamaño, _ in archivos)
+        for _, tamaño, nombre in sorted(archivos):
+            if total <= self.maxBytesDisco:
+                break
+            os.remove(os.path.join(self.directorio, nombre))
+            total -= tamaño
+
+    def estadisticas(self):
+        """
+        Parametros
+        |  :return: diccionario con aciertos, fallos y ocupacion
+        """
+        return {"aciertosMemoria": self.aciertosMemoria, "aciertosDisco": self.aciertosDisco, "fallos": self.fallos,
+                "entradasMemoria": len(self.memoria), "bytesMemoria": self.bytesMemoria}
+
+
+#---------------------------------------------------------------- Estados iniciales ----------------------------------------------------------------
+
+class EstadosIniciales():
+    """
+    Estados de arranque para Main(): el reposo de cada conjunto de parametros (se calcula
+    una vez con estadoReposo) y estados guardados con nombre, por ejemplo el final de una
+    simulacion para continuar desde ahi. Si se indica una ruta los estados guardados se
+    leen y escriben en un archivo JSON.
+    """
+
+    def __init__(self, ruta=None):
+        """
+        Parametros
+        |  :param ruta: archivo JSON con los estados guardados (None = solo en memoria)
+        """
+        self.ruta = ruta
+        self.reposos = {}
+        self.guardados = {}
+        if ruta is not None and os.path.exists(ruta):
+            with open(ruta) as f:
+                self.guardados = json.load(f)
+
+    def clave(self, modelo, corriente=0.0):
+        """
+        Parametros
+        |  :return: texto con lo que determina el reposo: clase, parametros, tasas tabuladas y corriente
+        """
+        parametros = {nombre: np.asarray(getattr(modelo, nombre)).tolist() for nombre in ("cm", "gna", "gk", "gl", "ena", "ek", "el")}
+        return json.dumps({"clase": type(modelo).__name__, "parametros": parametros, "tabulado": modelo.tabla is not None,
+                           "corriente": corriente}, sort_keys=True)
+
+    def reposo(self, modelo, corriente=0.0):
+        """
+        Parametros
+        |  :param modelo: HodgkinHuxley (o una poblacion)
+        |  :param corriente: corriente de inyeccion constante
+        |  :return: copia del estado de reposo, calculado la primera vez que se pide
+        """
+        clave = self.clave(modelo, corriente)
+        if clave not in self.reposos:
+            self.reposos[clave] = modelo.estadoReposo(corriente)
+        return self.reposos[clave].copy()
+
+    def guardar(self, nombre, estado, modelo=None):
+        """
+        Parametros
+        |  :param nombre: nombre del estado
+        |  :param estado: estado (V, m, h, n); con el modelo tambien un arreglo de estados
+        |                 (por ejemplo modelo.estados) del que se toma el ultimo
+        |  :param modelo: modelo de donde salio el estado (se guarda su descripcion como referencia)
+        """
+        estado = np.asarray(estado, dtype=float)
+        if modelo is not None and estado.ndim > np.ndim(modelo.estadoInicialPorDefecto()):
+            estado = estado[-1]
+        self.guardados[nombre] = {"estado": estado.tolist(), "descripcion": None if modelo is None else modelo.descripcion()}
+        if self.ruta is not None:
+            # Se escribe en un temporal y se reemplaza para no dejar el archivo a medias
+            temporal = self.ruta + ".tmp"
+            with open(temporal, "w") as f:
+                json.dump(self.guardados, f, indent=2)
+            os.replace(temporal, self.ruta)
+
+    def obtener(self, nombre):
+        """
+        Parametros
+        |  :param nombre: nombre de un estado guardado
+        |  :return: el estado guardado
+        """
+        if nombre not in self.guardados:
+            raise KeyError("No hay un estado guardado con el nombre " + str(nombre))
+        return np.array(self.guardados[nombre]["estado"], dtype=float)
+
+
+# Almacen por defecto de los modelos (estadoInicial None o un nombre)
+estadosIniciales = EstadosIniciales()
+
+
+def simularEnProceso(modelo, nombre, cola=None, evento=None, pasosBloque=5000, variable=None):
+    """
+    Funcion para un ProcessPoolExecutor: simula el modelo por tramos, informa el avance
+    por la cola y se detiene si se activa el evento
+    Parametros
+    |  :param modelo: HodgkinHuxley (se copia al proceso sin la cache)
+    |  :param nombre: identificador que acompaña cada mensaje de avance
+    |  :param cola: cola de multiprocessing donde se ponen tuplas (nombre, fraccion, t, y)
+    |  :param evento: evento de multiprocessing que cancela la simulacion
+    |  :param pasosBloque: numero de pasos por tramo
+    |  :param variable: indice en (V, ina, ik, il) de la traza que se publica con cada tramo
+    |                   (t e y son None si no se indica)
+    |  :return: estados (T, 4) o None si se cancelo
+    """
+    cancelar = None if evento is None else evento.is_set
+    simulados = [0]
+
+    def publicar(t, X):
+        simulados[0] += len(t)
+        y = None if variable is None else modelo.resultado(X)[variable]
+        cola.put((nombre, simulados[0] / modelo.nPuntos, None if y is None else t, y))
+
+    if modelo.simularPorBloques(pasosBloque, cancelar=cancelar, publicar=None if cola is None else publicar) is None:
+        return None
+    return modelo.estados
+
+
+class HodgkinHuxleyPoblacion(HodgkinHuxley):
+    """
+    Poblacion de N neuronas Hodgkin-Huxley independientes integradas en lote.
+    Los parametros pueden ser escalares o arreglos de tamaño N; el estado se
+    guarda en un arreglo (N, 4) con columnas (V, m, h, n) y cada paso de los
+    metodos explicitos se calcula con operaciones de NumPy sobre toda la poblacion.
+    """
+
+    metodosLote = ("rungeKutta2", "rungeKutta4", "eulerFor", "rushLarsen", "rushLarsen2")
+
+    def __init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo, estadoInicial=None, tabulado=False, estimulo=None, cache=None, gananciaEstimulo=1.0,
+                 instrumentar=False, dtype="float64", acumuladorV=False):
+        """
+        Parametros
+        |  :param cm, gna, gk, gl, ena, ek, el: escalares o arreglos de tamaño N (ver HodgkinHuxley)
+        |  :param tiempoInicio: tiempo de inicio
+        |  :param tiempoFinal: tiempo final
+        |  :param h: paso de tiempo
+        |  :param metodo: "rungeKutta2", "rungeKutta4", "eulerFor", "rushLarsen" o "rushLarsen2"
+        |  :param estadoInicial: arreglo (4,) o (N, 4) con (V, m, h, n), "clasico" para (-65, 0.5, 0.4, 0.05)
+        |                        o el nombre de un estado guardado; por defecto el reposo de cada neurona
+        |  :param tabulado: interpolar las tasas de una TablaCinetica (ver HodgkinHuxley)
+        |  :param estimulo: Estimulo comun a toda la poblacion; por defecto estimuloPorDefecto()
+        |  :param cache: CacheResultados (ver HodgkinHuxley)
+        |  :param gananciaEstimulo: escalar o arreglo de tamaño N que multiplica el estimulo de cada neurona
+        |  :param instrumentar: ver HodgkinHuxley
+        |  :param dtype: tipo de dato de los parametros, el estado y los pasos ("float64" o "float32")
+        |  :param acumuladorV: con "float32", V se acumula en float64 en rungeKutta2, rungeKutta4 y eulerFor
+        """
+        if metodo not in self.metodosLote:
+            raise ValueError("Metodo no valido para la poblacion: " + str(metodo))
+
+        # La ganancia del estimulo tambien define N (por ejemplo, un barrido solo de la amplitud)
+        parametros = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in (cm, gna, gk, gl, ena, ek, el, gananciaEstimulo)])
+        # Con parametros en dtype las operaciones de NumPy se quedan en dtype (los escalares de
+        # Python no cambian el tipo de un arreglo float32)
+        parametros = [np.atleast_1d(p).astype(dtype) for p in parametros[:-1]]
+
+        HodgkinHuxley.__init__(self, *parametros, tiempoInicio, tiempoFinal, h, metodo, tabulado=tabulado, estimulo=estimulo, cache=cache,
+                                instrumentar=instrumentar, estadoInicial=estadoInicial, dtype=dtype, acumuladorV=acumuladorV)
+
+        self.N = self.cm.shape[0]
+
+        self.estadoInicial = np.broadcast_to(HodgkinHuxley.estadoInicialPorDefecto(self), (self.N, 4)).astype(self.dtype)
+
+        self.gananciaEstimulo = np.broadcast_to(np.asarray(gananciaEstimulo, dtype=float), (self.N,)).astype(self.dtype)
+
+        # Voltaje en float64 al final del ultimo tramo (acumuladorV), para continuar sin redondeo
+        self._vAcumulado = None
+
+        if self.tabla is None and self.dtype != np.float64:
+            self.protegerSingularidades()
+
+    def estadoIntegrador(self):
+        estado = HodgkinHuxley.estadoIntegrador(self)
+        if self._vAcumulado is not None:
+            estado["vAcumulado"] = self._vAcumulado
+        return estado
+
+    def restaurarIntegrador(self, estado):
+        HodgkinHuxley.restaurarIntegrador(self, estado)
+        self._vAcumulado = np.array(estado["vAcumulado"]) if "vAcumulado" in estado else None
+
+    def protegerSingularidades(self):
+        """
+        Con menos precision V cae justo en la singularidad removible de alfa_m o alfa_n (0/0)
+        y cerca de ella el cociente pierde digitos: ahi se usa el limite y su pendiente
+        (singularidadesTasas). Como usarTabla, reemplaza las tasas solo en esta instancia.
+        """
+        for nombre, (Vs, limite, pendiente) in self.singularidadesTasas.items():
+            def tasa(V, analitica=getattr(self, nombre), Vs=Vs, limite=limite, pendiente=pendiente):
+                u = V - Vs
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    return np.where(np.abs(u) < 1e-3, limite + pendiente * u, analitica(V))
+            setattr(self, nombre, tasa)
+
+    def __setstate__(self, estado):
+        HodgkinHuxley.__setstate__(self, estado)
+        if self.tabla is None and self.dtype != np.float64:
+            self.protegerSingularidades()
+
+    def I_inj(self, t):
+        """
+        Parametros
+        |  :param t: tiempo
+        |  :return: arreglo (N,) con la corriente de inyeccion de cada neurona
+        """
+        return np.multiply(HodgkinHuxley.I_inj(self, t), self.gananciaEstimulo, dtype=self.dtype)
+
+    def descripcion(self):
+        descripcion = HodgkinHuxley.descripcion(self)
+        descripcion["gananciaEstimulo"] = self.gananciaEstimulo.tolist()
+        return descripcion
+
+    def derivadas(self, X, t):
+        """
+        Parametros
+        |  :param X: arreglo (N, 4) con (V, m, h, n)
+        |  :param t: tiempo
+        |  :return: arreglo (N, 4) con las derivadas de las variables de estado
+        """
+        V, m, h, n = X.T
+
+        dVdt = (self.I_inj(t) - self.I_Na(V, m, h) - self.I_K(V, n) - self.I_L(V)) / self.cm
+        dmdt = self.alfa_m(V)*(1.0-m) - self.beta_m(V)*m
+        dhdt = self.alfa_h(V)*(1.0-h) - self.beta_h(V)*h
+        dndt = self.alfa_n(V)*(1.0-n) - self.beta_n(V)*n
+        return np.stack((dVdt, dmdt, dhdt, dndt), axis=-1)
+
+    def integrarTramo(self, X0, inicio, fin, Xanterior=None):
+        """
+        Integra toda la poblacion entre los indices inicio y fin de la malla de tiempo
+        Parametros
+        |  :param X0: arreglo (N, 4) con (V, m, h, n) en t[inicio]
+        |  :param inicio: indice inicial
+        |  :param fin: indice final (incluido)
+        |  :param Xanterior: no se usa (los metodos de la poblacion son de un paso)
+        |  :return: arreglo (fin - inicio + 1, N, 4) con los estados
+        """
+        t = self.tiempos(inicio, fin + 1)
+        self.prepararCorriente(inicio, fin)
+
+        X = np.empty((len(t), self.N, 4), dtype=self.dtype)
+        X[0] = X0
+        V64 = self.iniciarAcumulador(X[0], inicio)
+
+        for i in range(1, len(t)):
+            Xi = X[i - 1]
+            if self.metodo == "rungeKutta2":
+                k1 = self.derivadas(Xi, t[i - 1])
+                k2 = self.derivadas(Xi + 0.5 * self.h * k1, t[i - 1] + 0.5 * self.h)
+                self.sumarPaso(X, i, self.h * k2, V64)
+            elif self.metodo == "rungeKutta4":
+                k1 = self.derivadas(Xi, t[i - 1])
+                k2 = self.derivadas(Xi + 0.5 * self.h * k1, t[i - 1] + 0.5 * self.h)
+                k3 = self.derivadas(Xi + 0.5 * self.h * k2, t[i - 1] + 0.5 * self.h)
+                k4 = self.derivadas(Xi + self.h * k3, t[i - 1] + self.h)
+                self.sumarPaso(X, i, (self.h / 6) * (k1 + 2 * k2 + 2 * k3 + k4), V64)
+            elif self.metodo == "rushLarsen":
+                X[i] = np.stack(self.pasoRushLarsen(*Xi.T, t[i - 1]), axis=-1)
+            elif self.metodo == "rushLarsen2":
+                X[i] = np.stack(self.pasoRushLarsen2(*Xi.T, t[i - 1]), axis=-1)
+            else:
+                # Igual que Main() escalar: la corriente se evalua en t[i]
+                self.sumarPaso(X, i, self.h * self.derivadas(Xi, t[i]), V64)
+        return X
+
+    def iniciarAcumulador(self, X0, inicio):
+        """
+        Parametros
+        |  :param X0: arreglo (N, 4) con el estado al inicio del tramo (en dtype)
+        |  :param inicio: indice inicial del tramo (en 0 no se sigue ningun tramo anterior)
+        |  :return: V en float64 para acumular los pasos, o None si acumuladorV no aplica. Si X0
+        |           es el final del tramo anterior se sigue con su V sin redondear (los tramos
+        |           dan lo mismo que Main())
+        """
+        if not self.acumuladorV or self.dtype == np.float64:
+            return None
+        V = X0[:, 0]
+        if inicio > 0 and self._vAcumulado is not None and np.array_equal(self._vAcumulado.astype(self.dtype), V):
+            V64 = self._vAcumulado
+        else:
+            V64 = V.astype(np.float64)
+        self._vAcumulado = V64
+        return V64
+
+    def sumarPaso(self, X, i, incremento, V64):
+        """
+        X[i] = X[i - 1] + incremento; con acumulador el incremento de V se suma en float64
+        Parametros
+        |  :param X: estados del tramo
+        |  :param i: indice del paso
+        |  :param incremento: arreglo (N, 4) con el incremento del paso
+        |  :param V64: acumulador de iniciarAcumulador (se modifica) o None
+        """
+        X[i] = X[i - 1] + incremento
+        if V64 is not None:
+            V64 += incremento[:, 0]
+            X[i, :, 0] = V64
+
+    def estadoInicialPorDefecto(self):
+        """
+        Parametros
+        |  :return: arreglo (N, 4) con el estado inicial de la poblacion
+        """
+        return self.estadoInicial
+
+    def resultado(self, X):
+        """
+        Parametros
+        |  :param X: arreglo (T, N, 4) con los estados
+        |  :return: V, ina, ik, il como arreglos (N, T)
+        """
+        # Trazas (T, N) -> (N, T); los parametros (N,) se difunden sobre la ultima dimension
+        V, ina, ik, il = HodgkinHuxley.resultado(self, X)
+        return V.T, ina.T, ik.T, il.T
+
+    def bloque(self, t, X):
+        """
+        Parametros
+        |  :param t: tiempos del bloque
+        |  :param X: arreglo (L, N, 4) con los estados del bloque
+        |  :return: diccionario con t y las trazas (N, L) de V, m, h, n, I_Na, I_K e I_L
+        """
+        V, ina, ik, il = self.resultado(X)
+        return {"t": t, "V": V, "m": X[:, :, 1].T, "h": X[:, :, 2].T, "n": X[:, :, 3].T, "I_Na": ina, "I_K": ik, "I_L": il}
+
+    def Main(self):
+        """
+        Integra toda la poblacion con el metodo seleccionado
+        |  :return: V, ina, ik, il como arreglos (N, T)
+        """
+        self.reiniciarContadores()
+        estadisticas = self.iniciarEstadisticas()
+        fase = _sinMedicion if estadisticas is None else estadisticas.fase
+        try:
+            with fase("simulacion"):
+                valores = self.simularConCache(self.estadoInicial, lambda: {"estados": self.integrarTramo(self.estadoInicial, 0, self.nPuntos - 1)})
+            self.estados = valores["estados"]
+            with fase("postproceso"):
+                resultado = self.resultado(self.estados)
+        finally:
+            self.restaurarFunciones(estadisticas)
+        self.cerrarEstadisticas(estadisticas, resultado)
+        return resultado
 
-        # plt.figure()
-
-        # ax1 = plt.subplot(4,1,1)
-        # plt.title('Hodgkin-Huxley Neuron')
-        # plt.plot(self.t, V, 'k')
-        # plt.ylabel('V (mV)')
-
-        # plt.subplot(4,1,2, sharex = ax1)
-        # plt.plot(self.t, ina, 'c', label='$I_{Na}$')
-        # plt.plot(self.t, ik, 'y', label='$I_{K}$')
-        # plt.plot(self.t, il, 'm', label='$I_{L}$')
-        # plt.ylabel('Current')
-        # plt.legend()
-
-        # plt.subplot(4,1,3, sharex = ax1)
-        # plt.plot(self.t, m, 'r', label='m')
-        # plt.plot(self.t, h, 'g', label='h')
-        # plt.plot(self.t, n, 'b', label='n')
-        # plt.ylabel('Gating Value')
-        # plt.legend()
-
-        # plt.subplot(4,1,4, sharex = ax1)
-        # i_inj_values = [self.I_inj(t) for t in self.t]
-        # plt.plot(self.t, i_inj_values, 'k')
-        # plt.xlabel('t (ms)')
-        # plt.ylabel('$I_{inj}$ ($\\mu{A}/cm^2$)')
-        # plt.ylim(-1, 40)
-
-        # plt.tight_layout()
-        # plt.show()
 
 if __name__ == '__main__':
     runner = HodgkinHuxley(1, 120, 36, 0.3, 50, -77, -54.387, 0, 500, 0.01, "eulerMod")
@@ -0,0 +1,158 @@
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+#---------------------------------------------------------------- Graficas ----------------------------------------------------------------
+# Una sola figura por ventana que se actualiza en el lugar: las trazas se reducen a
+# un minimo y un maximo por columna de pixeles antes de dibujarlas, asi que el
+# tiempo de dibujo no depende del largo de la simulacion y los picos no se pierden.
+# En modo en vivo los tramos que llegan se agregan a la linea y se dibujan con
+# blitting (solo la linea sobre el fondo guardado, sin redibujar ejes ni textos).
+
+
+def decimarMinMax(t, y, columnas):
+    """
+    Reduce la traza a su minimo y maximo en cada uno de `columnas` intervalos de igual
+    numero de muestras (en orden de tiempo). Una traza de pocas muestras se devuelve igual.
+    Parametros
+    |  :param t: tiempos
+    |  :param y: valores
+    |  :param columnas: numero de intervalos (ancho del grafico en pixeles)
+    |  :return: tiempos y valores decimados (a lo sumo 2*columnas + 2 puntos)
+    """
+    t = np.asarray(t)
+    y = np.asarray(y)
+    columnas = max(1, int(columnas))
+    n = len(y)
+    if n <= 2 * columnas + 2:
+        return t, y
+
+    ancho = n // columnas
+    bloques = y[:ancho * columnas].reshape(columnas, ancho)
+    desplazamientos = np.arange(columnas) * ancho
+    indices = np.sort(np.stack((bloques.argmin(axis=1), bloques.argmax(axis=1)), axis=1) + desplazamientos[:, None], axis=1).ravel()
+
+    # Muestras que sobran despues del ultimo intervalo completo, y la ultima muestra
+    if ancho * columnas < n:
+        resto = y[ancho * columnas:]
+        extra = np.sort([ancho * columnas + resto.argmin(), ancho * columnas + resto.argmax()])
+        indices = np.concatenate((indices, extra))
+    indices = np.concatenate(([0], indices, [n - 1]))
+    indices = indices[np.concatenate(([True], np.diff(indices) != 0))]
+    return t[indices], y[indices]
+
+
+class GraficaTraza():
+    """
+    Figura, canvas de Tk y linea creados una sola vez; mostrar() cambia los datos de la
+    linea (decimados al ancho del eje) y redibuja
+    """
+
+    def __init__(self, master, x=50, y=50, figsize=(6, 5), dpi=50, xlabel="time (ms)", ylabel="voltage (mV)"):
+        """
+        Parametros
+        |  :param master: ventana o marco de Tk
+        |  :param x, y: posicion del canvas (place)
+        |  :param figsize, dpi: tamaño de la figura
+        |  :param xlabel, ylabel: etiquetas de los ejes
+        """
+        self.figura = Figure(figsize=figsize, dpi=dpi)
+        self.ax = self.figura.add_subplot()
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.linea, = self.ax.plot([], [])
+        self._fondo = None
+        self.canvas = FigureCanvasTkAgg(self.figura, master)
+        self.canvas.get_tk_widget().place(x=x, y=y)
+        self.canvas.draw()
+
+    def columnas(self):
+        """
+        Parametros
+        |  :return: ancho del eje en pixeles
+        """
+        return int(np.ceil(self.ax.bbox.width))
+
+    def mostrar(self, t, y):
+        """
+        Reemplaza la traza mostrada
+        Parametros
+        |  :param t: tiempos
+        |  :param y: valores
+        """
+        self.linea.set_animated(False)
+        self._fondo = None
+        tDecimado, yDecimado = decimarMinMax(t, y, self.columnas())
+        self.linea.set_data(tDecimado, yDecimado)
+        self.ajustarLimites(tDecimado, yDecimado)
+        self.canvas.draw_idle()
+
+    def ajustarLimites(self, t, y):
+        if len(t) == 0:
+            return
+        self.ax.set_xlim(t[0], t[-1] if t[-1] > t[0] else t[0] + 1.0)
+        finitos = y[np.isfinite(y)]
+        if len(finitos):
+            minimo, maximo = finitos.min(), finitos.max()
+            margen = 0.05 * (maximo - minimo) if maximo > minimo else 1.0
+            self.ax.set_ylim(minimo - margen, maximo + margen)
+
+    def iniciarEnVivo(self, tInicio, tFinal, limitesY=(-90.0, 60.0)):
+        """
+        Prepara la grafica para recibir la traza por tramos: los ejes quedan fijos en
+        [tInicio, tFinal] y se guarda el fondo para el blitting
+        Parametros
+        |  :param tInicio, tFinal: rango de tiempo de la simulacion
+        |  :param limitesY: limites iniciales del eje y (se amplian si la traza se sale)
+        """
+        self.ax.set_xlim(tInicio, tFinal)
+        self.ax.set_ylim(*limitesY)
+        self._duracionVivo = max(tFinal - tInicio, 1e-12)
+        self._tVivo = []
+        self._yVivo = []
+        self._pendiente = False
+        self.linea.set_data([], [])
+        self.linea.set_animated(True)
+        self.guardarFondo()
+
+    def guardarFondo(self):
+        self.canvas.draw()
+        self._fondo = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def agregar(self, t, y):
+        """
+        Agrega un tramo a la traza en vivo (no dibuja; ver dibujarEnVivo)
+        Parametros
+        |  :param t: tiempos del tramo
+        |  :param y: valores del tramo
+        """
+        if self._fondo is None or len(t) == 0:
+            return
+        # Columnas de pixeles que ocupa el tramo
+        columnas = self.columnas() * (t[-1] - t[0]) / self._duracionVivo
+        tDecimado, yDecimado = decimarMinMax(t, y, max(1, int(np.ceil(columnas))))
+        self._tVivo.append(tDecimado)
+        self._yVivo.append(yDecimado)
+        self._pendiente = True
+
+        finitos = yDecimado[np.isfinite(yDecimado)]
+        minimo, maximo = self.ax.get_ylim()
+        if len(finitos) and (finitos.min() < minimo or finitos.max() > maximo):
+            # La traza se sale del eje: se amplia y se vuelve a guardar el fondo
+            minimo, maximo = min(minimo, finitos.min()), max(maximo, finitos.max())
+            margen = 0.05 * (maximo - minimo)
+            self.ax.set_ylim(minimo - margen, maximo + margen)
+            self.guardarFondo()
+
+    def dibujarEnVivo(self):
+        """
+        Dibuja los tramos agregados desde la ultima llamada: restaura el fondo y
+        dibuja solo la linea. Quien llama fija la frecuencia (por ejemplo window.after)
+        """
+        if self._fondo is None or not self._pendiente:
+            return
+        self.linea.set_data(np.concatenate(self._tVivo), np.concatenate(self._yVivo))
+        self.canvas.restore_region(self._fondo)
+        self.ax.draw_artist(self.linea)
+        self.canvas.blit(self.ax.bbox)
+        self._pendiente = False
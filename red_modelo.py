@@ -0,0 +1,223 @@
+import hashlib
+import numpy as np
+import scipy.sparse as sparse
+from funciones_modelo import HodgkinHuxleyPoblacion
+
+#---------------------------------------------------------------- Red de neuronas ----------------------------------------------------------------
+# Poblacion Hodgkin-Huxley acoplada por sinapsis de conductancia. La conectividad es una
+# matriz CSR (fila = neurona presinaptica, columna = postsinaptica, valor = conductancia
+# maxima en mS/cm^2) con un retardo axonal por sinapsis. Cada sinapsis pertenece a un
+# canal (inversion, tau) dado por su neurona presinaptica; cada canal tiene una
+# conductancia por neurona postsinaptica que decae exponencialmente:
+#
+#   I_syn = sum_k g_k (E_k - V),   g_k <- g_k exp(-h / tau_k) + pesos que llegan en el paso
+#
+# Los pesos en camino se acumulan en un buffer circular (retardo maximo + 1, canales, N):
+# cuando una neurona cruza el umbral solo se recorren sus sinapsis (su fila de la CSR),
+# asi que el costo de propagar depende de las sinapsis activas y no de N^2.
+
+
+class RedHodgkinHuxley(HodgkinHuxleyPoblacion):
+    """
+    Red de N neuronas Hodgkin-Huxley con sinapsis de conductancia, retardos y
+    propagacion de picos por eventos. Con pocos pasos se puede usar Main() (estados
+    (T, N, 4)); para redes grandes simularPicos() integra por tramos y solo guarda los
+    picos y, si se piden, los voltajes de algunas neuronas.
+    """
+
+    metodosLote = ("rungeKutta2", "rungeKutta4", "eulerFor")
+
+    def __init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo, pesos, retardos=1.0, inversion=0.0,
+                 tau=2.0, umbral=0.0, estadoInicial=None, tabulado=False, estimulo=None, cache=None, gananciaEstimulo=1.0,
+                 instrumentar=False, dtype="float64", acumuladorV=False):
+        """
+        Parametros
+        |  :param cm, gna, gk, gl, ena, ek, el: escalares o arreglos de tamaño N (ver HodgkinHuxley)
+        |  :param tiempoInicio: tiempo de inicio
+        |  :param tiempoFinal: tiempo final
+        |  :param h: paso de tiempo
+        |  :param metodo: "rungeKutta2", "rungeKutta4" o "eulerFor"
+        |  :param pesos: matriz (N, N) dispersa (o densa) con las conductancias maximas; fila = presinaptica
+        |  :param retardos: retardo axonal en ms: escalar, arreglo alineado con pesos.data de la CSR
+        |                   o matriz dispersa con el mismo patron que pesos (se redondea a pasos, minimo 1)
+        |  :param inversion: potencial de inversion (mV) de las sinapsis de cada neurona presinaptica (escalar o N)
+        |  :param tau: constante de decaimiento (ms) de las sinapsis de cada neurona presinaptica (escalar o N)
+        |  :param umbral: voltaje de deteccion de picos (mV)
+        |  :param estadoInicial, tabulado, estimulo, cache, gananciaEstimulo, instrumentar: ver HodgkinHuxleyPoblacion
+        |  :param dtype, acumuladorV: ver HodgkinHuxleyPoblacion (las conductancias sinapticas y el
+        |                             buffer de picos en camino tambien quedan en dtype)
+        """
+        pesos = sparse.csr_matrix(pesos, dtype=float)
+        pesos.sort_indices()
+        N = pesos.shape[0]
+        if pesos.shape != (N, N):
+            raise ValueError("La matriz de pesos debe ser cuadrada: " + str(pesos.shape))
+
+        HodgkinHuxleyPoblacion.__init__(self, cm, gna, gk, gl, ena, ek, el, tiempoInicio, tiempoFinal, h, metodo, estadoInicial=estadoInicial,
+                                        tabulado=tabulado, estimulo=estimulo, cache=cache,
+                                        gananciaEstimulo=np.broadcast_to(np.asarray(gananciaEstimulo, dtype=float), (N,)),
+                                        instrumentar=instrumentar, dtype=dtype, acumuladorV=acumuladorV)
+        self.pesos = pesos
+        self.umbral = umbral
+
+        if sparse.issparse(retardos):
+            retardos = sparse.csr_matrix(retardos, dtype=float)
+            retardos.sort_indices()
+            if not (np.array_equal(retardos.indptr, pesos.indptr) and np.array_equal(retardos.indices, pesos.indices)):
+                raise ValueError("Los retardos deben tener el mismo patron de sinapsis que los pesos")
+            retardos = retardos.data
+        self.retardos = np.broadcast_to(np.asarray(retardos, dtype=float), pesos.data.shape).copy()
+        self.pasosRetardo = np.maximum(1, np.rint(self.retardos / h).astype(np.int64))
+
+        # Canales: un par (inversion, tau) distinto por canal; cada sinapsis usa el de su presinaptica
+        self.inversion = np.broadcast_to(np.asarray(inversion, dtype=float), (N,)).copy()
+        self.tau = np.broadcast_to(np.asarray(tau, dtype=float), (N,)).copy()
+        pares, canalPre = np.unique(np.column_stack((self.inversion, self.tau)), axis=0, return_inverse=True)
+        self.inversionCanal = pares[:, 0].astype(self.dtype)
+        self.decaimientoCanal = np.exp(-h / pares[:, 1]).astype(self.dtype)
+        presinapticas = np.repeat(np.arange(N), np.diff(pesos.indptr))
+        self.canalSinapsis = canalPre.ravel()[presinapticas]
+
+        self.reiniciarSinapsis()
+
+    def reiniciarSinapsis(self):
+        """
+        Conductancias en cero, buffer de picos en camino vacio y sin picos registrados
+        """
+        canales = len(self.inversionCanal)
+        self.conductancias = np.zeros((canales, self.N), dtype=self.dtype)
+        self.enCamino = np.zeros((int(self.pasosRetardo.max(initial=1)) + 1, canales, self.N), dtype=self.dtype)
+        self.tiemposPicos = []
+        self.neuronasPicos = []
+
+    def estadoIntegrador(self):
+        estado = HodgkinHuxleyPoblacion.estadoIntegrador(self)
+        tiempos, neuronas = self.picos()
+        estado.update({"conductancias": self.conductancias, "enCamino": self.enCamino, "tiemposPicos": tiempos, "neuronasPicos": neuronas})
+        return estado
+
+    def restaurarIntegrador(self, estado):
+        HodgkinHuxleyPoblacion.restaurarIntegrador(self, estado)
+        self.conductancias = np.array(estado["conductancias"], dtype=self.dtype)
+        self.enCamino = np.array(estado["enCamino"], dtype=self.dtype)
+        self.tiemposPicos = [np.array(estado["tiemposPicos"])]
+        self.neuronasPicos = [np.array(estado["neuronasPicos"], dtype=np.int64)]
+
+    def descripcion(self):
+        descripcion = HodgkinHuxleyPoblacion.descripcion(self)
+        # La conectividad entra a la clave de la cache como un hash (puede ser muy grande)
+        resumen = hashlib.sha256()
+        for arreglo in (self.pesos.indptr, self.pesos.indices, self.pesos.data, self.pasosRetardo, self.inversion, self.tau):
+            resumen.update(np.ascontiguousarray(arreglo).tobytes())
+        descripcion["red"] = {"sinapsis": int(self.pesos.nnz), "conectividad": resumen.hexdigest(), "umbral": self.umbral}
+        return descripcion
+
+    def derivadas(self, X, t):
+        """
+        Parametros
+        |  :param X: arreglo (N, 4) con (V, m, h, n)
+        |  :param t: tiempo
+        |  :return: derivadas de la poblacion mas la corriente sinaptica, con las conductancias
+        |           del paso actual (constantes durante el paso)
+        """
+        dX = HodgkinHuxleyPoblacion.derivadas(self, X, t)
+        dX[:, 0] += (self._gInversion - self._gTotal * X[:, 0]) / self.cm
+        return dX
+
+    def sinapsisDe(self, presinapticas):
+        """
+        Parametros
+        |  :param presinapticas: indices de las neuronas que dispararon
+        |  :return: posiciones en pesos.data de todas sus sinapsis
+        """
+        inicios = self.pesos.indptr[presinapticas]
+        largos = self.pesos.indptr[presinapticas + 1] - inicios
+        # Rangos [inicio, inicio + largo) concatenados sin bucle de Python
+        return np.repeat(inicios - np.cumsum(largos) + largos, largos) + np.arange(largos.sum())
+
+    def propagar(self, presinapticas, paso):
+        """
+        Agrega al buffer circular los pesos de las sinapsis de las neuronas que dispararon
+        Parametros
+        |  :param presinapticas: indices de las neuronas que cruzaron el umbral
+        |  :param paso: indice (de la malla) del paso en que cruzaron
+        """
+        sinapsis = self.sinapsisDe(presinapticas)
+        llegada = (paso + self.pasosRetardo[sinapsis]) % len(self.enCamino)
+        np.add.at(self.enCamino, (llegada, self.canalSinapsis[sinapsis], self.pesos.indices[sinapsis]), self.pesos.data[sinapsis])
+
+    def integrarTramo(self, X0, inicio, fin, Xanterior=None):
+        """
+        Integra la red entre los indices inicio y fin de la malla de tiempo. El estado de
+        las sinapsis pasa de un tramo al siguiente; se reinicia cuando inicio es 0.
+        Parametros
+        |  :param X0: arreglo (N, 4) con (V, m, h, n) en t[inicio]
+        |  :param inicio: indice inicial
+        |  :param fin: indice final (incluido)
+        |  :param Xanterior: no se usa
+        |  :return: arreglo (fin - inicio + 1, N, 4) con los estados
+        """
+        if inicio == 0:
+            self.reiniciarSinapsis()
+        t = self.tiempos(inicio, fin + 1)
+        self.prepararCorriente(inicio, fin)
+
+        X = np.empty((len(t), self.N, 4), dtype=self.dtype)
+        X[0] = X0
+        V64 = self.iniciarAcumulador(X[0], inicio)
+
+        for i in range(1, len(t)):
+            # Llegan los picos programados para este paso y las conductancias decaen
+            paso = inicio + i - 1
+            ranura = paso % len(self.enCamino)
+            self.conductancias *= self.decaimientoCanal[:, None]
+            self.conductancias += self.enCamino[ranura]
+            self.enCamino[ranura] = 0.0
+            self._gTotal = self.conductancias.sum(axis=0)
+            self._gInversion = self.inversionCanal @ self.conductancias
+
+            Xi = X[i - 1]
+            if self.metodo == "rungeKutta2":
+                k1 = self.derivadas(Xi, t[i - 1])
+                k2 = self.derivadas(Xi + 0.5 * self.h * k1, t[i - 1] + 0.5 * self.h)
+                self.sumarPaso(X, i, self.h * k2, V64)
+            elif self.metodo == "rungeKutta4":
+                k1 = self.derivadas(Xi, t[i - 1])
+                k2 = self.derivadas(Xi + 0.5 * self.h * k1, t[i - 1] + 0.5 * self.h)
+                k3 = self.derivadas(Xi + 0.5 * self.h * k2, t[i - 1] + 0.5 * self.h)
+                k4 = self.derivadas(Xi + self.h * k3, t[i - 1] + self.h)
+                self.sumarPaso(X, i, (self.h / 6) * (k1 + 2 * k2 + 2 * k3 + k4), V64)
+            else:
+                self.sumarPaso(X, i, self.h * self.derivadas(Xi, t[i]), V64)
+
+            # Picos: cruces del umbral hacia arriba en este paso
+            presinapticas = np.flatnonzero((Xi[:, 0] < self.umbral) & (X[i, :, 0] >= self.umbral))
+            if len(presinapticas):
+                self.tiemposPicos.append(np.full(len(presinapticas), t[i]))
+                self.neuronasPicos.append(presinapticas)
+                self.propagar(presinapticas, paso + 1)
+        return X
+
+    def picos(self):
+        """
+        Parametros
+        |  :return: tiempos y neuronas de los picos registrados (ordenados por tiempo)
+        """
+        if not self.tiemposPicos:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        return np.concatenate(self.tiemposPicos), np.concatenate(self.neuronasPicos)
+
+    def simularPicos(self, pasosBloque=1000, registrar=()):
+        """
+        Integra por tramos sin guardar los estados de toda la red
+        Parametros
+        |  :param pasosBloque: numero de pasos por tramo (memoria: pasosBloque * N * 4 valores)
+        |  :param registrar: indices de las neuronas cuyo voltaje se guarda
+        |  :return: diccionario con tiempos y neuronas de los picos, y t y V (len(registrar), T)
+        """
+        registrar = np.asarray(registrar, dtype=np.int64)
+        voltajes = []
+        for t, X in self.tramos(pasosBloque):
+            voltajes.append(X[:, registrar, 0].T)
+        tiempos, neuronas = self.picos()
+        return {"tiempos": tiempos, "neuronas": neuronas, "t": self.t, "V": np.concatenate(voltajes, axis=1)}
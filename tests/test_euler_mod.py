@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import scipy.optimize as opt
+
+from funciones_modelo import HodgkinHuxley, estimuloPorDefecto, numba
+
+PARAMETROS = (1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387)
+
+# Diferencia maxima de V contra el bucle original con fsolve (se miden ~1e-10 mV): Newton
+# para en una correccion relativa de 1e-12 y fsolve en xtol=1e-15, no son la misma raiz
+TOLERANCIA_V = 1e-9
+
+
+def voltajeFsolve(hh):
+    """
+    Parametros
+    |  :param hh: modelo con metodo "eulerMod"
+    |  :return: V del eulerMod original (un fsolve de FEulerBackRoot por paso, xtol=1e-15)
+    """
+    t = hh.t
+    V, m, h, n = hh.estadoInicialPorDefecto()
+    X = np.empty((len(t), 4))
+    X[0] = V, n, m, h
+    for i in range(1, len(t)):
+        X[i] = opt.fsolve(hh.FEulerBackRoot, X[i - 1], tuple(X[i - 1]) + (t[i],), xtol=1e-15)
+    return X[:, 0]
+
+
+# fsolve avisa que no progresa en los pasos donde ya esta en la raiz
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("backend", ["numpy", "jit"])
+def test_newton_igual_a_fsolve(backend):
+    # 60 ms cruzan el borde del primer pulso y varios potenciales de accion
+    hh = HodgkinHuxley(*PARAMETROS, 0, 60, 0.01, "eulerMod", backend=backend, estimulo=estimuloPorDefecto())
+    V = hh.Main()[0]
+    assert np.max(np.abs(V - voltajeFsolve(hh))) < TOLERANCIA_V
+    assert hh.fallosSolver == 0
+
+
+def test_backend_por_defecto():
+    hh = HodgkinHuxley(*PARAMETROS, 0, 10, 0.01, "eulerMod")
+    assert hh.backend == ("numpy" if numba is None else "jit")
+    # Los kernels usan las tasas analiticas: con tabulado queda el camino de Python
+    assert HodgkinHuxley(*PARAMETROS, 0, 10, 0.01, "eulerMod", tabulado=True).backend == "numpy"
+    assert HodgkinHuxley(*PARAMETROS, 0, 10, 0.01, "rungeKutta4").backend == "numpy"
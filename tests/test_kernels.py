@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from funciones_modelo import HodgkinHuxley, estimuloPorDefecto, precompilarKernels
+
+PARAMETROS = (1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387)
+
+# Diferencia maxima de V (mV) entre los backends "numpy" y "jit" que se garantiza por
+# metodo; la de las compuertas es unas 100 veces menor
+TOLERANCIAS_V = {"rungeKutta2": 1e-11, "rungeKutta4": 1e-11, "eulerFor": 1e-11, "eulerMod": 1e-9}
+
+
+def test_todos_los_kernels_tienen_tolerancia():
+    assert set(TOLERANCIAS_V) == set(HodgkinHuxley.kernelsJit)
+
+
+@pytest.mark.parametrize("h", [0.01, 0.05])
+@pytest.mark.parametrize("metodo", sorted(TOLERANCIAS_V))
+def test_jit_igual_a_numpy(metodo, h):
+    precompilarKernels()
+    estados = {}
+    for backend in ("numpy", "jit"):
+        # 160 ms cubren los dos primeros pulsos del estimulo por defecto (trenes de picos)
+        hh = HodgkinHuxley(*PARAMETROS, 0, 160, h, metodo, backend=backend, estimulo=estimuloPorDefecto())
+        hh.Main()
+        estados[backend] = hh.estados
+    diferencia = np.abs(estados["numpy"] - estados["jit"]).max(axis=0)
+    assert np.all(np.isfinite(diferencia))
+    assert diferencia[0] < TOLERANCIAS_V[metodo]
+    assert np.all(diferencia[1:] < TOLERANCIAS_V[metodo] / 100)
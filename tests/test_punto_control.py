@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from archivos_modelo import Almacen, leerPuntoControl
+from funciones_modelo import HodgkinHuxley, HodgkinHuxleyPoblacion, EstimuloPulsos, estimuloPorDefecto
+
+PARAMETROS = (1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387)
+
+PASOS_BLOQUE = 700
+
+
+def cancelarEnTramo(k):
+    """
+    Parametros
+    |  :param k: numero de tramo
+    |  :return: funcion cancelar que devuelve True en el tramo k
+    """
+    tramos = [0]
+
+    def cancelar():
+        tramos[0] += 1
+        return tramos[0] == k
+    return cancelar
+
+
+def interrumpirEnTramo(k):
+    """
+    Parametros
+    |  :param k: numero de tramo
+    |  :return: funcion progreso que en el tramo k lanza KeyboardInterrupt (corte sin punto de control)
+    """
+    tramos = [0]
+
+    def progreso(fraccion):
+        tramos[0] += 1
+        if tramos[0] == k:
+            raise KeyboardInterrupt
+    return progreso
+
+
+MODELOS = {
+    "rungeKutta4": lambda: HodgkinHuxley(*PARAMETROS, 0, 50, 0.01, "rungeKutta4", estimulo=estimuloPorDefecto()),
+    "eulerMod": lambda: HodgkinHuxley(*PARAMETROS, 0, 50, 0.01, "eulerMod", estimulo=estimuloPorDefecto()),
+    "dopri45": lambda: HodgkinHuxley(*PARAMETROS, 0, 50, 0.01, "dopri45", estimulo=estimuloPorDefecto()),
+    "poblacion": lambda: HodgkinHuxleyPoblacion(*PARAMETROS, 0, 50, 0.01, "rungeKutta4", estimulo=estimuloPorDefecto(),
+                                                gananciaEstimulo=np.linspace(0.0, 2.0, 5)),
+}
+
+
+@pytest.mark.parametrize("nombre", sorted(MODELOS))
+def test_cancelar_y_reanudar(nombre, tmp_path):
+    crear = MODELOS[nombre]
+    continuo = crear()
+    final = continuo.simularReanudable(str(tmp_path / "a.npz"), str(tmp_path / "a.hhz"), pasosBloque=PASOS_BLOQUE)
+    assert final["terminado"] and final["indice"] == continuo.nPuntos - 1
+    V = Almacen(str(tmp_path / "a.hhz")).leer("V")
+
+    # Cancelado en el tercer tramo y retomado con un modelo nuevo
+    control, salida = str(tmp_path / "b.npz"), str(tmp_path / "b.hhz")
+    punto = crear().simularReanudable(control, salida, pasosBloque=PASOS_BLOQUE, cancelar=cancelarEnTramo(3))
+    assert not punto["terminado"] and punto["indice"] == 3 * PASOS_BLOQUE
+    crear().simularReanudable(control, salida, pasosBloque=PASOS_BLOQUE)
+    np.testing.assert_array_equal(Almacen(salida).leer("V"), V)
+
+    # Cortado sin guardar: el punto de control es el inicial y el almacen tiene tramos de mas
+    control, salida = str(tmp_path / "c.npz"), str(tmp_path / "c.hhz")
+    with pytest.raises(KeyboardInterrupt):
+        crear().simularReanudable(control, salida, pasosBloque=PASOS_BLOQUE, intervalo=1e9, progreso=interrumpirEnTramo(4))
+    assert leerPuntoControl(control)["indice"] == 0
+    crear().simularReanudable(control, salida, pasosBloque=PASOS_BLOQUE)
+    np.testing.assert_array_equal(Almacen(salida).leer("V"), V)
+
+    # Paso fijo: igual a Main(); dopri45 solo a la misma integracion por tramos
+    if nombre == "dopri45":
+        np.testing.assert_array_equal(V, crear().simularPorBloques(PASOS_BLOQUE)[0])
+    else:
+        np.testing.assert_array_equal(V, crear().Main()[0])
+
+
+def test_punto_control_de_otra_simulacion(tmp_path):
+    control = str(tmp_path / "a.npz")
+    MODELOS["rungeKutta4"]().simularReanudable(control, str(tmp_path / "a.hhz"), cancelar=lambda: True)
+    otro = HodgkinHuxley(*PARAMETROS, 0, 50, 0.02, "rungeKutta4", estimulo=estimuloPorDefecto())
+    with pytest.raises(ValueError):
+        otro.simularReanudable(control, str(tmp_path / "b.hhz"))
+
+
+def test_bifurcacion(tmp_path):
+    # Prefijo comun hasta 30 ms y dos continuaciones hasta 60 ms
+    prefijo = str(tmp_path / "prefijo.npz")
+    HodgkinHuxley(*PARAMETROS, 0, 30, 0.01, "rungeKutta4").simularReanudable(prefijo, str(tmp_path / "prefijo.hhz"))
+
+    HodgkinHuxley(*PARAMETROS, 0, 60, 0.01, "rungeKutta4").simularReanudable(str(tmp_path / "a.npz"), str(tmp_path / "a.hhz"), desde=prefijo)
+    continuacion = Almacen(str(tmp_path / "a.hhz"))
+    assert continuacion.metadatos["bifurcacion"]["tiempo"] == pytest.approx(30.0)
+    V = np.concatenate([Almacen(str(tmp_path / "prefijo.hhz")).leer("V"), continuacion.leer("V")[1:]])
+    np.testing.assert_array_equal(V, HodgkinHuxley(*PARAMETROS, 0, 60, 0.01, "rungeKutta4").Main()[0])
+
+    # Un pulso extra desde 35 ms: la continuacion coincide hasta el pulso y despues cambia
+    estimulo = estimuloPorDefecto() + EstimuloPulsos([(35, 36, 30)])
+    HodgkinHuxley(*PARAMETROS, 0, 60, 0.01, "rungeKutta4", estimulo=estimulo).simularReanudable(
+        str(tmp_path / "b.npz"), str(tmp_path / "b.hhz"), desde=prefijo)
+    otra = Almacen(str(tmp_path / "b.hhz"))
+    antes = otra.tiempos() < 35.0
+    np.testing.assert_array_equal(otra.leer("V")[antes], continuacion.leer("V")[antes])
+    assert not np.allclose(otra.leer("V")[~antes], continuacion.leer("V")[~antes])
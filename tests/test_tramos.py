@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from funciones_modelo import HodgkinHuxley, estimuloPorDefecto
+
+PARAMETROS = (1.0, 120.0, 36.0, 0.3, 50.0, -77.0, -54.387)
+
+METODOS_PASO_FIJO = [metodo for metodo in HodgkinHuxley.metodos if metodo not in HodgkinHuxley.metodosPasoVariable]
+
+
+def modelo(metodo, backend):
+    # 60 ms con el borde del primer pulso en t = 10 dentro de un bloque
+    return HodgkinHuxley(*PARAMETROS, 0, 60, 0.01, metodo, backend=backend, estimulo=estimuloPorDefecto())
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("backend", ["numpy", "jit"])
+@pytest.mark.parametrize("metodo", METODOS_PASO_FIJO)
+def test_iter_chunks_igual_a_main(metodo, backend):
+    hh = modelo(metodo, backend)
+    V, ina, ik, il = hh.Main()
+    iteracionesMain = hh.iteracionesNewton.copy()
+
+    # Un tamaño de bloque que no divide la malla: el ultimo bloque queda mas corto
+    hh = modelo(metodo, backend)
+    bloques = []
+    iteraciones = []
+    for bloque in hh.iter_chunks(chunk_steps=997):
+        bloques.append(bloque)
+        iteraciones.append(hh.iteracionesNewton.copy())
+        assert hh._t is None
+
+    # Igualdad exacta (bit a bit; eulerBack diverge y los NaN se comparan como iguales)
+    np.testing.assert_array_equal(np.concatenate([bloque["t"] for bloque in bloques]), hh.t)
+    for nombre, traza in (("V", V), ("I_Na", ina), ("I_K", ik), ("I_L", il)):
+        np.testing.assert_array_equal(np.concatenate([bloque[nombre] for bloque in bloques]), traza)
+
+    if metodo == "eulerMod":
+        # Las iteraciones de Newton quedan por tramo (un valor por paso del tramo)
+        assert all(len(x) == 997 for x in iteraciones[:-1])
+        assert sum(len(x) for x in iteraciones) == hh.nPuntos - 1
+        np.testing.assert_array_equal(np.concatenate(iteraciones), iteracionesMain)
+        assert hh.iteracionesSolver == int(np.abs(iteracionesMain).sum())